@@ -5,10 +5,20 @@ from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
 from django.http import JsonResponse
 from django.utils.html import format_html
-from django.db.models import Q
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.dateparse import parse_datetime
+from django.utils.http import urlencode
 from .models import (Player, GameSession, TreasureHuntQuestion, PlayerAnswer, Event, EventParticipation, 
                     EventVote, EventScore, IndividualParticipation, IndividualEventScore, IndividualEventVote,
-                    TeamEventParticipation, TeamConfiguration, SimpleEventScore)
+                    TeamEventParticipation, TeamConfiguration, SimpleEventScore, VoteAggregate,
+                    IndividualVoteAggregate)
+from .search import IndexedSearchMixin
+
+
+def team_name(obj):
+    """Team display name from the team_name annotation, falling back to the default team names"""
+    return getattr(obj, 'team_name', None) or dict(Player.TEAM_CHOICES).get(obj.team, obj.team)
 
 
 # Enhanced Team Management Admin
@@ -27,41 +37,40 @@ class TeamConfigurationAdmin(admin.ModelAdmin):
     fields = ('team_code', 'team_name', 'is_active', 'player_count_display', 'created_at', 'updated_at')
     
     def get_queryset(self, request):
-        # Show all teams, create missing ones if needed
-        qs = super().get_queryset(request)
-        self.ensure_default_teams_exist()
-        return qs
+        # Player counts come from per-team subqueries instead of two counts per row
+        players = Player.objects.filter(team=OuterRef('team_code')).order_by().values('team')
+        return super().get_queryset(request).annotate(
+            active_players=Coalesce(Subquery(
+                players.filter(is_active=True).annotate(count=Count('pk')).values('count'),
+                output_field=IntegerField(),
+            ), 0),
+            total_players=Coalesce(Subquery(
+                players.annotate(count=Count('pk')).values('count'),
+                output_field=IntegerField(),
+            ), 0),
+        )
     
     def player_count(self, obj):
         """Show number of players in this team"""
-        from .models import Player
-        count = Player.objects.filter(team=obj.team_code, is_active=True).count()
-        return f"{count} players"
+        return f"{obj.active_players} players"
     player_count.short_description = "Active Players"
+    player_count.admin_order_field = 'active_players'
     
     def player_count_display(self, obj):
         """Detailed player count for form"""
-        from .models import Player
-        total = Player.objects.filter(team=obj.team_code).count()
-        active = Player.objects.filter(team=obj.team_code, is_active=True).count()
-        return f"{active} active players ({total} total)"
+        return f"{obj.active_players} active players ({obj.total_players} total)"
     player_count_display.short_description = "Player Statistics"
     
     def ensure_default_teams_exist(self):
-        """Ensure all default teams exist in TeamConfiguration"""
-        default_teams = [
-            ('team_1', 'Team 1'),
-            ('team_2', 'Team 2'), 
-            ('team_3', 'Team 3'),
-            ('team_4', 'Team 4'),
-            ('unassigned', 'Unassigned'),
+        """Create any missing default teams (one query when they all exist)"""
+        existing = set(TeamConfiguration.objects.values_list('team_code', flat=True))
+        missing = [
+            TeamConfiguration(team_code=team_code, team_name=team_name, is_active=True)
+            for team_code, team_name in Player.TEAM_CHOICES
+            if team_code not in existing
         ]
-        
-        for team_code, team_name in default_teams:
-            TeamConfiguration.objects.get_or_create(
-                team_code=team_code,
-                defaults={'team_name': team_name, 'is_active': True}
-            )
+        if missing:
+            TeamConfiguration.objects.bulk_create(missing, ignore_conflicts=True)
     
     def has_add_permission(self, request):
         # Prevent adding new teams through admin to avoid breaking existing data
@@ -77,6 +86,8 @@ class TeamConfigurationAdmin(admin.ModelAdmin):
     
     # Add helpful text to the admin
     def changelist_view(self, request, extra_context=None):
+        # Show all teams, create missing ones if needed
+        self.ensure_default_teams_exist()
         extra_context = extra_context or {}
         extra_context['title'] = '🏆 Team Management - Change Team Names'
         extra_context['help_text'] = """
@@ -104,6 +115,23 @@ class TeamConfigurationAdmin(admin.ModelAdmin):
         return super().change_view(request, object_id, form_url, extra_context)
 
 
+REVIEW_QUEUE_PAGE_SIZE = 25
+
+
+def review_cursor(answer):
+    """Keyset cursor for the review queue page after this answer"""
+    return f"{answer.submitted_at.isoformat()}_{answer.id}"
+
+
+def parse_review_cursor(value):
+    """(submitted_at, id) from a review queue cursor, or None if invalid"""
+    submitted_at, _, answer_id = value.rpartition('_')
+    submitted_at = parse_datetime(submitted_at) if submitted_at else None
+    if submitted_at is None or not answer_id.isdigit():
+        return None
+    return submitted_at, int(answer_id)
+
+
 class CustomAdminSite(admin.AdminSite):
     site_header = "ഓണാഘോഷം Admin"
     site_title = "ഓണാഘോഷം Admin"
@@ -116,43 +144,50 @@ class CustomAdminSite(admin.AdminSite):
             path('bulk-upload-questions/', self.admin_view(self.bulk_upload_questions_view), name='bulk_upload_questions'),
             path('dashboard/', self.admin_view(self.dashboard_view), name='admin_dashboard'),
             path('approve-answer/<int:answer_id>/', self.admin_view(self.approve_single_answer), name='approve_single_answer'),
+            path('bulk-review-answers/', self.admin_view(self.bulk_review_answers_view), name='bulk_review_answers'),
             path('manage-events/', self.admin_view(self.manage_events_view), name='manage_events'),
             path('event-scoring/<int:event_id>/', self.admin_view(self.event_scoring_view), name='event_scoring'),
+            path('score-grid/', self.admin_view(self.score_grid_view), name='score_grid'),
+            path('import-roster/', self.admin_view(self.import_roster_view), name='import_roster'),
+            path('export/<slug:name>/', self.admin_view(self.export_view), name='export'),
         ]
         return custom_urls + urls
     
     def dashboard_view(self, request):
         """Custom dashboard view"""
-        pending_answers = PlayerAnswer.objects.filter(is_correct=False, points_awarded=0).count()
-        total_questions = TreasureHuntQuestion.objects.filter(is_active=True).count()
-        total_players = Player.objects.filter(is_active=True).count()
-        online_players = Player.objects.filter(is_online=True).count()
-        unassigned_players = Player.objects.filter(team='unassigned', is_active=True).count()
+        from .dashboard import get_dashboard_stats
+        from .exports import EXPORTS
+        from .throttling import get_rejection_counts
         
-        # Team statistics
-        team_stats = []
-        for team_key, team_name in Player.TEAM_CHOICES:
-            if team_key != 'unassigned':
-                team_count = Player.objects.filter(team=team_key, is_active=True).count()
-                team_online = Player.objects.filter(team=team_key, is_online=True).count()
-                team_stats.append({
-                    'name': team_name,
-                    'total': team_count,
-                    'online': team_online,
-                })
+        stats = get_dashboard_stats()
+        rate_limit_rejections = [
+            {'endpoint': endpoint, 'scope': scope, 'count': count}
+            for (endpoint, scope), count in sorted(get_rejection_counts().items())
+            if count
+        ]
         
         context = {
             'title': 'Admin Dashboard',
-            'pending_answers': pending_answers,
-            'total_questions': total_questions,
-            'total_players': total_players,
-            'online_players': online_players,
-            'unassigned_players': unassigned_players,
-            'team_stats': team_stats,
+            **stats,
+            'rate_limit_rejections': rate_limit_rejections,
+            'exports': [(name, title) for name, (title, _) in EXPORTS.items()],
             'opts': self.model._meta if hasattr(self, 'model') else None,
         }
         return render(request, 'admin/custom_dashboard.html', context)
     
+    def export_view(self, request, name):
+        """Download one of the result exports as CSV (default) or XLSX (?format=xlsx)"""
+        from django.http import Http404
+        from .exports import EXPORTS, ExportUnavailable, export_response
+        
+        if name not in EXPORTS:
+            raise Http404(f'No export called {name}')
+        try:
+            return export_response(name, 'xlsx' if request.GET.get('format') == 'xlsx' else 'csv')
+        except ExportUnavailable as e:
+            messages.error(request, str(e))
+            return redirect('custom_admin:admin_dashboard')
+    
     def approve_answers_view(self, request):
         """View to approve player answers"""
         if request.method == 'POST':
@@ -161,32 +196,72 @@ class CustomAdminSite(admin.AdminSite):
             points = request.POST.get('points', 0)
             
             answer = get_object_or_404(PlayerAnswer, id=answer_id)
+            previous_points = answer.points_awarded
             
             if action == 'approve':
                 answer.is_correct = True
                 answer.points_awarded = int(points) if points else answer.question.points
+                answer.grading_status = 'reviewed'
                 answer.save()
                 
                 # Update player score
                 player = answer.player
-                player.score += answer.points_awarded
+                player.score = max(player.score + answer.points_awarded - previous_points, 0)
                 player.save()
                 
                 messages.success(request, f'Answer approved for {player.name}')
             elif action == 'reject':
                 answer.is_correct = False
                 answer.points_awarded = 0
+                answer.grading_status = 'reviewed'
                 answer.save()
+                if previous_points:
+                    player = answer.player
+                    player.score = max(player.score - previous_points, 0)
+                    player.save()
                 messages.info(request, f'Answer rejected for {answer.player.name}')
         
-        # Get pending answers (not yet approved/rejected)
-        pending_answers = PlayerAnswer.objects.filter(
-            Q(is_correct=False, points_awarded=0)
-        ).select_related('player', 'question').order_by('-submitted_at')
+        # Pending answers (auto-grading could not decide and no admin has reviewed them yet),
+        # oldest first, one page at a time using a (submitted_at, id) keyset cursor
+        question_id = request.GET.get('question', '')
+        team = request.GET.get('team', '')
+        queue = PlayerAnswer.objects.filter(grading_status='pending')
+        if question_id.isdigit():
+            queue = queue.filter(question_id=int(question_id))
+        if team:
+            queue = queue.filter(player__team=team)
+        
+        page = queue.select_related('player', 'question').order_by('submitted_at', 'id')
+        cursor = parse_review_cursor(request.GET.get('after', ''))
+        if cursor:
+            submitted_at, answer_id = cursor
+            page = page.filter(Q(submitted_at__gt=submitted_at) | Q(submitted_at=submitted_at, id__gt=answer_id))
+        
+        page_size = REVIEW_QUEUE_PAGE_SIZE
+        pending_answers = list(page[:page_size + 1])
+        next_cursor = None
+        if len(pending_answers) > page_size:
+            pending_answers = pending_answers[:page_size]
+            next_cursor = review_cursor(pending_answers[-1])
+        
+        # Team names come from one query rather than one per answer
+        teams = TeamConfiguration.get_team_choices()
+        team_names = dict(Player.TEAM_CHOICES, **dict(teams))
+        for answer in pending_answers:
+            answer.team_name = team_names.get(answer.player.team, answer.player.team)
         
+        filters = {'question': question_id, 'team': team}
         context = {
             'title': 'Approve Answers',
             'pending_answers': pending_answers,
+            'pending_count': queue.count(),
+            'next_page_query': urlencode({**filters, 'after': next_cursor}) if next_cursor else '',
+            'first_page_query': urlencode(filters),
+            'is_first_page': cursor is None,
+            'selected_question': question_id,
+            'selected_team': team,
+            'questions': TreasureHuntQuestion.objects.filter(is_active=True).only('id', 'order', 'question_text'),
+            'teams': teams,
             'opts': PlayerAnswer._meta,
         }
         return render(request, 'admin/approve_answers.html', context)
@@ -194,31 +269,92 @@ class CustomAdminSite(admin.AdminSite):
     def approve_single_answer(self, request, answer_id):
         """AJAX endpoint to approve single answer"""
         if request.method == 'POST':
-            answer = get_object_or_404(PlayerAnswer, id=answer_id)
+            answer = get_object_or_404(PlayerAnswer.objects.select_related('player', 'question'), id=answer_id)
             action = request.POST.get('action')
             points = request.POST.get('points', answer.question.points)
+            previous_points = answer.points_awarded
             
             if action == 'approve':
                 answer.is_correct = True
                 answer.points_awarded = int(points)
+                answer.grading_status = 'reviewed'
                 answer.save()
                 
                 # Update player score
                 player = answer.player
-                player.score += answer.points_awarded
+                player.score = max(player.score + answer.points_awarded - previous_points, 0)
                 player.save()
                 
                 return JsonResponse({'status': 'success', 'message': 'Answer approved'})
             elif action == 'reject':
                 answer.is_correct = False
                 answer.points_awarded = 0
+                answer.grading_status = 'reviewed'
                 answer.save()
+                if previous_points:
+                    player = answer.player
+                    player.score = max(player.score - previous_points, 0)
+                    player.save()
                 return JsonResponse({'status': 'success', 'message': 'Answer rejected'})
         
         return JsonResponse({'status': 'error', 'message': 'Invalid request'})
     
+    def bulk_review_answers_view(self, request):
+        """AJAX endpoint to approve or reject many answers at once"""
+        from .grading import bulk_review_answers, exact_multiple_choice_matches
+        
+        if request.method != 'POST':
+            return JsonResponse({'status': 'error', 'message': 'Invalid request'})
+        
+        action = request.POST.get('action')
+        if request.POST.get('scope') == 'exact_multiple_choice':
+            answers = exact_multiple_choice_matches()
+            action = 'approve'
+        else:
+            answer_ids = [value for value in request.POST.getlist('answer_ids') if value.isdigit()]
+            answers = PlayerAnswer.objects.filter(pk__in=answer_ids)
+        
+        if action not in ('approve', 'reject'):
+            return JsonResponse({'status': 'error', 'message': 'Invalid action'})
+        
+        summary = bulk_review_answers(answers, approve=action == 'approve')
+        verb = 'approved' if action == 'approve' else 'rejected'
+        return JsonResponse({
+            'status': 'success',
+            'message': f"{summary['answers']} answers {verb}",
+            **summary,
+        })
+    
     def bulk_upload_questions_view(self, request):
-        """View to bulk upload questions"""
+        """View to add questions one at a time or import a whole file of them"""
+        from django.db.models import Max
+        from .question_import import QuestionImportError, import_questions, parse_questions, read_images
+        
+        if request.method == 'POST' and 'import_questions' in request.POST:
+            questions_file = request.FILES.get('questions_file')
+            images_zip = request.FILES.get('images_zip')
+            if not questions_file:
+                messages.error(request, 'Choose a CSV, JSON or YAML file to import.')
+                return redirect('custom_admin:bulk_upload_questions')
+            try:
+                rows = parse_questions(questions_file.read(), questions_file.name)
+                images = read_images(images_zip) if images_zip else {}
+                existing = 'update' if request.POST.get('update_existing') == 'on' else 'skip'
+                summary = import_questions(rows, images, existing=existing)
+            except QuestionImportError as e:
+                for error in e.errors[:20]:
+                    messages.error(request, error)
+                if len(e.errors) > 20:
+                    messages.error(request, f'... and {len(e.errors) - 20} more problems')
+                messages.error(request, 'Nothing was imported.')
+            else:
+                messages.success(
+                    request,
+                    f"✅ Imported {summary['created']} questions ({summary['updated']} updated, "
+                    f"{summary['skipped']} already present, {summary['images']} images)"
+                )
+            return redirect('custom_admin:bulk_upload_questions')
+        
         if request.method == 'POST':
             # Handle form submission for adding questions
             question_text = request.POST.get('question_text')
@@ -234,11 +370,13 @@ class CustomAdminSite(admin.AdminSite):
             option_d = request.POST.get('option_d', '')
             
             if question_text and question_type:
+                if not order:
+                    order = (TreasureHuntQuestion.objects.aggregate(highest=Max('order'))['highest'] or 0) + 1
                 question = TreasureHuntQuestion.objects.create(
                     question_text=question_text,
                     question_type=question_type,
                     points=int(points),
-                    order=int(order) if order else TreasureHuntQuestion.objects.count() + 1,
+                    order=int(order),
                     correct_answer=correct_answer,
                     option_a=option_a,
                     option_b=option_b,
@@ -246,10 +384,10 @@ class CustomAdminSite(admin.AdminSite):
                     option_d=option_d,
                 )
                 messages.success(request, f'Question {question.order} added successfully')
-                return redirect('admin:bulk_upload_questions')
+                return redirect('custom_admin:bulk_upload_questions')
         
-        questions = TreasureHuntQuestion.objects.all().order_by('order')
-        next_order = questions.count() + 1
+        questions = list(TreasureHuntQuestion.objects.all().order_by('order'))
+        next_order = (questions[-1].order if questions else 0) + 1
         
         context = {
             'title': 'Manage Questions',
@@ -278,7 +416,7 @@ class CustomAdminSite(admin.AdminSite):
                         voting_enabled=voting_enabled
                     )
                     messages.success(request, f'Event "{name}" created successfully')
-                    return redirect('admin:manage_events')
+                    return redirect('custom_admin:manage_events')
             
             # Handle team participation
             elif 'add_participation' in request.POST:
@@ -295,33 +433,73 @@ class CustomAdminSite(admin.AdminSite):
                         messages.success(request, f'Team {participation.get_team_display()} added to {event.name}')
                     else:
                         messages.info(request, f'Team {participation.get_team_display()} already participating in {event.name}')
-                    return redirect('admin:manage_events')
+                    return redirect('custom_admin:manage_events')
+            
+            # Handle the enrollment matrix: many teams into many events at once
+            elif 'enroll_teams' in request.POST:
+                enrolled = self.enroll_teams(request.POST.getlist('enroll'))
+                if enrolled:
+                    messages.success(request, f'✅ Added {enrolled} team enrollments')
+                else:
+                    messages.info(request, 'No new team enrollments selected')
+                return redirect('custom_admin:manage_events')
         
-        events = Event.objects.all().order_by('-created_at')
         team_choices = Player.TEAM_CHOICES
+        teams = [choice for choice in team_choices if choice[0] != 'unassigned']
         
-        # Get participation data
+        # Participations for every event come from one prefetch query
+        events = Event.objects.order_by('-created_at').prefetch_related('eventparticipation_set')
         event_data = []
         for event in events:
-            participations = EventParticipation.objects.filter(event=event)
-            participating_teams = [p.team for p in participations]
+            participations = list(event.eventparticipation_set.all())
+            participating_teams = {p.team for p in participations}
             
             event_data.append({
                 'event': event,
                 'participations': participations,
                 'participating_teams': participating_teams,
-                'available_teams': [t for t in team_choices if t[0] not in participating_teams and t[0] != 'unassigned']
+                'available_teams': [t for t in teams if t[0] not in participating_teams],
+                'team_cells': [(code, name, code in participating_teams) for code, name in teams],
             })
         
         context = {
             'title': 'Manage Events',
             'event_data': event_data,
             'team_choices': team_choices,
+            'teams': teams,
             'event_types': Event.EVENT_TYPES,
             'opts': Event._meta,
         }
         return render(request, 'admin/manage_events.html', context)
     
+    def enroll_teams(self, pairs):
+        """
+        Enroll teams into events from "<event id>:<team code>" values in one
+        transaction; pairs that are already enrolled are ignored.
+        Returns the number of new enrollments.
+        """
+        from django.db import transaction
+        
+        team_codes = {code for code, _ in Player.TEAM_CHOICES if code != 'unassigned'}
+        wanted = set()
+        for pair in pairs:
+            event_id, _, team = pair.partition(':')
+            if event_id.isdigit() and team in team_codes:
+                wanted.add((int(event_id), team))
+        if not wanted:
+            return 0
+        
+        event_ids = set(Event.objects.filter(pk__in={event_id for event_id, _ in wanted}).values_list('pk', flat=True))
+        with transaction.atomic():
+            existing = set(EventParticipation.objects.filter(event_id__in=event_ids).values_list('event_id', 'team'))
+            new = [
+                EventParticipation(event_id=event_id, team=team)
+                for event_id, team in sorted(wanted)
+                if event_id in event_ids and (event_id, team) not in existing
+            ]
+            EventParticipation.objects.bulk_create(new, ignore_conflicts=True)
+        return len(new)
+    
     def event_scoring_view(self, request, event_id):
         """View to assign points to teams for specific event"""
         event = get_object_or_404(Event, id=event_id)
@@ -357,16 +535,10 @@ class CustomAdminSite(admin.AdminSite):
                 except ValueError:
                     messages.error(request, 'Please enter a valid number for points')
         
-        # Get participating teams and their scores
+        # Get participating teams and their scores (one query for all the scores)
         participations = EventParticipation.objects.filter(event=event)
-        team_scores = {}
-        
-        for participation in participations:
-            try:
-                score = EventScore.objects.get(event=event, team=participation.team)
-                team_scores[participation.team] = score
-            except EventScore.DoesNotExist:
-                team_scores[participation.team] = None
+        scores = {score.team: score for score in EventScore.objects.filter(event=event)}
+        team_scores = {participation.team: scores.get(participation.team) for participation in participations}
         
         # Get all teams for dropdown (in case admin wants to add score for non-participating team)
         all_teams = [(code, name) for code, name in Player.TEAM_CHOICES if code != 'unassigned']
@@ -380,6 +552,143 @@ class CustomAdminSite(admin.AdminSite):
         }
         return render(request, 'admin/event_scoring.html', context)
     
+    def score_grid_view(self, request):
+        """Enter team scores for every event × team at once, saved in one request"""
+        from django.core.exceptions import ValidationError
+        from .scoring import submit_score_grid
+        
+        teams = [(code, name) for code, name in Player.TEAM_CHOICES if code != 'unassigned']
+        events = list(Event.objects.filter(is_active=True, participation_type__in=['team', 'both']).order_by('name'))
+        
+        errors = []
+        if request.method == 'POST':
+            cells = []
+            for key in request.POST:
+                if key.startswith('points-'):
+                    event_id, _, team = key[len('points-'):].partition('-')
+                    cells.append({
+                        'event': event_id,
+                        'team': team,
+                        'points': request.POST.get(key),
+                        'notes': request.POST.get(f'notes-{event_id}-{team}', ''),
+                        # Cells rendered with a participant picker always report their selection
+                        'players': request.POST.getlist(f'players-{event_id}-{team}')
+                        if f'{event_id}:{team}' in request.POST.getlist('pickers') else None,
+                    })
+            try:
+                result = submit_score_grid(cells, request.user.username)
+            except ValidationError as e:
+                errors = e.messages
+            else:
+                if result['scores']:
+                    messages.success(
+                        request,
+                        f"✅ Saved {result['scores']} scores and refreshed {result['players']} player totals"
+                    )
+                else:
+                    messages.info(request, 'No score changes to save')
+                return redirect('custom_admin:score_grid')
+        
+        # Current scores, participants and team rosters: one query each
+        scores = {
+            (score.event_id, score.team): score
+            for score in EventScore.objects.filter(event__in=events)
+        }
+        participants = set(
+            TeamEventParticipation.objects.filter(event_score__event__in=events, participated=True)
+            .values_list('event_score__event_id', 'event_score__team', 'player_id')
+        )
+        enrolled = set(EventParticipation.objects.filter(event__in=events).values_list('event_id', 'team'))
+        roster = {}
+        for player in Player.objects.filter(is_active=True).exclude(team='unassigned').order_by('name').only('pk', 'name', 'team'):
+            roster.setdefault(player.team, []).append(player)
+        
+        rows = []
+        for event in events:
+            cells = []
+            for code, name in teams:
+                score = scores.get((event.pk, code))
+                key = f'{event.pk}-{code}'
+                if errors:
+                    # Keep what was typed so a rejected grid can be corrected and resubmitted
+                    points = request.POST.get(f'points-{key}', '')
+                    notes = request.POST.get(f'notes-{key}', '')
+                    selected = {int(pk) for pk in request.POST.getlist(f'players-{key}') if pk.isdigit()}
+                else:
+                    points = score.points if score else ''
+                    notes = score.notes if score else ''
+                    selected = {player.pk for player in roster.get(code, []) if (event.pk, code, player.pk) in participants}
+                cells.append({
+                    'key': key,
+                    'picker': f'{event.pk}:{code}',
+                    'team_name': name,
+                    'enrolled': (event.pk, code) in enrolled,
+                    'points': points,
+                    'notes': notes,
+                    'players': [(player, player.pk in selected) for player in roster.get(code, [])],
+                    'selected_count': len(selected),
+                })
+            rows.append({'event': event, 'cells': cells})
+        
+        context = {
+            'title': 'Score Grid',
+            'teams': teams,
+            'rows': rows,
+            'errors': errors,
+            'opts': EventScore._meta,
+        }
+        return render(request, 'admin/score_grid.html', context)
+    
+    def import_roster_view(self, request):
+        """Check in a whole guest list at once and spread unassigned players across the teams"""
+        from .roster import RosterImportError, assign_balanced_teams, get_active_teams, import_roster, parse_roster
+        
+        if request.method == 'POST' and 'import_roster' in request.POST:
+            roster_file = request.FILES.get('roster_file')
+            if not roster_file:
+                messages.error(request, 'Choose a CSV file of names to import.')
+                return redirect('custom_admin:import_roster')
+            try:
+                existing = 'update' if request.POST.get('update_existing') == 'on' else 'skip'
+                summary = import_roster(parse_roster(roster_file.read()), existing=existing)
+            except RosterImportError as e:
+                for error in e.errors[:20]:
+                    messages.error(request, error)
+                if len(e.errors) > 20:
+                    messages.error(request, f'... and {len(e.errors) - 20} more problems')
+                messages.error(request, 'Nothing was imported.')
+                return redirect('custom_admin:import_roster')
+            messages.success(
+                request,
+                f"✅ Imported {summary['created']} players ({summary['updated']} updated, "
+                f"{summary['skipped']} already registered)"
+            )
+            if request.POST.get('assign_teams') != 'on':
+                return redirect('custom_admin:import_roster')
+        
+        if request.method == 'POST' and ('assign_teams' in request.POST or 'balance_teams' in request.POST):
+            added = assign_balanced_teams(by_score=request.POST.get('by_score') == 'on')
+            if added:
+                teams = get_active_teams()
+                summary = ', '.join(f'{teams[code]}: {count}' for code, count in added.items())
+                messages.success(request, f'✅ Assigned {sum(added.values())} players to teams ({summary})')
+            else:
+                messages.info(request, 'No unassigned players to place')
+            return redirect('custom_admin:import_roster')
+        
+        teams = get_active_teams()
+        counts = dict(
+            Player.objects.filter(is_active=True).order_by().values('team').annotate(members=Count('pk'))
+            .values_list('team', 'members')
+        )
+        context = {
+            'title': 'Import Roster',
+            'team_counts': [(name, counts.get(code, 0)) for code, name in teams.items()],
+            'unassigned': counts.get('unassigned', 0),
+            'opts': Player._meta,
+        }
+        return render(request, 'admin/import_roster.html', context)
+    
     class Media:
         js = ('js/admin_custom.js',)
         css = {
@@ -402,17 +711,23 @@ admin_site = CustomAdminSite(name='custom_admin')
 
 
 @admin.register(Player, site=admin_site)
-class PlayerAdmin(admin.ModelAdmin):
+class PlayerAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ['name', 'get_team_display_name', 'get_online_status', 'score', 'current_level', 'is_active', 'created_at']
     list_filter = ['team', 'is_active', 'is_online', 'has_completed_hunt', 'created_at']
     search_fields = ['name']
     readonly_fields = ['created_at', 'last_activity', 'session_key']
-    actions = ['activate_players', 'deactivate_players', 'reset_scores', 'assign_to_team_1', 'assign_to_team_2', 'assign_to_team_3', 'assign_to_team_4']
+    actions = ['activate_players', 'deactivate_players', 'reset_scores', 'assign_balanced_teams',
+               'assign_balanced_teams_by_score', 'assign_to_team_1', 'assign_to_team_2', 'assign_to_team_3',
+               'assign_to_team_4']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(team_name=TeamConfiguration.name_subquery())
     
     def get_team_display_name(self, obj):
         """Show custom team name from TeamConfiguration"""
-        return obj.get_team_display()
+        return team_name(obj)
     get_team_display_name.short_description = 'Team'
+    get_team_display_name.admin_order_field = 'team'
     
     def get_online_status(self, obj):
         if obj.is_online:
@@ -436,6 +751,18 @@ class PlayerAdmin(admin.ModelAdmin):
         self.message_user(request, f"Reset scores for {queryset.count()} players")
     reset_scores.short_description = "Reset scores for selected players"
     
+    def assign_balanced_teams(self, request, queryset):
+        from .roster import assign_balanced_teams
+        added = assign_balanced_teams(queryset.filter(is_active=True))
+        self.message_user(request, f"Spread {sum(added.values())} players evenly across the teams")
+    assign_balanced_teams.short_description = "Spread selected players evenly across teams"
+    
+    def assign_balanced_teams_by_score(self, request, queryset):
+        from .roster import assign_balanced_teams
+        added = assign_balanced_teams(queryset.filter(is_active=True), by_score=True)
+        self.message_user(request, f"Spread {sum(added.values())} players across the teams, balancing scores")
+    assign_balanced_teams_by_score.short_description = "Spread selected players evenly across teams (balance scores)"
+    
     def assign_to_team_1(self, request, queryset):
         queryset.update(team='team_1')
         self.message_user(request, f"Assigned {queryset.count()} players to Team 1")
@@ -466,7 +793,7 @@ class GameSessionAdmin(admin.ModelAdmin):
 
 
 @admin.register(TreasureHuntQuestion, site=admin_site)
-class TreasureHuntQuestionAdmin(admin.ModelAdmin):
+class TreasureHuntQuestionAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ['order', 'question_text_short', 'question_type', 'image_preview', 'points', 'is_active', 'answers_count']
     list_filter = ['question_type', 'is_active']
     search_fields = ['question_text']
@@ -488,6 +815,12 @@ class TreasureHuntQuestionAdmin(admin.ModelAdmin):
             'description': 'Only fill these fields for multiple choice questions.',
             'classes': ('collapse',),
         }),
+        ('Automatic Grading', {
+            'fields': ('auto_grade', 'accepted_answers', 'match_threshold'),
+            'description': 'Answers matching the correct answer (or any accepted answer) are approved automatically. '
+                           'Everything else waits in the approval queue.',
+            'classes': ('collapse',),
+        }),
     )
     
     readonly_fields = ['image_preview_large']
@@ -514,9 +847,13 @@ class TreasureHuntQuestionAdmin(admin.ModelAdmin):
         return format_html('<span style="color: #999;">No image uploaded</span>')
     image_preview_large.short_description = 'Image Preview'
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(answers_total=Count('playeranswer'))
+    
     def answers_count(self, obj):
-        return obj.playeranswer_set.count()
+        return obj.answers_total
     answers_count.short_description = 'Answers Received'
+    answers_count.admin_order_field = 'answers_total'
     
     def activate_questions(self, request, queryset):
         queryset.update(is_active=True)
@@ -546,12 +883,12 @@ class TreasureHuntQuestionAdmin(admin.ModelAdmin):
 
 
 @admin.register(PlayerAnswer, site=admin_site)
-class PlayerAnswerAdmin(admin.ModelAdmin):
+class PlayerAnswerAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ['player', 'question_order', 'answer_preview', 'approval_status', 'points_awarded', 'submitted_at', 'action_buttons']
-    list_filter = ['is_correct', 'submitted_at', 'question__question_type']
+    list_filter = ['is_correct', 'grading_status', 'google_photos_status', 'submitted_at', 'question__question_type']
     search_fields = ['player__name', 'question__question_text', 'text_answer']
-    readonly_fields = ['submitted_at']
-    actions = ['approve_answers', 'reject_answers']
+    readonly_fields = ['submitted_at', 'grading_confidence', 'google_photos_attempts', 'google_photos_error']
+    actions = ['approve_answers', 'reject_answers', 'approve_exact_multiple_choice', 'regrade_answers', 'retry_google_photos_backup']
     
     def question_order(self, obj):
         return f"Q{obj.question.order}"
@@ -562,22 +899,27 @@ class PlayerAnswerAdmin(admin.ModelAdmin):
             preview = obj.text_answer[:50] + "..." if len(obj.text_answer) > 50 else obj.text_answer
             return preview
         elif obj.photo_answer:
-            return format_html('<a href="{}" target="_blank">View Photo</a>', obj.photo_answer.url)
+            return format_html(
+                '<a href="{}" target="_blank"><img src="{}" style="width: 50px; height: 50px; object-fit: cover; border-radius: 5px;" loading="lazy"/></a>',
+                obj.review_url, obj.thumbnail_url
+            )
         return "No answer"
     answer_preview.short_description = 'Answer'
     
     def approval_status(self, obj):
         if obj.is_correct:
-            return format_html('<span style="color: green;">✓ Approved</span>')
-        elif obj.points_awarded == 0:
+            label = 'Auto-approved' if obj.grading_status == 'auto_approved' else 'Approved'
+            return format_html('<span style="color: green;">✓ {}</span>', label)
+        elif obj.grading_status == 'pending':
             return format_html('<span style="color: orange;">⏳ Pending</span>')
         else:
-            return format_html('<span style="color: red;">✗ Rejected</span>')
+            label = 'Auto-rejected' if obj.grading_status == 'auto_rejected' else 'Rejected'
+            return format_html('<span style="color: red;">✗ {}</span>', label)
     approval_status.short_description = 'Status'
     
     def action_buttons(self, obj):
         """Action buttons for approving/rejecting answers - only available in custom admin"""
-        if not obj.is_correct and obj.points_awarded == 0:
+        if obj.grading_status == 'pending':
             return format_html(
                 '<span style="color: orange;">Pending Review</span>'
             )
@@ -588,21 +930,47 @@ class PlayerAnswerAdmin(admin.ModelAdmin):
     action_buttons.short_description = 'Status'
     
     def approve_answers(self, request, queryset):
-        for answer in queryset:
-            if not answer.is_correct:
-                answer.is_correct = True
-                answer.points_awarded = answer.question.points
-                answer.save()
-                # Update player score
-                answer.player.score += answer.points_awarded
-                answer.player.save()
-        self.message_user(request, f"Approved {queryset.count()} answers")
+        from .grading import bulk_review_answers
+        summary = bulk_review_answers(queryset, approve=True)
+        self.message_user(request, f"Approved {summary['answers']} answers ({summary['players']} player scores updated)")
     approve_answers.short_description = "Approve selected answers"
     
     def reject_answers(self, request, queryset):
-        queryset.update(is_correct=False, points_awarded=0)
-        self.message_user(request, f"Rejected {queryset.count()} answers")
+        from .grading import bulk_review_answers
+        summary = bulk_review_answers(queryset, approve=False)
+        self.message_user(request, f"Rejected {summary['answers']} answers ({summary['players']} player scores updated)")
     reject_answers.short_description = "Reject selected answers"
+    
+    def approve_exact_multiple_choice(self, request, queryset):
+        from .grading import bulk_review_answers, exact_multiple_choice_matches
+        summary = bulk_review_answers(exact_multiple_choice_matches(queryset), approve=True)
+        self.message_user(request, f"Approved {summary['answers']} exact multiple-choice matches")
+    approve_exact_multiple_choice.short_description = "Approve exact multiple-choice matches among selected"
+    
+    def regrade_answers(self, request, queryset):
+        from .grading import regrade_answers
+        summary = regrade_answers(queryset)
+        self.message_user(
+            request,
+            f"Regraded {queryset.count()} answers: {summary.get('auto_approved', 0)} approved, "
+            f"{summary.get('auto_rejected', 0)} rejected, {summary.get('pending', 0)} left for review"
+        )
+    regrade_answers.short_description = "Auto-grade selected answers"
+    
+    def retry_google_photos_backup(self, request, queryset):
+        from .photo_backup import is_backup_enabled, queue_backup
+        if not is_backup_enabled():
+            self.message_user(request, "Google Photos backup is disabled (GOOGLE_PHOTOS_ENABLED).", level=messages.WARNING)
+            return
+        queued = 0
+        for answer in queryset.exclude(photo_answer='').exclude(google_photos_status='done'):
+            if queue_backup(answer):
+                queued += 1
+        if queued:
+            self.message_user(request, f"☁️ Queued {queued} photos for Google Photos backup.")
+        else:
+            self.message_user(request, "No photos queued - the selected photos are already backed up.", level=messages.WARNING)
+    retry_google_photos_backup.short_description = "Retry Google Photos backup for selected photos"
 
 
 @admin.register(Event, site=admin_site)
@@ -623,13 +991,30 @@ class EventAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        # Counted in separate subqueries, so the two relations are never joined against each other
+        participations = EventParticipation.objects.filter(event=OuterRef('pk')).order_by().values('event')
+        votes = EventVote.objects.filter(event=OuterRef('pk')).order_by().values('event')
+        return super().get_queryset(request).annotate(
+            teams_total=Coalesce(Subquery(
+                participations.annotate(count=Count('pk')).values('count'),
+                output_field=IntegerField(),
+            ), 0),
+            votes_total=Coalesce(Subquery(
+                votes.annotate(count=Count('pk')).values('count'),
+                output_field=IntegerField(),
+            ), 0),
+        )
+    
     def participating_teams_count(self, obj):
-        return obj.eventparticipation_set.count()
+        return obj.teams_total
     participating_teams_count.short_description = 'Teams Participating'
+    participating_teams_count.admin_order_field = 'teams_total'
     
     def total_votes(self, obj):
-        return obj.eventvote_set.count()
+        return obj.votes_total
     total_votes.short_description = 'Total Votes Received'
+    total_votes.admin_order_field = 'votes_total'
     
     def enable_voting(self, request, queryset):
         queryset.update(voting_enabled=True)
@@ -689,6 +1074,12 @@ class EventVoteAdmin(admin.ModelAdmin):
         }),
     )
     
+    def delete_queryset(self, request, queryset):
+        # Bulk deletes skip EventVote.delete, so rebuild the affected aggregates
+        event_ids = set(queryset.values_list('event_id', flat=True))
+        super().delete_queryset(request, queryset)
+        VoteAggregate.rebuild(event_ids)
+    
     def total_score_display(self, obj):
         if obj.pk:
             return f"{obj.total_score}/40"
@@ -785,59 +1176,85 @@ class EventScoreAdmin(admin.ModelAdmin):
     def save_model(self, request, obj, form, change):
         if not obj.awarded_by:
             obj.awarded_by = request.user.username
-        super().save_model(request, obj, form, change)
+        # Player scores are refreshed once in save_related, after the participants are saved
+        obj.save(update_scores=False)
         
         # Auto-create participation records for team members if they don't exist
         if obj.team != 'unassigned':
-            team_players = Player.objects.filter(team=obj.team, is_active=True)
-            for player in team_players:
-                TeamEventParticipation.objects.get_or_create(
-                    event_score=obj,
-                    player=player,
-                    defaults={'participated': False}
-                )
-        
-        calc_type = "auto-calculated" if obj.auto_calculate_points else "manual"
-        participant_info = f" ({obj.participant_count} participants)" if obj.auto_calculate_points else ""
-        messages.success(
-            request, 
-            f"Score {calc_type}: {obj.points} points to {obj.get_team_display()} for {obj.event.name}{participant_info}"
-        )
+            TeamEventParticipation.objects.bulk_create(
+                [
+                    TeamEventParticipation(event_score=obj, player=player, participated=False)
+                    for player in Player.objects.filter(team=obj.team, is_active=True).only('pk')
+                ],
+                ignore_conflicts=True,
+            )
     
     def save_formset(self, request, form, formset, change):
-        """Handle saving of participation inline formset"""
+        """Save the participation inline with one bulk write per kind of change"""
+        from django.utils import timezone
+        
         instances = formset.save(commit=False)
+        now = timezone.now()
         
-        # Handle new/updated instances
-        for instance in instances:
-            # Avoid duplicate entries by using get_or_create
-            if hasattr(instance, 'event_score') and hasattr(instance, 'player'):
-                try:
-                    # Try to get existing participation record
-                    existing = TeamEventParticipation.objects.get(
-                        event_score=instance.event_score,
-                        player=instance.player
-                    )
-                    # Update existing record
-                    existing.participated = instance.participated
-                    existing.notes = instance.notes
-                    existing.save()
-                except TeamEventParticipation.DoesNotExist:
-                    # Create new record if it doesn't exist
-                    instance.save()
-            else:
-                instance.save()
+        # A row switched to another player is replaced by a row for that player: save_model may
+        # already have added one after validation, which an UPDATE of player would collide with
+        moved = {obj.pk for obj, fields in formset.changed_objects if 'player' in fields}
         
-        # Handle deletions
-        for obj in formset.deleted_objects:
-            obj.delete()
+        changed = [instance for instance in instances if instance.pk and instance.pk not in moved]
+        for instance in changed:
+            instance.updated_at = now
+        if changed:
+            TeamEventParticipation.objects.bulk_update(changed, ['participated', 'notes', 'updated_at'])
+        
+        deleted = [obj.pk for obj in formset.deleted_objects if obj.pk] + list(moved)
+        if deleted:
+            TeamEventParticipation.objects.filter(pk__in=deleted).delete()
+        
+        # New inline rows may be for players save_model already added a row for
+        added = [instance for instance in instances if not instance.pk or instance.pk in moved]
+        for instance in added:
+            instance.pk = None
+            instance._state.adding = True
+        if added:
+            TeamEventParticipation.objects.bulk_create(
+                added,
+                update_conflicts=True,
+                unique_fields=['event_score', 'player'],
+                update_fields=['participated', 'notes', 'updated_at'],
+            )
+        
+        formset.removed_players = {obj.player_id for obj in formset.deleted_objects}
+        formset.removed_players.update(
+            form.initial['player'] for form in formset.forms
+            if form.initial.get('player') and 'player' in form.changed_data
+        )
         
         # Handle many-to-many relationships
         formset.save_m2m()
+    
+    def save_related(self, request, form, formsets, change):
+        """Recalculate auto points and refresh the affected player scores once"""
+        from .scoring import refresh_player_scores
+        
+        super().save_related(request, form, formsets, change)
+        obj = form.instance
+        
+        if obj.auto_calculate_points and obj.points_per_participant > 0:
+            obj.points = obj.points_per_participant * obj.participant_count
+            EventScore.objects.filter(pk=obj.pk).update(points=obj.points)
         
-        # Recalculate points if auto-calculation is enabled
-        if form.instance.auto_calculate_points:
-            form.instance.save()  # This will trigger the auto-calculation
+        # Everyone with a row on this score, plus anyone whose row was removed
+        players = set(TeamEventParticipation.objects.filter(event_score=obj).values_list('player_id', flat=True))
+        for formset in formsets:
+            players.update(getattr(formset, 'removed_players', ()))
+        refresh_player_scores(players)
+        
+        calc_type = "auto-calculated" if obj.auto_calculate_points else "manual"
+        participant_info = f" ({obj.participant_count} participants)" if obj.auto_calculate_points else ""
+        messages.success(
+            request, 
+            f"Score {calc_type}: {obj.points} points to {obj.get_team_display()} for {obj.event.name}{participant_info}"
+        )
 
 
 # Hide TeamEventParticipation from main admin - it's for advanced event management only
@@ -878,7 +1295,7 @@ class IndividualParticipationAdmin(admin.ModelAdmin):
 
 
 @admin.register(IndividualEventScore, site=admin_site)
-class IndividualEventScoreAdmin(admin.ModelAdmin):
+class IndividualEventScoreAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ['player', 'event', 'points', 'team_points', 'awarded_by', 'awarded_at', 'notes_preview']
     list_filter = ['event', 'player__team', 'awarded_at']
     search_fields = ['player__name', 'event__name', 'notes', 'awarded_by']
@@ -922,7 +1339,7 @@ class IndividualEventScoreAdmin(admin.ModelAdmin):
 
 
 @admin.register(IndividualEventVote, site=admin_site)
-class IndividualEventVoteAdmin(admin.ModelAdmin):
+class IndividualEventVoteAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ['performing_player', 'event', 'voting_player', 'get_total_score', 'voted_at']
     list_filter = ['event', 'performing_player__team', 'voting_player__team', 'voted_at']
     search_fields = ['performing_player__name', 'voting_player__name', 'event__name']
@@ -943,6 +1360,12 @@ class IndividualEventVoteAdmin(admin.ModelAdmin):
         }),
     )
     
+    def delete_queryset(self, request, queryset):
+        # Bulk deletes skip IndividualEventVote.delete, so rebuild the affected aggregates
+        event_ids = set(queryset.values_list('event_id', flat=True))
+        super().delete_queryset(request, queryset)
+        IndividualVoteAggregate.rebuild(event_ids)
+    
     def get_total_score(self, obj):
         """Get total score safely for display"""
         if obj and obj.pk:
@@ -1008,8 +1431,14 @@ class SimpleEventScoreAdmin(admin.ModelAdmin):
             'all': ('css/admin_enhancements.css',)
         }
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('event').annotate(
+            team_name=TeamConfiguration.name_subquery(),
+            participants_total=Count('participants'),
+        )
+    
     def get_team_display(self, obj):
-        return obj.get_team_display()
+        return team_name(obj)
     get_team_display.short_description = "Team"
     get_team_display.admin_order_field = 'team'
     
@@ -1020,8 +1449,11 @@ class SimpleEventScoreAdmin(admin.ModelAdmin):
     auto_calc_status.short_description = "Calculation"
     
     def participant_count(self, obj):
-        return obj.participant_count
+        if not obj.pk:
+            return 0
+        return obj.participants_total
     participant_count.short_description = "Participants"
+    participant_count.admin_order_field = 'participants_total'
     
     def get_form(self, request, obj=None, **kwargs):
         form = super().get_form(request, obj, **kwargs)
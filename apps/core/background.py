@@ -0,0 +1,84 @@
+"""
+Background task dispatch for the core app.
+
+Tasks are Celery tasks (see tasks.py). When Celery is not the configured
+backend, or the broker cannot be reached, they run on a small in-process
+thread pool instead so requests never wait for slow work.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Shared thread pool used when no Celery broker is available"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'BACKGROUND_TASK_THREADS', 4),
+                    thread_name_prefix='onam-background',
+                )
+    return _executor
+
+
+def _run_in_thread(task, args, kwargs):
+    """Run a task on a pool thread with its own database connection"""
+    close_old_connections()
+    try:
+        task(*args, **kwargs)
+    except Exception as e:
+        logger.error(f"Background task {task.name} failed: {e}")
+    finally:
+        close_old_connections()
+
+
+def run_task(task, *args, **kwargs):
+    """Run a task now using the configured backend"""
+    backend = getattr(settings, 'BACKGROUND_TASK_BACKEND', 'thread')
+
+    if backend == 'sync':
+        return task(*args, **kwargs)
+
+    if backend == 'celery':
+        try:
+            return task.apply_async(args=args, kwargs=kwargs, retry=False)
+        except Exception as e:
+            logger.warning(f"Celery broker unavailable for {task.name}, using thread pool: {e}")
+
+    return get_executor().submit(_run_in_thread, task, args, kwargs)
+
+
+def run_task_later(task, delay, *args, **kwargs):
+    """Run a task after `delay` seconds (used for retries with backoff)"""
+    backend = getattr(settings, 'BACKGROUND_TASK_BACKEND', 'thread')
+
+    if backend == 'sync':
+        # Left for the periodic sweep to pick up
+        return None
+
+    if backend == 'celery':
+        try:
+            return task.apply_async(args=args, kwargs=kwargs, countdown=delay, retry=False)
+        except Exception as e:
+            logger.warning(f"Celery broker unavailable for {task.name}, using a timer: {e}")
+
+    timer = threading.Timer(delay, run_task, args=(task,) + args, kwargs=kwargs)
+    timer.daemon = True
+    timer.start()
+    return timer
+
+
+def dispatch(task, *args, **kwargs):
+    """Queue a task once the current database transaction commits"""
+    transaction.on_commit(lambda: run_task(task, *args, **kwargs))
@@ -0,0 +1,242 @@
+"""
+Ballot submission for event voting.
+
+A ballot carries all of a voter's scores for one event: team votes (cast on
+behalf of the voter's team) and individual performance votes. The ballot is
+validated as a whole and written with one upsert per vote model; the running
+vote aggregates are adjusted with one grouped UPDATE instead of per-vote
+save() calls. The aggregate rows a ballot touches are locked before its
+previous votes are read, so concurrent ballots from the same team cannot
+both count as new votes.
+"""
+
+import logging
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+logger = logging.getLogger(__name__)
+
+MIN_SCORE = 1
+MAX_SCORE = 10
+
+
+def _clean_scores(vote, score_fields, label, errors):
+    """Scores of one vote as ints, recording an error for each bad one"""
+    scores = {}
+    for field in score_fields:
+        value = vote.get(field)
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            errors.append(f'{label}: {field} is required')
+            continue
+        if not MIN_SCORE <= value <= MAX_SCORE:
+            errors.append(f'{label}: {field} must be between {MIN_SCORE} and {MAX_SCORE}')
+            continue
+        scores[field] = value
+    return scores
+
+
+def validate_ballot(event, player, team_votes=(), individual_votes=()):
+    """
+    Check a whole ballot and return (EventVote, IndividualEventVote) instances
+    ready to upsert, or raise ValidationError listing every problem.
+    """
+    from .models import (EventParticipation, EventVote, IndividualEventVote, IndividualParticipation,
+                         IndividualVoteAggregate, Player, VoteAggregate)
+
+    errors = []
+    if not event.is_active or not event.voting_enabled:
+        raise ValidationError('Voting is not open for this event.')
+    if not team_votes and not individual_votes:
+        raise ValidationError('The ballot is empty.')
+
+    team_rows = []
+    if team_votes:
+        if not event.allows_team_participation:
+            errors.append('This event does not take team votes.')
+        elif player.team == 'unassigned':
+            errors.append('You must be assigned to a team to vote for teams.')
+        else:
+            participating = set(EventParticipation.objects.filter(event=event).values_list('team', flat=True))
+            seen = set()
+            for vote in team_votes:
+                team = vote.get('performing_team')
+                label = f'Team {team}'
+                if team not in participating:
+                    errors.append(f'{label}: not taking part in this event')
+                    continue
+                if team == player.team:
+                    errors.append('Teams cannot vote for themselves.')
+                    continue
+                if team in seen:
+                    errors.append(f'{label}: voted for more than once')
+                    continue
+                seen.add(team)
+                scores = _clean_scores(vote, VoteAggregate.SCORE_TOTALS, label, errors)
+                if len(scores) == len(VoteAggregate.SCORE_TOTALS):
+                    team_rows.append(EventVote(
+                        event=event,
+                        voting_team=player.team,
+                        performing_team=team,
+                        comments=str(vote.get('comments') or '').strip(),
+                        **scores
+                    ))
+
+    individual_rows = []
+    if individual_votes:
+        if not event.allows_individual_participation:
+            errors.append('This event does not take individual votes.')
+        else:
+            performer_ids = set()
+            for vote in individual_votes:
+                try:
+                    performer_ids.add(int(vote.get('performing_player')))
+                except (TypeError, ValueError):
+                    pass
+            # Only players registered for the event can be voted for
+            performers = Player.objects.filter(
+                pk__in=IndividualParticipation.objects.filter(
+                    event=event, player_id__in=performer_ids
+                ).values('player_id')
+            ).in_bulk()
+
+            seen = set()
+            for vote in individual_votes:
+                try:
+                    performer = performers.get(int(vote.get('performing_player')))
+                except (TypeError, ValueError):
+                    performer = None
+                if performer is None:
+                    errors.append(f"Player {vote.get('performing_player')}: not taking part in this event")
+                    continue
+                label = performer.name
+                if performer.pk == player.pk:
+                    errors.append('Players cannot vote for themselves.')
+                    continue
+                if performer.team == player.team and player.team != 'unassigned':
+                    errors.append(f'{label}: team members cannot vote for each other')
+                    continue
+                if performer.pk in seen:
+                    errors.append(f'{label}: voted for more than once')
+                    continue
+                seen.add(performer.pk)
+                scores = _clean_scores(vote, IndividualVoteAggregate.SCORE_TOTALS, label, errors)
+                if len(scores) == len(IndividualVoteAggregate.SCORE_TOTALS):
+                    individual_rows.append(IndividualEventVote(
+                        event=event,
+                        voting_player=player,
+                        performing_player=performer,
+                        comments=str(vote.get('comments') or '').strip(),
+                        **scores
+                    ))
+
+    if errors:
+        raise ValidationError(errors)
+    return team_rows, individual_rows
+
+
+def _aggregate_deltas(previous, rows, key, score_totals):
+    """Per-target changes to vote_count and the running totals"""
+    deltas = {}
+    for row in rows:
+        target = getattr(row, key)
+        old = previous.get(target)
+        delta = deltas.setdefault(target, {'vote_count': 0, **{total: 0 for total in score_totals.values()}})
+        # Incomplete votes were never counted in the aggregate
+        if old is not None and all(old[field] is not None for field in score_totals):
+            delta['vote_count'] -= 1
+            for field, total in score_totals.items():
+                delta[total] -= old[field]
+        delta['vote_count'] += 1
+        for field, total in score_totals.items():
+            delta[total] += getattr(row, field)
+    return deltas
+
+
+def _lock_aggregates(model, event_id, key, targets):
+    """
+    Create any missing aggregate rows for `targets` and lock them all, so
+    concurrent ballots for the same targets are applied one after another
+    even when none of their votes exist yet
+    """
+    model.objects.bulk_create(
+        [model(event_id=event_id, **{key: target}) for target in targets],
+        ignore_conflicts=True,
+    )
+    # Always locked in the same order, so two ballots cannot deadlock
+    list(model.objects.select_for_update().filter(event_id=event_id, **{f'{key}__in': targets}).order_by(key))
+
+
+def _apply_aggregate_deltas(model, event_id, key, deltas):
+    """Apply all changes to the (locked) aggregate rows with one grouped UPDATE"""
+    if not deltas:
+        return
+    changes = {
+        column: F(column) + Case(
+            *[When(**{key: target}, then=Value(delta[column])) for target, delta in deltas.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+        for column in next(iter(deltas.values()))
+    }
+    model.objects.filter(event_id=event_id, **{f'{key}__in': list(deltas)}).update(**changes)
+
+
+def submit_ballot(event, player, team_votes=(), individual_votes=()):
+    """
+    Validate and save a ballot. Existing votes by the same voter are updated
+    in place. Returns {'team_votes': n, 'individual_votes': n}.
+    """
+    from .models import EventVote, IndividualEventVote, IndividualVoteAggregate, VoteAggregate
+
+    team_rows, individual_rows = validate_ballot(event, player, team_votes, individual_votes)
+
+    with transaction.atomic():
+        if team_rows:
+            teams = [row.performing_team for row in team_rows]
+            _lock_aggregates(VoteAggregate, event.pk, 'performing_team', teams)
+            previous = {
+                vote['performing_team']: vote
+                for vote in EventVote.objects.filter(
+                    event=event, voting_team=player.team, performing_team__in=teams
+                ).values('performing_team', *VoteAggregate.SCORE_TOTALS)
+            }
+            EventVote.objects.bulk_create(
+                team_rows,
+                update_conflicts=True,
+                unique_fields=['event', 'voting_team', 'performing_team'],
+                update_fields=[*VoteAggregate.SCORE_TOTALS, 'comments'],
+            )
+            _apply_aggregate_deltas(
+                VoteAggregate, event.pk, 'performing_team',
+                _aggregate_deltas(previous, team_rows, 'performing_team', VoteAggregate.SCORE_TOTALS),
+            )
+
+        if individual_rows:
+            performer_ids = [row.performing_player_id for row in individual_rows]
+            _lock_aggregates(IndividualVoteAggregate, event.pk, 'performing_player_id', performer_ids)
+            previous = {
+                vote['performing_player_id']: vote
+                for vote in IndividualEventVote.objects.filter(
+                    event=event, voting_player=player, performing_player_id__in=performer_ids
+                ).values('performing_player_id', *IndividualVoteAggregate.SCORE_TOTALS)
+            }
+            IndividualEventVote.objects.bulk_create(
+                individual_rows,
+                update_conflicts=True,
+                unique_fields=['event', 'voting_player', 'performing_player'],
+                update_fields=[*IndividualVoteAggregate.SCORE_TOTALS, 'comments'],
+            )
+            _apply_aggregate_deltas(
+                IndividualVoteAggregate, event.pk, 'performing_player_id',
+                _aggregate_deltas(previous, individual_rows, 'performing_player_id', IndividualVoteAggregate.SCORE_TOTALS),
+            )
+
+    logger.info(
+        f"Ballot from {player.name} for {event.name}: "
+        f"{len(team_rows)} team votes, {len(individual_rows)} individual votes"
+    )
+    return {'team_votes': len(team_rows), 'individual_votes': len(individual_rows)}
@@ -0,0 +1,83 @@
+"""
+Admin dashboard statistics.
+
+All the numbers come from one grouped query over players, with the
+pending answer and question counts folded in as scalar subqueries. The
+result is cached for DASHBOARD_STATS_CACHE_SECONDS and dropped whenever a
+player's presence flips or an answer is written.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Func, IntegerField, Q, Subquery
+
+DASHBOARD_STATS_CACHE_KEY = 'admin:dashboard_stats'
+
+
+def invalidate_dashboard_stats():
+    cache.delete(DASHBOARD_STATS_CACHE_KEY)
+
+
+def _count(queryset):
+    """A queryset's row count as a scalar subquery"""
+    return Subquery(
+        queryset.order_by().annotate(count=Func(F('pk'), function='COUNT')).values('count'),
+        output_field=IntegerField(),
+    )
+
+
+def compute_dashboard_stats():
+    from .models import Player, PlayerAnswer, TeamConfiguration, TreasureHuntQuestion
+
+    rows = list(
+        Player.objects.order_by().values('team').annotate(
+            active=Count('pk', filter=Q(is_active=True)),
+            online=Count('pk', filter=Q(is_online=True)),
+            pending_answers=_count(PlayerAnswer.objects.filter(grading_status='pending')),
+            total_questions=_count(TreasureHuntQuestion.objects.filter(is_active=True)),
+        )
+    )
+    if rows:
+        pending_answers, total_questions = rows[0]['pending_answers'], rows[0]['total_questions']
+    else:
+        # No players yet, so the grouped query has no row to carry the counts
+        pending_answers = PlayerAnswer.objects.filter(grading_status='pending').count()
+        total_questions = TreasureHuntQuestion.objects.filter(is_active=True).count()
+
+    # Every configured team is listed, plus any team code players still carry
+    team_names = {code: name for code, name in Player.TEAM_CHOICES if code != 'unassigned'}
+    team_names.update(
+        TeamConfiguration.objects.filter(is_active=True).exclude(team_code='unassigned').values_list('team_code', 'team_name')
+    )
+    by_team = {row['team']: row for row in rows}
+    for code in by_team:
+        team_names.setdefault(code, code)
+    team_names.pop('unassigned', None)
+
+    return {
+        'pending_answers': pending_answers,
+        'total_questions': total_questions,
+        'total_players': sum(row['active'] for row in rows),
+        'online_players': sum(row['online'] for row in rows),
+        'unassigned_players': by_team.get('unassigned', {}).get('active', 0),
+        'team_stats': [
+            {
+                'code': code,
+                'name': name,
+                'total': by_team.get(code, {}).get('active', 0),
+                'online': by_team.get(code, {}).get('online', 0),
+            }
+            for code, name in sorted(team_names.items())
+        ],
+    }
+
+
+def get_dashboard_stats():
+    timeout = getattr(settings, 'DASHBOARD_STATS_CACHE_SECONDS', 5)
+    if not timeout:
+        return compute_dashboard_stats()
+    stats = cache.get(DASHBOARD_STATS_CACHE_KEY)
+    if stats is None:
+        stats = compute_dashboard_stats()
+        cache.set(DASHBOARD_STATS_CACHE_KEY, stats, timeout)
+    return stats
@@ -0,0 +1,286 @@
+"""
+Result exports for organisers.
+
+Each export is a header row plus a lazy stream of value tuples read with
+values_list(...).iterator(chunk_size=...), so only one chunk of rows is in
+memory at a time. CSV is streamed straight to the client; XLSX (needs
+openpyxl) is written row by row by a write-only workbook into a temporary
+file, which is then streamed.
+"""
+
+import csv
+import datetime
+import logging
+import tempfile
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Sum
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+class ExportUnavailable(Exception):
+    """The requested export format cannot be produced here"""
+
+
+def _chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+def _rows(queryset, fields):
+    """(headers, rows) for a values_list projection of `fields` ({header: lookup})"""
+    return list(fields), queryset.order_by('pk').values_list(*fields.values()).iterator(chunk_size=_chunk_size())
+
+
+def export_players():
+    from .models import Player
+
+    return _rows(Player.objects.all(), {
+        'id': 'pk',
+        'name': 'name',
+        'team': 'team',
+        'is_active': 'is_active',
+        'score': 'score',
+        'current_level': 'current_level',
+        'has_completed_hunt': 'has_completed_hunt',
+        'created_at': 'created_at',
+        'last_activity': 'last_activity',
+    })
+
+
+def export_answers():
+    from .models import PlayerAnswer
+
+    return _rows(PlayerAnswer.objects.all(), {
+        'id': 'pk',
+        'player_id': 'player_id',
+        'player': 'player__name',
+        'team': 'player__team',
+        'question_order': 'question__order',
+        'question': 'question__question_text',
+        'text_answer': 'text_answer',
+        'photo_answer': 'photo_answer',
+        'is_correct': 'is_correct',
+        'points_awarded': 'points_awarded',
+        'grading_status': 'grading_status',
+        'grading_confidence': 'grading_confidence',
+        'submitted_at': 'submitted_at',
+    })
+
+
+def export_event_votes():
+    from .models import EventVote
+
+    return _rows(EventVote.objects.all(), {
+        'id': 'pk',
+        'event_id': 'event_id',
+        'event': 'event__name',
+        'voting_team': 'voting_team',
+        'performing_team': 'performing_team',
+        'coordination_score': 'coordination_score',
+        'selection_score': 'selection_score',
+        'overall_score': 'overall_score',
+        'enjoyment_score': 'enjoyment_score',
+        'comments': 'comments',
+        'voted_at': 'voted_at',
+    })
+
+
+def export_individual_votes():
+    from .models import IndividualEventVote
+
+    return _rows(IndividualEventVote.objects.all(), {
+        'id': 'pk',
+        'event_id': 'event_id',
+        'event': 'event__name',
+        'voting_player': 'voting_player__name',
+        'voting_team': 'voting_player__team',
+        'performing_player': 'performing_player__name',
+        'performing_team': 'performing_player__team',
+        'skill_score': 'skill_score',
+        'creativity_score': 'creativity_score',
+        'presentation_score': 'presentation_score',
+        'overall_score': 'overall_score',
+        'comments': 'comments',
+        'voted_at': 'voted_at',
+    })
+
+
+def export_event_scores():
+    from .models import EventScore
+
+    return _rows(EventScore.objects.all(), {
+        'id': 'pk',
+        'event_id': 'event_id',
+        'event': 'event__name',
+        'team': 'team',
+        'points': 'points',
+        'points_per_participant': 'points_per_participant',
+        'auto_calculate_points': 'auto_calculate_points',
+        'notes': 'notes',
+        'awarded_by': 'awarded_by',
+        'awarded_at': 'awarded_at',
+    })
+
+
+def export_individual_scores():
+    from .models import IndividualEventScore
+
+    return _rows(IndividualEventScore.objects.all(), {
+        'id': 'pk',
+        'event_id': 'event_id',
+        'event': 'event__name',
+        'player_id': 'player_id',
+        'player': 'player__name',
+        'team': 'player__team',
+        'points': 'points',
+        'team_points': 'team_points',
+        'notes': 'notes',
+        'awarded_by': 'awarded_by',
+        'awarded_at': 'awarded_at',
+    })
+
+
+def export_standings():
+    """
+    Team standings as the leaderboard totals them: correct treasure hunt
+    points, each active event's team score and individual points carried
+    over to the team.
+    """
+    from .models import Event, IndividualEventScore, Player, PlayerAnswer, TeamConfiguration
+
+    teams = {code: name for code, name in Player.TEAM_CHOICES if code != 'unassigned'}
+    teams.update(TeamConfiguration.objects.filter(is_active=True).exclude(team_code='unassigned')
+                 .values_list('team_code', 'team_name'))
+
+    treasure = dict(
+        PlayerAnswer.objects.filter(is_correct=True, player__team__in=teams).order_by()
+        .values('player__team').annotate(total=Sum('points_awarded')).values_list('player__team', 'total')
+    )
+    individual = dict(
+        IndividualEventScore.objects.filter(player__team__in=teams).order_by()
+        .values('player__team').annotate(total=Sum('team_points')).values_list('player__team', 'total')
+    )
+    events = {code: 0.0 for code in teams}
+    for event in Event.objects.filter(is_active=True):
+        for code, scores in event.average_scores.items():
+            if code in events:
+                events[code] += scores['total']
+
+    standings = []
+    for code, name in teams.items():
+        treasure_hunt = treasure.get(code) or 0
+        individual_points = float(individual.get(code) or 0)
+        standings.append([code, name, treasure_hunt, round(events[code], 2), individual_points,
+                          round(treasure_hunt + events[code] + individual_points, 2)])
+    standings.sort(key=lambda row: row[-1], reverse=True)
+
+    headers = ['rank', 'team', 'team_name', 'treasure_hunt_points', 'event_points', 'individual_event_points', 'total']
+    return headers, ([rank] + row for rank, row in enumerate(standings, start=1))
+
+
+# name -> (title, export function)
+EXPORTS = {
+    'players': ('Players', export_players),
+    'answers': ('Treasure hunt answers', export_answers),
+    'event-votes': ('Team event votes', export_event_votes),
+    'individual-votes': ('Individual event votes', export_individual_votes),
+    'event-scores': ('Team event scores', export_event_scores),
+    'individual-scores': ('Individual event scores', export_individual_scores),
+    'standings': ('Team standings', export_standings),
+}
+
+
+# Text starting with one of these is read as a formula by spreadsheet programs
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _cell(value):
+    """A value as a spreadsheet can hold it"""
+    if isinstance(value, datetime.datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.replace(tzinfo=None)
+    if isinstance(value, Decimal):
+        return float(value)
+    if value is not None and not isinstance(value, (str, int, float, bool, datetime.date)):
+        return str(value)
+    return value
+
+
+def _csv_cell(value):
+    """
+    A value for a CSV file. Guest-entered text that would be read as a
+    formula is prefixed with an apostrophe so it stays plain text.
+    """
+    value = _cell(value)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+class Echo:
+    """File-like object that hands back what is written, for csv.writer over a stream"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(headers, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow([_csv_cell(value) for value in row])
+
+
+def csv_response(name, headers, rows):
+    response = StreamingHttpResponse(stream_csv(headers, rows), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{name}-{timezone.localdate():%Y%m%d}.csv"'
+    return response
+
+
+def xlsx_response(name, headers, rows):
+    try:
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+    except ImportError:
+        raise ExportUnavailable('XLSX export needs openpyxl (pip install openpyxl); use CSV instead')
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=name[:31])
+
+    def text_cell(value):
+        # Stored as a string cell, so text starting with = is never read as a formula
+        cell = WriteOnlyCell(sheet, value=value)
+        cell.data_type = 's'
+        return cell
+
+    sheet.append(headers)
+    for row in rows:
+        sheet.append([text_cell(value) if isinstance(value, str) else value for value in map(_cell, row)])
+
+    # The workbook is assembled on disk, never in memory, then streamed from there
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=f'{name}-{timezone.localdate():%Y%m%d}.xlsx',
+        content_type=XLSX_CONTENT_TYPE,
+    )
+
+
+def export_response(name, file_format='csv'):
+    """Download response for one of EXPORTS; raises KeyError for an unknown export"""
+    title, export = EXPORTS[name]
+    headers, rows = export()
+    logger.info(f"Exporting {title} as {file_format}")
+    if file_format == 'xlsx':
+        return xlsx_response(name, headers, rows)
+    return csv_response(name, headers, rows)
@@ -0,0 +1,192 @@
+"""
+Local stand-in for the Google Photos Library API.
+
+Implements the endpoints the backup path uses (uploads,
+mediaItems:batchCreate and albums:batchAddMediaItems) with configurable
+latency and error injection, so uploads can be tested and benchmarked
+without Google credentials.
+
+    server = FakeGooglePhotosServer(latency_ms=50, error_rate=0.05).start()
+    use_fake_google_photos(google_photos_service, server)
+    ...
+    server.stop()
+"""
+
+import json
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+FAKE_ALBUM_ID = 'fake-album'
+
+ALBUM_ADD_PATH = re.compile(r'^/v1/albums/(?P<album_id>[^/:]+):batchAddMediaItems$')
+
+
+class FakeCredentials:
+    """Always-valid credentials for the stand-in server"""
+    valid = True
+    token = 'fake-access-token'
+
+    def refresh(self, request):
+        pass
+
+
+class FakeGooglePhotosHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real API
+
+    def do_POST(self):
+        server = self.server.fake
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        server.delay()
+
+        if not self.headers.get('Authorization', '').startswith('Bearer '):
+            return self._send_json(401, {'error': {'code': 401, 'message': 'Missing access token'}})
+        if server.should_fail():
+            server.count('errors')
+            return self._send_json(503, {'error': {'code': 503, 'message': 'Injected failure'}})
+
+        if self.path == '/v1/uploads':
+            server.count('uploads')
+            return self._send(200, server.store_upload(body).encode(), 'text/plain')
+
+        if self.path == '/v1/mediaItems:batchCreate':
+            server.count('batch_creates')
+            return self._send_json(200, server.batch_create(json.loads(body or b'{}')))
+
+        match = ALBUM_ADD_PATH.match(self.path)
+        if match:
+            server.count('album_adds')
+            media_item_ids = json.loads(body or b'{}').get('mediaItemIds', [])
+            server.add_to_album(match.group('album_id'), media_item_ids)
+            return self._send_json(200, {})
+
+        return self._send_json(404, {'error': {'code': 404, 'message': f'Unknown endpoint {self.path}'}})
+
+    def _send_json(self, status, payload):
+        self._send(status, json.dumps(payload).encode(), 'application/json')
+
+    def _send(self, status, content, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class FakeGooglePhotosServer:
+    """
+    Threaded HTTP server mimicking the Google Photos Library API.
+    latency_ms/jitter_ms delay every response; error_rate is the share of
+    requests answered with 503.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency_ms=0, jitter_ms=0, error_rate=0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.stats = Counter()
+        self.uploads = {}
+        self.media_items = {}
+        self.albums = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self.httpd = ThreadingHTTPServer((host, port), FakeGooglePhotosHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.fake = self
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='fake-google-photos', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def delay(self):
+        latency = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if latency > 0:
+            time.sleep(latency / 1000)
+
+    def should_fail(self):
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+    def count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+            self.stats['requests'] += 1
+
+    def store_upload(self, content):
+        upload_token = f'upload-{uuid.uuid4().hex}'
+        with self._lock:
+            self.uploads[upload_token] = len(content)
+        return upload_token
+
+    def batch_create(self, body):
+        results = []
+        for new_item in body.get('newMediaItems', []):
+            simple_item = new_item.get('simpleMediaItem', {})
+            upload_token = simple_item.get('uploadToken')
+            with self._lock:
+                uploaded = self.uploads.pop(upload_token, None) is not None
+            if not uploaded:
+                results.append({
+                    'uploadToken': upload_token,
+                    'status': {'code': 3, 'message': 'Invalid upload token'},
+                })
+                continue
+
+            media_item_id = f'fake-{uuid.uuid4().hex}'
+            media_item = {
+                'id': media_item_id,
+                'description': new_item.get('description', ''),
+                'productUrl': f'{self.url}/lr/photo/{media_item_id}',
+                'baseUrl': f'{self.url}/media/{media_item_id}',
+                'mimeType': 'image/jpeg',
+                'filename': simple_item.get('fileName', ''),
+            }
+            with self._lock:
+                self.media_items[media_item_id] = media_item
+            results.append({
+                'uploadToken': upload_token,
+                'status': {'message': 'Success'},
+                'mediaItem': media_item,
+            })
+
+        if body.get('albumId'):
+            self.add_to_album(body['albumId'], [r['mediaItem']['id'] for r in results if 'mediaItem' in r])
+        return {'newMediaItemResults': results}
+
+    def add_to_album(self, album_id, media_item_ids):
+        with self._lock:
+            self.albums.setdefault(album_id, []).extend(media_item_ids)
+
+
+def use_fake_google_photos(service, server, album_id=FAKE_ALBUM_ID):
+    """Point a RenderGooglePhotosService at a running stand-in server"""
+    service.api_url = server.url
+    service.album_id = album_id
+    service.credentials = FakeCredentials()
+    return service
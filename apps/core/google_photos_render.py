@@ -1,19 +1,38 @@
 """
 Production-ready Google Photos service for Render deployment.
 Supports both OAuth 2.0 and Service Account authentication.
+
+All API calls go over one pooled requests session against
+GOOGLE_PHOTOS_API_URL, so the service can be pointed at the local
+stand-in in google_photos_fake.py for offline testing.
+
+Authentication is lazy: nothing is loaded until the first API call, and
+the access token is shared by all workers through the Django cache, so
+credentials are only parsed when the token actually needs refreshing.
 """
 
 import os
 import json
 import logging
-import tempfile
+import threading
+from datetime import datetime
 from typing import Optional, Dict, Any
 from django.conf import settings
+from django.core.cache import cache
 from django.core.files.storage import default_storage
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_API_URL = 'https://photoslibrary.googleapis.com'
+MAX_BATCH_CREATE = 50  # Google Photos limit for mediaItems.batchCreate
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+TOKEN_CACHE_KEY = 'google_photos_access_token'
+TOKEN_EXPIRY_MARGIN = 60  # seconds before expiry a cached token stops being used
+
 
 class RenderGooglePhotosService:
     """
@@ -24,9 +43,18 @@ class RenderGooglePhotosService:
     def __init__(self):
         self.album_id = getattr(settings, 'GOOGLE_PHOTOS_ALBUM_ID', None)
         self.album_url = f"https://photos.app.goo.gl/{self.album_id}" if self.album_id else None
-        self.service = None
+        self.api_url = getattr(settings, 'GOOGLE_PHOTOS_API_URL', DEFAULT_API_URL).rstrip('/')
         self.credentials = None
-        self.auth_type = self._detect_auth_type()
+        self._auth_type = None
+        self._auth_lock = threading.Lock()
+        self._session = None
+        self._session_lock = threading.Lock()
+    
+    @property
+    def auth_type(self):
+        if self._auth_type is None:
+            self._auth_type = self._detect_auth_type()
+        return self._auth_type
         
     def _detect_auth_type(self):
         """Detect whether to use service account or OAuth 2.0"""
@@ -38,6 +66,70 @@ class RenderGooglePhotosService:
         else:
             return 'oauth2'
     
+    def _retry(self, allowed_methods=Retry.DEFAULT_ALLOWED_METHODS):
+        return Retry(
+            total=getattr(settings, 'GOOGLE_PHOTOS_HTTP_RETRIES', 3),
+            backoff_factor=0.5,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=allowed_methods,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+    
+    def get_session(self):
+        """Pooled keep-alive HTTP session shared by all uploads"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    pool_size = getattr(settings, 'GOOGLE_PHOTOS_HTTP_POOL_SIZE', 10)
+                    session = requests.Session()
+                    # Idempotent requests only: a retried mediaItems:batchCreate could create duplicates
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=self._retry())
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    # Byte uploads only hand out an unused upload token, so they are retried too
+                    upload_adapter = HTTPAdapter(
+                        pool_connections=1, pool_maxsize=pool_size,
+                        max_retries=self._retry(allowed_methods=Retry.DEFAULT_ALLOWED_METHODS | {'POST'}),
+                    )
+                    session.mount(f'{self.api_url}/v1/uploads', upload_adapter)
+                    self._session = session
+        return self._session
+    
+    def _get_access_token(self):
+        """
+        Current access token. Shared by all workers through the Django cache;
+        credentials are only loaded and refreshed when no valid token is cached.
+        """
+        if self.credentials is not None and self.credentials.valid:
+            return self.credentials.token
+        
+        cache_key = f'{TOKEN_CACHE_KEY}:{self.auth_type}'
+        token = cache.get(cache_key)
+        if token:
+            return token
+        
+        with self._auth_lock:
+            if not self.authenticate():
+                raise Exception("Authentication failed")
+            if not self.credentials.valid:
+                from google.auth.transport.requests import Request
+                self.credentials.refresh(Request(session=self.get_session()))
+        
+        # google-auth expiry is a naive UTC datetime
+        expiry = getattr(self.credentials, 'expiry', None)
+        if expiry:
+            timeout = (expiry - datetime.utcnow()).total_seconds() - TOKEN_EXPIRY_MARGIN
+            if timeout > 0:
+                cache.set(cache_key, self.credentials.token, int(timeout))
+        return self.credentials.token
+    
+    def _forget_token(self):
+        """Drop a token the API rejected so the next call refreshes it"""
+        cache.delete(f'{TOKEN_CACHE_KEY}:{self.auth_type}')
+        if self.credentials is not None and hasattr(self.credentials, 'expiry'):
+            self.credentials.token = None
+    
     def is_configured(self):
         """Check if Google Photos is properly configured for production"""
         if not getattr(settings, 'GOOGLE_PHOTOS_ENABLED', False):
@@ -45,6 +137,10 @@ class RenderGooglePhotosService:
             
         if not self.album_id:
             return False
+        
+        # Already authenticated (or pointed at the local stand-in)
+        if self.credentials is not None:
+            return True
             
         if self.auth_type == 'service_account':
             return self._has_service_account_credentials()
@@ -68,7 +164,7 @@ class RenderGooglePhotosService:
     
     def authenticate(self):
         """Authenticate with Google Photos API"""
-        if self.service:
+        if self.credentials:
             return True
             
         try:
@@ -88,7 +184,6 @@ class RenderGooglePhotosService:
         """Authenticate using service account (preferred for production)"""
         try:
             from google.oauth2 import service_account
-            from googleapiclient.discovery import build
             
             SCOPES = ['https://www.googleapis.com/auth/photoslibrary']
             
@@ -114,7 +209,6 @@ class RenderGooglePhotosService:
                 logger.info("Using service account from file")
             
             self.credentials = credentials
-            self.service = build('photoslibrary', 'v1', credentials=credentials)
             return True
             
         except Exception as e:
@@ -127,7 +221,6 @@ class RenderGooglePhotosService:
             from google.auth.transport.requests import Request
             from google.oauth2.credentials import Credentials
             from google_auth_oauthlib.flow import InstalledAppFlow
-            from googleapiclient.discovery import build
             
             SCOPES = ['https://www.googleapis.com/auth/photoslibrary']
             
@@ -158,7 +251,6 @@ class RenderGooglePhotosService:
                     token.write(creds.to_json())
             
             self.credentials = creds
-            self.service = build('photoslibrary', 'v1', credentials=creds)
             return True
             
         except Exception as e:
@@ -180,56 +272,70 @@ class RenderGooglePhotosService:
     
     def _real_upload(self, photo_file, description: str, player_name: str, question_order: int) -> Optional[Dict[str, Any]]:
         """Perform real upload to Google Photos"""
-        if not self.authenticate():
-            raise Exception("Authentication failed")
+        upload_token = self.upload_media(photo_file)
         
-        # Save file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_file:
-            if hasattr(photo_file, 'read'):
-                photo_file.seek(0)
-                for chunk in photo_file.chunks():
-                    temp_file.write(chunk)
-            else:
-                temp_file.write(photo_file)
-            temp_path = temp_file.name
+        # The album is attached by batchCreate, so no separate album call is needed
+        results = self.create_media_items([{
+            'upload_token': upload_token,
+            'description': description,
+            'player_name': player_name,
+            'question_order': question_order,
+        }])
+        photo_info = results.get(upload_token)
+        if not photo_info:
+            raise Exception("Failed to create media item")
         
-        try:
-            # Upload the photo
-            upload_token = self._upload_bytes(temp_path)
-            if not upload_token:
-                raise Exception("Failed to get upload token")
-            
-            # Create media item
-            media_item = self._create_media_item(
-                upload_token, 
-                description, 
-                player_name, 
-                question_order
-            )
-            
-            if not media_item:
-                raise Exception("Failed to create media item")
-            
-            # Add to album if configured
+        logger.info(f"Successfully uploaded photo to Google Photos for {player_name}")
+        return photo_info
+    
+    def upload_media(self, photo_file) -> str:
+        """Upload photo bytes and return the upload token for create_media_items()"""
+        # Stream the photo straight from its file - no temporary copy
+        upload_token = self._upload_bytes(photo_file)
+        if not upload_token:
+            raise Exception("Failed to get upload token")
+        return upload_token
+    
+    def create_media_items(self, items) -> Dict[str, Dict[str, Any]]:
+        """
+        Create media items for uploaded photos, up to 50 per batchCreate call.
+        Each item has upload_token, description, player_name and question_order.
+        Returns photo info keyed by upload token; failed items are left out.
+        """
+        results = {}
+        for start in range(0, len(items), MAX_BATCH_CREATE):
+            batch = items[start:start + MAX_BATCH_CREATE]
+            request_body = {
+                'newMediaItems': [self._new_media_item(**item) for item in batch]
+            }
             if self.album_id:
-                self._add_to_album(media_item['id'])
-            
-            logger.info(f"Successfully uploaded photo to Google Photos for {player_name}")
+                request_body['albumId'] = self.album_id
             
-            return {
-                'media_item_id': media_item['id'],
-                'base_url': media_item.get('baseUrl'),
-                'product_url': media_item.get('productUrl'),
-                'filename': media_item.get('filename'),
-                'mime_type': media_item.get('mimeType'),
-                'album_url': self.album_url,
-                'auth_type': self.auth_type
-            }
+            try:
+                response = self._batch_create(request_body)
+            except Exception as e:
+                logger.error(f"Error creating {len(batch)} media items: {e}")
+                continue
             
-        finally:
-            # Clean up temp file
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
+            for result in response.get('newMediaItemResults', []):
+                media_item = result.get('mediaItem')
+                if media_item:
+                    results[result.get('uploadToken')] = self._photo_info(media_item)
+                else:
+                    logger.error(f"Failed to create media item: {result.get('status')}")
+        
+        return results
+    
+    def _photo_info(self, media_item: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'media_item_id': media_item['id'],
+            'base_url': media_item.get('baseUrl'),
+            'product_url': media_item.get('productUrl'),
+            'filename': media_item.get('filename'),
+            'mime_type': media_item.get('mimeType'),
+            'album_url': self.album_url,
+            'auth_type': self.auth_type
+        }
     
     def _fallback_response(self, photo_file, description: str, player_name: str, question_order: int) -> Dict[str, Any]:
         """Generate fallback response when real upload isn't available"""
@@ -250,25 +356,35 @@ class RenderGooglePhotosService:
             'auth_type': self.auth_type
         }
     
-    def _upload_bytes(self, file_path: str) -> Optional[str]:
-        """Upload photo bytes and get upload token"""
+    def _upload_bytes(self, photo_file) -> Optional[str]:
+        """Stream photo bytes to Google Photos and get an upload token"""
         try:
-            with open(file_path, 'rb') as f:
-                photo_bytes = f.read()
+            if isinstance(photo_file, (bytes, bytearray)):
+                data = photo_file
+                file_name = 'photo.jpg'
+            else:
+                # Sent in blocks as it is read, so memory stays flat for large photos
+                photo_file.seek(0)
+                data = photo_file
+                file_name = os.path.basename(getattr(photo_file, 'name', '') or 'photo.jpg')
             
-            upload_url = 'https://photoslibrary.googleapis.com/v1/uploads'
             headers = {
-                'Authorization': f'Bearer {self.credentials.token}',
+                'Authorization': f'Bearer {self._get_access_token()}',
                 'Content-Type': 'application/octet-stream',
-                'X-Goog-Upload-File-Name': os.path.basename(file_path),
+                'X-Goog-Upload-File-Name': file_name,
                 'X-Goog-Upload-Protocol': 'raw'
             }
             
-            response = requests.post(upload_url, data=photo_bytes, headers=headers)
+            response = self.get_session().post(
+                f'{self.api_url}/v1/uploads', data=data, headers=headers,
+                timeout=getattr(settings, 'GOOGLE_PHOTOS_UPLOAD_TIMEOUT', 60)
+            )
             
             if response.status_code == 200:
                 return response.text
             else:
+                if response.status_code == 401:
+                    self._forget_token()
                 logger.error(f"Failed to upload bytes: {response.status_code} - {response.text}")
                 return None
                 
@@ -276,59 +392,29 @@ class RenderGooglePhotosService:
             logger.error(f"Error uploading bytes: {e}")
             return None
     
-    def _create_media_item(self, upload_token: str, description: str, player_name: str, question_order: int) -> Optional[Dict[str, Any]]:
-        """Create media item from upload token"""
-        try:
-            filename = f"onam_treasure_hunt_q{question_order}_{player_name}.jpg" if question_order else f"onam_photo_{player_name}.jpg"
-            
-            request_body = {
-                'newMediaItems': [
-                    {
-                        'description': f"{description}\nPlayer: {player_name}\nQuestion: {question_order}" if question_order else f"{description}\nPlayer: {player_name}",
-                        'simpleMediaItem': {
-                            'fileName': filename,
-                            'uploadToken': upload_token
-                        }
-                    }
-                ]
-            }
-            
-            if self.album_id:
-                request_body['albumId'] = self.album_id
-            
-            response = self.service.mediaItems().batchCreate(body=request_body).execute()
-            
-            new_media_items = response.get('newMediaItemResults', [])
-            if new_media_items and 'mediaItem' in new_media_items[0]:
-                return new_media_items[0]['mediaItem']
-            else:
-                logger.error(f"Failed to create media item: {response}")
-                return None
-                
-        except Exception as e:
-            logger.error(f"Error creating media item: {e}")
-            return None
+    def _batch_create(self, request_body: Dict[str, Any]) -> Dict[str, Any]:
+        """POST mediaItems:batchCreate over the pooled session"""
+        response = self.get_session().post(
+            f'{self.api_url}/v1/mediaItems:batchCreate',
+            json=request_body,
+            headers={'Authorization': f'Bearer {self._get_access_token()}'},
+            timeout=getattr(settings, 'GOOGLE_PHOTOS_UPLOAD_TIMEOUT', 60)
+        )
+        if response.status_code == 401:
+            self._forget_token()
+        response.raise_for_status()
+        return response.json()
     
-    def _add_to_album(self, media_item_id: str) -> bool:
-        """Add media item to album"""
-        if not self.album_id:
-            return False
-        
-        try:
-            request_body = {
-                'mediaItemIds': [media_item_id]
+    def _new_media_item(self, upload_token: str, description: str = "", player_name: str = "", question_order: int = None) -> Dict[str, Any]:
+        """batchCreate entry for an upload token"""
+        filename = f"onam_treasure_hunt_q{question_order}_{player_name}.jpg" if question_order else f"onam_photo_{player_name}.jpg"
+        return {
+            'description': f"{description}\nPlayer: {player_name}\nQuestion: {question_order}" if question_order else f"{description}\nPlayer: {player_name}",
+            'simpleMediaItem': {
+                'fileName': filename,
+                'uploadToken': upload_token
             }
-            
-            self.service.albums().batchAddMediaItems(
-                albumId=self.album_id,
-                body=request_body
-            ).execute()
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to add media item to album: {e}")
-            return False
+        }
 
 
 # Use the production-ready service
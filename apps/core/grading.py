@@ -0,0 +1,315 @@
+"""
+Automatic answer grading for Chodya Onam questions.
+
+Multiple choice answers are graded exactly against the correct option.
+Text and image_text answers are normalised (case, whitespace, punctuation,
+Malayalam script and common Manglish spelling variants) and compared with
+fuzzy similarity against the question's accepted answers. Only answers the
+engine is not confident about are left in the admin approval queue.
+"""
+
+import logging
+import re
+import unicodedata
+from collections import namedtuple, defaultdict
+from difflib import SequenceMatcher
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Greatest
+
+from .dashboard import invalidate_dashboard_stats
+
+logger = logging.getLogger(__name__)
+
+GradeResult = namedtuple('GradeResult', ['verdict', 'confidence'])
+
+CORRECT = 'correct'
+INCORRECT = 'incorrect'
+AMBIGUOUS = 'ambiguous'
+
+GRADABLE_TYPES = ('text', 'multiple_choice', 'image_text')
+
+# Malayalam script to Latin (Manglish) transliteration tables
+_ML_VOWELS = {
+    'അ': 'a', 'ആ': 'aa', 'ഇ': 'i', 'ഈ': 'ee', 'ഉ': 'u', 'ഊ': 'oo', 'ഋ': 'ru',
+    'എ': 'e', 'ഏ': 'e', 'ഐ': 'ai', 'ഒ': 'o', 'ഓ': 'o', 'ഔ': 'au',
+}
+_ML_VOWEL_SIGNS = {
+    'ാ': 'aa', 'ി': 'i', 'ീ': 'ee', 'ു': 'u', 'ൂ': 'oo', 'ൃ': 'ru', 'െ': 'e',
+    'േ': 'e', 'ൈ': 'ai', 'ൊ': 'o', 'ോ': 'o', 'ൌ': 'au', 'ൗ': 'au',
+}
+_ML_CONSONANTS = {
+    'ക': 'k', 'ഖ': 'kh', 'ഗ': 'g', 'ഘ': 'gh', 'ങ': 'ng', 'ച': 'ch', 'ഛ': 'chh',
+    'ജ': 'j', 'ഝ': 'jh', 'ഞ': 'nj', 'ട': 't', 'ഠ': 'th', 'ഡ': 'd', 'ഢ': 'dh',
+    'ണ': 'n', 'ത': 'th', 'ഥ': 'th', 'ദ': 'd', 'ധ': 'dh', 'ന': 'n', 'പ': 'p',
+    'ഫ': 'ph', 'ബ': 'b', 'ഭ': 'bh', 'മ': 'm', 'യ': 'y', 'ര': 'r', 'റ': 'r',
+    'ല': 'l', 'ള': 'l', 'ഴ': 'zh', 'വ': 'v', 'ശ': 'sh', 'ഷ': 'sh', 'സ': 's',
+    'ഹ': 'h',
+}
+_ML_OTHERS = {
+    'ം': 'm', 'ഃ': 'h', 'ൺ': 'n', 'ൻ': 'n', 'ർ': 'r', 'ൽ': 'l', 'ൾ': 'l', 'ൿ': 'k',
+}
+_ML_VIRAMA = '്'
+
+# Spelling variants that Manglish writers use interchangeably
+_PHONETIC_FOLDS = [
+    ('zh', 'l'), ('sh', 's'), ('chh', 'c'), ('ch', 'c'), ('th', 't'), ('dh', 'd'),
+    ('bh', 'b'), ('ph', 'f'), ('kh', 'k'), ('gh', 'g'), ('jh', 'j'), ('nj', 'n'),
+    ('ng', 'n'), ('ee', 'i'), ('oo', 'u'), ('w', 'v'), ('z', 's'), ('q', 'k'),
+    ('x', 'ks'), ('y', 'i'),
+]
+
+_NON_WORD = re.compile(r'[^\w\s]', re.UNICODE)
+_WHITESPACE = re.compile(r'\s+')
+_REPEATS = re.compile(r'(.)\1+')
+
+
+def transliterate_malayalam(text):
+    """Transliterate Malayalam script to Latin letters, leaving other text untouched"""
+    output = []
+    pending_vowel = False
+    for char in text:
+        if char in _ML_CONSONANTS:
+            if pending_vowel:
+                output.append('a')
+            output.append(_ML_CONSONANTS[char])
+            pending_vowel = True
+            continue
+        if char in _ML_VOWEL_SIGNS:
+            output.append(_ML_VOWEL_SIGNS[char])
+        elif char == _ML_VIRAMA:
+            pass
+        else:
+            if pending_vowel:
+                output.append('a')
+            output.append(_ML_VOWELS.get(char) or _ML_OTHERS.get(char) or char)
+        pending_vowel = False
+    if pending_vowel:
+        output.append('a')
+    return ''.join(output)
+
+
+def normalize_answer(text):
+    """Normalise case, punctuation and whitespace of an answer"""
+    text = unicodedata.normalize('NFKC', text or '')
+    text = transliterate_malayalam(text).casefold()
+    text = _NON_WORD.sub(' ', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def phonetic_key(text):
+    """Fold Manglish spelling variants so 'Maaveli' and 'Maveli' compare equal"""
+    key = normalize_answer(text)
+    for source, target in _PHONETIC_FOLDS:
+        key = key.replace(source, target)
+    key = _REPEATS.sub(r'\1', key)
+    return key.replace(' ', '')
+
+
+def similarity(first, second):
+    """Similarity ratio (0-1) between two answers after normalisation"""
+    if not first or not second:
+        return 0.0
+    if normalize_answer(first) == normalize_answer(second):
+        return 1.0
+    first_key, second_key = phonetic_key(first), phonetic_key(second)
+    if first_key == second_key:
+        return 0.98
+    return SequenceMatcher(None, first_key, second_key).ratio()
+
+
+def get_accepted_answers(question):
+    """All answers that should be accepted for a question"""
+    answers = []
+    correct = (question.correct_answer or '').strip()
+    if question.question_type == 'multiple_choice' and correct.lower() in ('a', 'b', 'c', 'd'):
+        # Correct answer stored as an option letter
+        correct = getattr(question, f'option_{correct.lower()}', '') or correct
+    if correct:
+        answers.append(correct)
+    answers.extend(
+        line.strip() for line in (question.accepted_answers or '').splitlines() if line.strip()
+    )
+    return answers
+
+
+def grade_answer(question, text_answer):
+    """Grade a text answer for a question and return a GradeResult"""
+    if not question.auto_grade or question.question_type not in GRADABLE_TYPES:
+        return GradeResult(AMBIGUOUS, 0.0)
+
+    accepted = get_accepted_answers(question)
+    if not accepted or not (text_answer or '').strip():
+        return GradeResult(AMBIGUOUS, 0.0)
+
+    if question.question_type == 'multiple_choice':
+        submitted = normalize_answer(text_answer)
+        if any(submitted == normalize_answer(answer) for answer in accepted):
+            return GradeResult(CORRECT, 1.0)
+        return GradeResult(INCORRECT, 1.0)
+
+    best = max(similarity(text_answer, answer) for answer in accepted)
+    if best >= question.match_threshold:
+        return GradeResult(CORRECT, round(best, 3))
+    return GradeResult(AMBIGUOUS, round(best, 3))
+
+
+def _graded_fields(answer, result):
+    """Return (grading_status, is_correct, points_awarded) for a grade result"""
+    if result.verdict == CORRECT:
+        return 'auto_approved', True, answer.question.points
+    if result.verdict == INCORRECT:
+        return 'auto_rejected', False, 0
+    return 'pending', False, 0
+
+
+def apply_grade(answer, result=None):
+    """
+    Grade an answer, store the verdict and adjust the player's score.
+    Answers an admin has reviewed keep their verdict; None is returned for them.
+    """
+    from .models import Player, PlayerAnswer
+
+    if answer.grading_status == 'reviewed':
+        return None
+    if result is None:
+        result = grade_answer(answer.question, answer.text_answer)
+
+    status, is_correct, points = _graded_fields(answer, result)
+    with transaction.atomic():
+        previous_points = answer.points_awarded
+        answer.grading_status = status
+        answer.grading_confidence = result.confidence
+        answer.is_correct = is_correct
+        answer.points_awarded = points
+        if answer.pk:
+            PlayerAnswer.objects.filter(pk=answer.pk).update(
+                grading_status=status,
+                grading_confidence=result.confidence,
+                is_correct=is_correct,
+                points_awarded=points,
+            )
+            invalidate_dashboard_stats()
+        else:
+            answer.save()
+
+        delta = points - previous_points
+        if delta:
+            Player.objects.filter(pk=answer.player_id).update(score=Greatest(F('score') + delta, 0))
+
+    if status != 'pending':
+        logger.info(f"Auto-graded answer {answer.pk} as {status} ({result.confidence:.2f})")
+    return result
+
+
+def regrade_answers(queryset, dry_run=False, batch_size=500):
+    """
+    Regrade many answers at once.
+    Answers are updated with bulk_update and score changes are applied
+    with one update per affected player.
+    """
+    from .models import Player, PlayerAnswer
+
+    summary = defaultdict(int)
+    score_deltas = defaultdict(int)
+    changed = []
+
+    answers = queryset.select_related('question').order_by('pk')
+    for answer in answers.iterator(chunk_size=batch_size):
+        result = grade_answer(answer.question, answer.text_answer)
+        status, is_correct, points = _graded_fields(answer, result)
+        summary[status] += 1
+
+        if (answer.grading_status, answer.is_correct, answer.points_awarded) == (status, is_correct, points):
+            continue
+
+        score_deltas[answer.player_id] += points - answer.points_awarded
+        answer.grading_status = status
+        answer.grading_confidence = result.confidence
+        answer.is_correct = is_correct
+        answer.points_awarded = points
+        changed.append(answer)
+
+    summary['changed'] = len(changed)
+    if dry_run or not changed:
+        return dict(summary)
+
+    with transaction.atomic():
+        PlayerAnswer.objects.bulk_update(
+            changed,
+            ['grading_status', 'grading_confidence', 'is_correct', 'points_awarded'],
+            batch_size=batch_size,
+        )
+        for player_id, delta in score_deltas.items():
+            if delta:
+                Player.objects.filter(pk=player_id).update(score=Greatest(F('score') + delta, 0))
+    invalidate_dashboard_stats()
+
+    return dict(summary)
+
+
+def _apply_score_deltas(score_deltas, batch_size=500):
+    """Apply per-player score changes with one grouped UPDATE per batch"""
+    from .models import Player
+
+    player_ids = [player_id for player_id, delta in score_deltas.items() if delta]
+    for start in range(0, len(player_ids), batch_size):
+        batch = player_ids[start:start + batch_size]
+        delta = Case(
+            *[When(pk=player_id, then=Value(score_deltas[player_id])) for player_id in batch],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+        Player.objects.filter(pk__in=batch).update(score=Greatest(F('score') + delta, 0))
+    return len(player_ids)
+
+
+def bulk_review_answers(queryset, approve=True):
+    """
+    Approve (full question points) or reject many answers as an admin review,
+    without loading them: one UPDATE for the answers, taking points from the
+    question in a subquery, and one grouped UPDATE for the player scores.
+    """
+    from .models import PlayerAnswer, TreasureHuntQuestion
+
+    with transaction.atomic():
+        answer_ids = list(queryset.select_for_update().values_list('pk', flat=True))
+        if not answer_ids:
+            return {'answers': 0, 'players': 0, 'points': 0}
+        answers = PlayerAnswer.objects.filter(pk__in=answer_ids)
+
+        # Score change per player, computed before the answers change
+        if approve:
+            change = Sum(F('question__points') - F('points_awarded'))
+        else:
+            change = Sum(-F('points_awarded'))
+        score_deltas = dict(answers.order_by().values('player_id').annotate(delta=change).values_list('player_id', 'delta'))
+
+        if approve:
+            question_points = TreasureHuntQuestion.objects.filter(pk=OuterRef('question_id')).values('points')[:1]
+            answers.update(is_correct=True, points_awarded=Subquery(question_points), grading_status='reviewed')
+        else:
+            answers.update(is_correct=False, points_awarded=0, grading_status='reviewed')
+
+        players = _apply_score_deltas(score_deltas)
+    invalidate_dashboard_stats()
+
+    verb = 'Approved' if approve else 'Rejected'
+    logger.info(f"{verb} {len(answer_ids)} answers in bulk, updating {players} player scores")
+    return {'answers': len(answer_ids), 'players': players, 'points': sum(score_deltas.values())}
+
+
+def exact_multiple_choice_matches(queryset=None):
+    """Pending multiple choice answers that exactly match the correct option"""
+    from .models import PlayerAnswer
+
+    if queryset is None:
+        queryset = PlayerAnswer.objects.filter(grading_status='pending')
+
+    # The correct answer may be the option text or its letter
+    matches = Q(text_answer__iexact=F('question__correct_answer'))
+    for letter in ('a', 'b', 'c', 'd'):
+        matches |= Q(question__correct_answer__iexact=letter, text_answer__iexact=F(f'question__option_{letter}'))
+
+    return queryset.filter(question__question_type='multiple_choice').exclude(text_answer='').filter(matches)
@@ -0,0 +1,125 @@
+"""
+Django Management Command to back up existing photo answers to Google Photos
+Usage: python manage.py backfill_google_photos [--workers N] [--rate N] [--page-size N]
+                                               [--checkpoint PATH] [--restart] [--limit N] [--dry-run]
+
+Walks photo answers that are not backed up yet in id order (keyset
+pagination), uploads each page on a bounded thread pool under a
+token-bucket rate limit, and records progress in a checkpoint file so an
+interrupted run resumes where it stopped. The checkpoint only moves past
+answers that were backed up: failed ones stay queued with their backoff
+for the backup worker, and the next backfill run walks them again.
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from apps.core.google_photos_render import MAX_BATCH_CREATE, google_photos_service
+from apps.core.models import PlayerAnswer
+from apps.core.photo_backup import backup_answers, is_backup_enabled
+from apps.core.throttling import TokenBucket
+
+
+class Command(BaseCommand):
+    help = 'Back up photo answers that have no Google Photos copy yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent uploads')
+        parser.add_argument('--rate', type=float, default=10, help='Maximum uploads per second')
+        parser.add_argument('--page-size', type=int, default=MAX_BATCH_CREATE, help='Answers per page (and per batchCreate call)')
+        parser.add_argument(
+            '--checkpoint',
+            default=str(settings.BASE_DIR / 'logs' / 'backfill_google_photos.json'),
+            help='File recording progress so the backfill can resume',
+        )
+        parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and start from the beginning')
+        parser.add_argument('--limit', type=int, default=None, help='Stop after this many photos')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the photos that would be backed up')
+
+    def handle(self, *args, **options):
+        checkpoint = {} if options['restart'] else self.load_checkpoint(options['checkpoint'])
+        last_id = checkpoint.get('last_id', 0)
+        pending = PlayerAnswer.objects.exclude(photo_answer='').exclude(google_photos_status='done')
+
+        if options['dry_run']:
+            self.stdout.write("🔍 DRY RUN MODE - No changes will be made")
+            self.stdout.write(f"📸 {pending.filter(pk__gt=last_id).count()} photos to back up (after id {last_id})")
+            return
+
+        if not is_backup_enabled() or not google_photos_service.is_configured():
+            raise CommandError('Google Photos is not enabled and configured (GOOGLE_PHOTOS_ENABLED, album and credentials)')
+
+        page_size = max(1, min(options['page_size'], MAX_BATCH_CREATE))
+        throttle = TokenBucket(options['rate'], capacity=max(options['workers'], 1))
+        if last_id:
+            self.stdout.write(f"↩️ Resuming after answer {last_id}")
+
+        done = failed = 0
+        cursor = last_id
+        backed_up_through = last_id  # Every answer up to here is backed up or was never pending
+        gap = False  # Set once an answer in this run is not backed up
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(options['workers'], 1), thread_name_prefix='backfill') as pool:
+            while options['limit'] is None or done + failed < options['limit']:
+                size = page_size if options['limit'] is None else min(page_size, options['limit'] - done - failed)
+                answer_ids = list(pending.filter(pk__gt=cursor).order_by('pk').values_list('pk', flat=True)[:size])
+                if not answer_ids:
+                    break
+
+                # Make the page claimable, leaving uploads another worker is running alone
+                PlayerAnswer.objects.filter(pk__in=answer_ids).exclude(google_photos_status='uploading').update(
+                    google_photos_status='pending', google_photos_attempts=0, google_photos_next_attempt_at=None
+                )
+                retries = backup_answers(answer_ids, pool=pool, throttle=throttle)
+
+                backed_up = set(
+                    PlayerAnswer.objects.filter(pk__in=answer_ids, google_photos_status='done').values_list('pk', flat=True)
+                )
+                done += len(backed_up)
+                failed += len(answer_ids) - len(backed_up)
+                cursor = answer_ids[-1]
+                for answer_id in answer_ids:
+                    gap = gap or answer_id not in backed_up
+                    if not gap:
+                        backed_up_through = answer_id
+                self.save_checkpoint(options['checkpoint'], backed_up_through, done, failed)
+
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"☁️ Up to answer {cursor}: {done} backed up, {failed} not backed up "
+                    f"({len(retries)} queued for retry) - {done / elapsed:.1f} photos/s"
+                )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Backfill complete - {done} photos backed up, {failed} not backed up in {elapsed:.1f}s "
+            f"({done / elapsed if elapsed else 0:.1f} photos/s)"
+        ))
+
+    def load_checkpoint(self, path):
+        try:
+            with open(path) as checkpoint_file:
+                return json.load(checkpoint_file)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            self.stdout.write(self.style.WARNING(f"⚠️ Ignoring unreadable checkpoint {path}"))
+            return {}
+
+    def save_checkpoint(self, path, last_id, done, failed):
+        """Write the checkpoint atomically so a crash never leaves it half-written"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'w') as checkpoint_file:
+            json.dump({
+                'last_id': last_id,
+                'backed_up': done,
+                'not_backed_up': failed,
+                'updated_at': timezone.now().isoformat(),
+            }, checkpoint_file)
+        os.replace(temp_path, path)
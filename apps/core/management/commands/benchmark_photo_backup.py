@@ -0,0 +1,138 @@
+"""
+Django Management Command to benchmark the Google Photos backup path offline
+Usage: python manage.py benchmark_photo_backup [--photos N] [--concurrency 1,4,8]
+                                               [--latency-ms MS] [--jitter-ms MS] [--error-rate R]
+
+Creates throwaway photo answers and runs them through the backup queue
+(due_backups and backup_answers, as process_photo_backups does) against the
+local stand-in server (apps/core/google_photos_fake.py). Reports throughput
+and p50/p95/p99 latency per photo for each concurrency level. Everything it
+writes is rolled back, and the photos live in a temporary media directory.
+"""
+
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+from apps.core import google_photos_render
+from apps.core.google_photos_fake import FakeGooglePhotosServer, use_fake_google_photos
+from apps.core.google_photos_render import MAX_BATCH_CREATE, RenderGooglePhotosService
+from apps.core.models import Player, PlayerAnswer, TreasureHuntQuestion
+from apps.core.photo_backup import backup_answers, due_backups
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    index = max(int(round(percent / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark Google Photos backup throughput and latency against a local stand-in server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--photos', type=int, default=200, help='Photos to back up per concurrency level')
+        parser.add_argument('--concurrency', default='1,4,8,16', help='Comma-separated concurrency levels')
+        parser.add_argument('--size-kb', type=int, default=500, help='Size of each fake photo')
+        parser.add_argument('--batch-size', type=int, default=MAX_BATCH_CREATE, help='Media items per batchCreate call')
+        parser.add_argument('--latency-ms', type=float, default=50, help='Server latency per request')
+        parser.add_argument('--jitter-ms', type=float, default=20, help='Random extra latency per request')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with 503')
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',') if level.strip()]
+        except ValueError:
+            raise CommandError('--concurrency must be a comma-separated list of numbers')
+        batch_size = max(1, min(options['batch_size'], MAX_BATCH_CREATE))
+        photo = b'\xff\xd8' + b'\0' * (options['size_kb'] * 1024)
+
+        server = FakeGooglePhotosServer(
+            latency_ms=options['latency_ms'],
+            jitter_ms=options['jitter_ms'],
+            error_rate=options['error_rate'],
+        )
+        with server, tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root, GOOGLE_PHOTOS_ENABLED=True, GOOGLE_PHOTOS_BATCH_SIZE=batch_size):
+            photo_name = default_storage.save('benchmark/photo.jpg', ContentFile(photo))
+            self.stdout.write(
+                f"📸 {options['photos']} photos of {options['size_kb']} KB, batches of {batch_size}, "
+                f"{options['latency_ms']:.0f}±{options['jitter_ms']:.0f} ms latency, "
+                f"{options['error_rate']:.0%} errors"
+            )
+            self.stdout.write(f"{'workers':>8} {'ok':>6} {'failed':>6} {'photos/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'requests':>9}")
+
+            for concurrency in levels:
+                server.stats.clear()
+                with override_settings(GOOGLE_PHOTOS_HTTP_POOL_SIZE=max(concurrency, 1)):
+                    service = use_fake_google_photos(RenderGooglePhotosService(), server)
+                    # backup_answers uploads through the module-level service
+                    with mock.patch.object(google_photos_render, 'google_photos_service', service):
+                        elapsed, latencies, failed = self.run_level(photo_name, options['photos'], concurrency, batch_size)
+
+                self.stdout.write(
+                    f"{concurrency:>8} {len(latencies):>6} {failed:>6} {len(latencies) / elapsed:>9.1f} "
+                    f"{percentile(latencies, 50):>8.0f} {percentile(latencies, 95):>8.0f} "
+                    f"{percentile(latencies, 99):>8.0f} {server.stats['requests']:>9}"
+                )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
+
+    def create_answers(self, photo_name, count):
+        """`count` photo answers queued for backup, all pointing at the same stored photo"""
+        question = TreasureHuntQuestion.objects.create(
+            question_text='Benchmark photo', question_type='photo', is_active=False
+        )
+        players = Player.objects.bulk_create([
+            Player(name=f'Benchmark {index}', name_key=f'benchmark {index}', is_active=False)
+            for index in range(count)
+        ])
+        answers = PlayerAnswer.objects.bulk_create([
+            PlayerAnswer(
+                player=player,
+                question=question,
+                photo_answer=photo_name,
+                google_photos_status='pending',
+                google_photos_next_attempt_at=timezone.now(),
+            )
+            for player in players
+        ])
+        return [answer.pk for answer in answers]
+
+    def run_level(self, photo_name, count, concurrency, batch_size):
+        """Back up `count` queued photos in batches, uploading with `concurrency` workers"""
+        latencies = []
+
+        with transaction.atomic():
+            created = self.create_answers(photo_name, count)
+            answer_ids = list(
+                due_backups().filter(pk__in=created)
+                .order_by('google_photos_next_attempt_at', 'pk').values_list('pk', flat=True)
+            )
+
+            level_started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+                for start in range(0, len(answer_ids), batch_size):
+                    batch = answer_ids[start:start + batch_size]
+                    batch_started = time.perf_counter()
+                    backup_answers(batch, pool=pool)
+                    finished = time.perf_counter()
+                    done = PlayerAnswer.objects.filter(pk__in=batch, google_photos_status='done').count()
+                    # A photo is backed up once its batch's media items are recorded
+                    latencies.extend([(finished - batch_started) * 1000] * done)
+            elapsed = time.perf_counter() - level_started
+
+            # Benchmark rows never outlive the run
+            transaction.set_rollback(True)
+
+        return elapsed, latencies, count - len(latencies)
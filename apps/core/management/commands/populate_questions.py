@@ -1,5 +1,6 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from apps.core.models import TreasureHuntQuestion
+from apps.core.question_import import QuestionImportError, import_questions
 
 
 class Command(BaseCommand):
@@ -119,19 +120,16 @@ class Command(BaseCommand):
             },
         ]
 
-        created_count = 0
-        for question_data in questions_data:
-            question, created = TreasureHuntQuestion.objects.get_or_create(
-                order=question_data['order'],
-                defaults=question_data
-            )
-            if created:
-                created_count += 1
-                self.stdout.write(f"Created question {question.order}: {question.question_text[:50]}...")
+        # Questions are matched by order, so running this again creates nothing new
+        try:
+            summary = import_questions(questions_data)
+        except QuestionImportError as e:
+            raise CommandError(str(e))
 
         self.stdout.write(
             self.style.SUCCESS(
-                f'Successfully created {created_count} treasure hunt questions. '
+                f"Successfully created {summary['created']} treasure hunt questions "
+                f"({summary['skipped']} already present). "
                 f'Total questions in database: {TreasureHuntQuestion.objects.count()}'
             )
         )
@@ -0,0 +1,51 @@
+"""
+Django Management Command to run the Google Photos backup queue
+Usage: python manage.py process_photo_backups [--limit N]
+
+Use this from cron when no Celery worker is running; failed uploads are
+left pending with their backoff and picked up by the next run.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from apps.core.models import PlayerAnswer
+from apps.core.photo_backup import backup_answers, due_backups, get_batch_size, is_backup_enabled
+
+
+class Command(BaseCommand):
+    help = 'Upload photo answers that are due for Google Photos backup'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=100,
+            help='Maximum number of photos to upload in this run',
+        )
+
+    def handle(self, *args, **options):
+        if not is_backup_enabled():
+            self.stdout.write(self.style.WARNING("⚠️ GOOGLE_PHOTOS_ENABLED is off - nothing to do"))
+            return
+
+        answer_ids = list(
+            due_backups().order_by('google_photos_next_attempt_at', 'pk').values_list('pk', flat=True)[:options['limit']]
+        )
+        self.stdout.write(f"☁️ {len(answer_ids)} photos due for backup")
+
+        retried = 0
+        batch_size = get_batch_size()
+        for start in range(0, len(answer_ids), batch_size):
+            retried += len(backup_answers(answer_ids[start:start + batch_size]))
+
+        statuses = dict(
+            PlayerAnswer.objects.exclude(google_photos_status='not_required')
+            .values_list('google_photos_status')
+            .annotate(count=Count('pk'))
+        )
+        self.stdout.write(f"✅ Backed up: {statuses.get('done', 0)}")
+        self.stdout.write(f"⏳ Pending: {statuses.get('pending', 0)}")
+        self.stdout.write(f"❌ Failed: {statuses.get('failed', 0)}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Backup run complete - {len(answer_ids) - retried} processed, {retried} scheduled for retry")
+        )
@@ -0,0 +1,50 @@
+"""
+Django Management Command to auto-grade treasure hunt answers in bulk
+Usage: python manage.py regrade_answers [--question ORDER] [--include-reviewed] [--dry-run]
+"""
+
+from django.core.management.base import BaseCommand
+from apps.core.grading import GRADABLE_TYPES, regrade_answers
+from apps.core.models import PlayerAnswer
+
+
+class Command(BaseCommand):
+    help = 'Run automatic grading over existing answers (e.g. after changing accepted answers)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--question',
+            type=int,
+            action='append',
+            dest='questions',
+            help='Only regrade answers for this question order (can be repeated)',
+        )
+        parser.add_argument(
+            '--include-reviewed',
+            action='store_true',
+            help='Also regrade answers an admin has already approved or rejected',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would change without saving anything',
+        )
+
+    def handle(self, *args, **options):
+        answers = PlayerAnswer.objects.filter(question__question_type__in=GRADABLE_TYPES)
+        if options['questions']:
+            answers = answers.filter(question__order__in=options['questions'])
+        if not options['include_reviewed']:
+            answers = answers.exclude(grading_status='reviewed')
+
+        if options['dry_run']:
+            self.stdout.write("🔍 DRY RUN MODE - No changes will be made")
+
+        summary = regrade_answers(answers, dry_run=options['dry_run'])
+
+        self.stdout.write(f"✅ Auto-approved: {summary.get('auto_approved', 0)}")
+        self.stdout.write(f"❌ Auto-rejected: {summary.get('auto_rejected', 0)}")
+        self.stdout.write(f"⏳ Left for review: {summary.get('pending', 0)}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Regrading complete - {summary.get('changed', 0)} answers changed")
+        )
@@ -0,0 +1,173 @@
+"""
+Media file serving.
+
+Handles conditional requests (ETag / Last-Modified -> 304), single byte
+ranges (206) and long cache lifetimes for content-hashed files. With
+MEDIA_SENDFILE_BACKEND set, the transfer itself is handed to the front
+server (nginx X-Accel-Redirect or Apache/lighttpd X-Sendfile) so a
+gunicorn worker is not tied up for the whole download.
+"""
+
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+# Photos (and their renditions) are stored under their SHA-256, so the
+# content behind such a name never changes
+CONTENT_HASH_PATTERN = re.compile(r'(?:^|/)[0-9a-f]{64}(?:_[a-z]+)?\.[A-Za-z0-9]+$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def is_content_hashed(path):
+    return bool(CONTENT_HASH_PATTERN.search(path))
+
+
+def get_cache_control(path):
+    if is_content_hashed(path):
+        return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return f"public, max-age={getattr(settings, 'MEDIA_CACHE_MAX_AGE', 3600)}"
+
+
+def get_etag(path, stat):
+    if is_content_hashed(path):
+        return '"%s"' % os.path.splitext(posixpath.basename(path))[0]
+    return f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+
+
+def parse_range(header, size):
+    """
+    (start, end) for a single "bytes=" range, None to serve the whole file,
+    or False if the range cannot be satisfied.
+    """
+    match = RANGE_PATTERN.match(header.strip())
+    if not match or size == 0:
+        # Multiple ranges or unknown units: sending the whole file is allowed
+        return None
+
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def if_range_matches(request, etag, last_modified):
+    """Whether a Range request's If-Range validator still matches the file"""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    since = parse_http_date_safe(if_range)
+    return since is not None and int(last_modified) <= since
+
+
+def read_range(file_path, start, length):
+    with open(file_path, 'rb') as media_file:
+        media_file.seek(start)
+        while length > 0:
+            chunk = media_file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def sendfile_response(path, file_path):
+    """Let the front server send the file, or None if no backend is configured"""
+    backend = getattr(settings, 'MEDIA_SENDFILE_BACKEND', None)
+    if backend == 'nginx':
+        response = HttpResponse()
+        prefix = getattr(settings, 'MEDIA_SENDFILE_URL_PREFIX', '/protected-media/').rstrip('/')
+        response['X-Accel-Redirect'] = quote(f'{prefix}/{path}')
+        return response
+    if backend == 'xsendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = file_path
+        return response
+    return None
+
+
+def serve(request, path, document_root=None):
+    """Serve a file from MEDIA_ROOT (or document_root)"""
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        file_path = safe_join(str(document_root or settings.MEDIA_ROOT), path)
+    except (SuspiciousFileOperation, ValueError):
+        raise Http404('Media file not found')
+
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        raise Http404('Media file not found')
+    if not os.path.isfile(file_path):
+        raise Http404('Media file not found')
+
+    etag = get_etag(path, stat)
+    last_modified = int(stat.st_mtime)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+        'Cache-Control': get_cache_control(path),
+        'Accept-Ranges': 'bytes',
+    }
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        for header, value in headers.items():
+            not_modified[header] = value
+        return not_modified
+
+    content_type, encoding = mimetypes.guess_type(file_path)
+    content_type = content_type or 'application/octet-stream'
+
+    # The front server handles ranges itself when it sends the file
+    response = sendfile_response(path, file_path)
+    if response is None:
+        byte_range = None
+        if 'HTTP_RANGE' in request.META and if_range_matches(request, etag, last_modified):
+            byte_range = parse_range(request.META['HTTP_RANGE'], stat.st_size)
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+        elif byte_range:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(read_range(file_path, start, length), status=206)
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            response['Content-Length'] = str(length)
+        else:
+            response = FileResponse(open(file_path, 'rb'))
+
+    response['Content-Type'] = content_type
+    if encoding:
+        response['Content-Encoding'] = encoding
+    for header, value in headers.items():
+        response[header] = value
+    return response
@@ -1,6 +1,33 @@
+from django.conf import settings
+from django.urls import Resolver404, resolve
 from django.utils.deprecation import MiddlewareMixin
 from django.utils import timezone
 from apps.core.models import Player
+from apps.core.throttling import check_rate_limit
+
+
+class RateLimitMiddleware(MiddlewareMixin):
+    """
+    Apply the rate limits of views decorated with rate_limit() before any
+    later middleware or the view does database work
+    """
+    
+    def process_request(self, request):
+        if not getattr(settings, 'RATELIMIT_ENABLE', True):
+            return None
+        try:
+            view = resolve(request.path_info).func
+        except Resolver404:
+            return None
+        
+        # Class-based views carry the limit on their handler method
+        view_class = getattr(view, 'view_class', None)
+        if view_class is not None:
+            view = getattr(view_class, request.method.lower(), None)
+        endpoint, methods = getattr(view, 'rate_limit', (None, ()))
+        if endpoint is None or request.method not in methods:
+            return None
+        return check_rate_limit(request, endpoint)
 
 
 class PlayerOnlineStatusMiddleware(MiddlewareMixin):
@@ -15,9 +42,12 @@ class PlayerOnlineStatusMiddleware(MiddlewareMixin):
             try:
                 player = Player.objects.get(id=player_id)
                 player.last_activity = timezone.now()
+                update_fields = ['last_activity']
                 if not player.is_online:
+                    # Presence flip: also refreshes the admin dashboard stats
                     player.is_online = True
-                player.save(update_fields=['last_activity', 'is_online'])
+                    update_fields.append('is_online')
+                player.save(update_fields=update_fields)
             except Player.DoesNotExist:
                 # Clear invalid session
                 if 'player_id' in request.session:
@@ -0,0 +1,47 @@
+# Generated manually for automatic answer grading
+
+from django.db import migrations, models
+
+
+def mark_reviewed_answers(apps, schema_editor):
+    PlayerAnswer = apps.get_model('core', 'PlayerAnswer')
+    # Answers that were already approved or scored have been reviewed by an admin
+    PlayerAnswer.objects.filter(
+        models.Q(is_correct=True) | models.Q(points_awarded__gt=0)
+    ).update(grading_status='reviewed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_add_auto_calculation_to_simple_event_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='treasurehuntquestion',
+            name='auto_grade',
+            field=models.BooleanField(default=True, help_text='Automatically approve answers that match the correct answer'),
+        ),
+        migrations.AddField(
+            model_name='treasurehuntquestion',
+            name='accepted_answers',
+            field=models.TextField(blank=True, help_text='Other accepted answers or spellings, one per line'),
+        ),
+        migrations.AddField(
+            model_name='treasurehuntquestion',
+            name='match_threshold',
+            field=models.FloatField(default=0.85, help_text='Similarity (0-1) needed to auto-approve a text answer'),
+        ),
+        migrations.AddField(
+            model_name='playeranswer',
+            name='grading_status',
+            field=models.CharField(choices=[('pending', 'Pending Review'), ('auto_approved', 'Auto-approved'), ('auto_rejected', 'Auto-rejected'), ('reviewed', 'Reviewed by Admin')], db_index=True, default='pending', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='playeranswer',
+            name='grading_confidence',
+            field=models.FloatField(blank=True, help_text='Auto-grading match confidence (0-1)', null=True),
+        ),
+        migrations.RunPython(mark_reviewed_answers, migrations.RunPython.noop),
+    ]
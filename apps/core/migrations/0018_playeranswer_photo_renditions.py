@@ -0,0 +1,28 @@
+# Generated manually for downscaled photo renditions
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_answer_auto_grading'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playeranswer',
+            name='photo_renditions',
+            field=models.JSONField(blank=True, default=dict, help_text='Rendition name -> stored file, width and height'),
+        ),
+        migrations.AddField(
+            model_name='playeranswer',
+            name='photo_width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='playeranswer',
+            name='photo_height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated manually for content-addressed photo storage
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_playeranswer_photo_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playeranswer',
+            name='photo_sha256',
+            field=models.CharField(blank=True, db_index=True, help_text='Content hash of photo_answer (photos are stored by hash)', max_length=64),
+        ),
+    ]
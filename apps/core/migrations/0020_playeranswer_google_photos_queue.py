@@ -0,0 +1,71 @@
+# Generated manually for the Google Photos backup queue
+
+from django.db import migrations, models
+
+# The Google Photos link fields were added to the model without a migration,
+# so some deployed databases have their columns and fresh ones do not
+GOOGLE_PHOTOS_LINK_FIELDS = [
+    ('google_photos_media_id', models.CharField(blank=True, help_text='Google Photos media item ID', max_length=200, null=True)),
+    ('google_photos_url', models.URLField(blank=True, help_text='Direct Google Photos URL', null=True)),
+    ('google_photos_product_url', models.URLField(blank=True, help_text='Google Photos product page URL', null=True)),
+]
+
+
+def add_missing_link_columns(apps, schema_editor):
+    PlayerAnswer = apps.get_model('core', 'PlayerAnswer')
+    table = PlayerAnswer._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        columns = {
+            column.name for column in schema_editor.connection.introspection.get_table_description(cursor, table)
+        }
+    for name, _ in GOOGLE_PHOTOS_LINK_FIELDS:
+        field = PlayerAnswer._meta.get_field(name)
+        if field.column not in columns:
+            schema_editor.add_field(PlayerAnswer, field)
+
+
+def set_backup_status(apps, schema_editor):
+    PlayerAnswer = apps.get_model('core', 'PlayerAnswer')
+    photos = PlayerAnswer.objects.exclude(photo_answer='')
+    photos.exclude(google_photos_media_id__isnull=True).exclude(
+        google_photos_media_id__startswith='fallback_'
+    ).update(google_photos_status='done')
+    photos.exclude(google_photos_status='done').update(google_photos_status='pending')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_playeranswer_photo_sha256'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddField(model_name='playeranswer', name=name, field=field)
+                for name, field in GOOGLE_PHOTOS_LINK_FIELDS
+            ],
+        ),
+        migrations.RunPython(add_missing_link_columns, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='playeranswer',
+            name='google_photos_status',
+            field=models.CharField(choices=[('not_required', 'Not Required'), ('pending', 'Pending'), ('uploading', 'Uploading'), ('done', 'Backed Up'), ('failed', 'Failed')], db_index=True, default='not_required', help_text='Google Photos backup queue status', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='playeranswer',
+            name='google_photos_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='playeranswer',
+            name='google_photos_next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='playeranswer',
+            name='google_photos_error',
+            field=models.TextField(blank=True, help_text='Last Google Photos backup error'),
+        ),
+        migrations.RunPython(set_backup_status, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated manually for the keyset-paginated answer review queue
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_playeranswer_google_photos_queue'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='playeranswer',
+            index=models.Index(fields=['grading_status', 'submitted_at', 'id'], name='core_answer_review_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated manually for running vote aggregates
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def build_vote_aggregates(apps, schema_editor):
+    EventVote = apps.get_model('core', 'EventVote')
+    VoteAggregate = apps.get_model('core', 'VoteAggregate')
+    totals = EventVote.objects.values('event_id', 'performing_team').annotate(
+        vote_count=Count('id'),
+        coordination_total=Sum('coordination_score'),
+        selection_total=Sum('selection_score'),
+        overall_total=Sum('overall_score'),
+        enjoyment_total=Sum('enjoyment_score'),
+    ).order_by()
+    VoteAggregate.objects.bulk_create([VoteAggregate(**row) for row in totals])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_playeranswer_review_queue_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoteAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('performing_team', models.CharField(choices=[('team_1', 'Team 1'), ('team_2', 'Team 2'), ('team_3', 'Team 3'), ('team_4', 'Team 4'), ('unassigned', 'Unassigned')], max_length=20)),
+                ('vote_count', models.PositiveIntegerField(default=0)),
+                ('coordination_total', models.PositiveIntegerField(default=0)),
+                ('selection_total', models.PositiveIntegerField(default=0)),
+                ('overall_total', models.PositiveIntegerField(default=0)),
+                ('enjoyment_total', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vote_aggregates', to='core.event')),
+            ],
+            options={
+                'unique_together': {('event', 'performing_team')},
+            },
+        ),
+        migrations.RunPython(build_vote_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated manually for individual vote aggregates
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def build_individual_vote_aggregates(apps, schema_editor):
+    IndividualEventVote = apps.get_model('core', 'IndividualEventVote')
+    IndividualVoteAggregate = apps.get_model('core', 'IndividualVoteAggregate')
+    totals = IndividualEventVote.objects.filter(
+        skill_score__isnull=False,
+        creativity_score__isnull=False,
+        presentation_score__isnull=False,
+        overall_score__isnull=False,
+    ).values('event_id', 'performing_player_id').annotate(
+        vote_count=Count('id'),
+        skill_total=Sum('skill_score'),
+        creativity_total=Sum('creativity_score'),
+        presentation_total=Sum('presentation_score'),
+        overall_total=Sum('overall_score'),
+    ).order_by()
+    IndividualVoteAggregate.objects.bulk_create([IndividualVoteAggregate(**row) for row in totals])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_voteaggregate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndividualVoteAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vote_count', models.PositiveIntegerField(default=0)),
+                ('skill_total', models.PositiveIntegerField(default=0)),
+                ('creativity_total', models.PositiveIntegerField(default=0)),
+                ('presentation_total', models.PositiveIntegerField(default=0)),
+                ('overall_total', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='individual_vote_aggregates', to='core.event')),
+                ('performing_player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vote_aggregates', to='core.player')),
+            ],
+            options={
+                'unique_together': {('event', 'performing_player')},
+            },
+        ),
+        migrations.RunPython(build_individual_vote_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated manually for indexed admin search
+
+from django.db import migrations, models
+
+# (index name, table, column): pg_trgm indexes on the expression the admin's icontains searches compare
+TRIGRAM_INDEXES = [
+    ('core_player_name_trgm', 'core_player', 'name'),
+    ('core_answer_text_trgm', 'core_playeranswer', 'text_answer'),
+    ('core_question_text_trgm', 'core_treasurehuntquestion', 'question_text'),
+]
+
+
+def fill_search_keys(apps, schema_editor):
+    for model_name, source, key in (('Player', 'name', 'name_key'), ('PlayerAnswer', 'text_answer', 'text_answer_key')):
+        model = apps.get_model('core', model_name)
+        max_length = model._meta.get_field(key).max_length
+        batch = []
+        for row in model.objects.only('pk', source).order_by('pk').iterator(chunk_size=2000):
+            # Same normalization as apps.core.search.normalize_text
+            setattr(row, key, ' '.join((getattr(row, source) or '').split()).casefold()[:max_length])
+            batch.append(row)
+            if len(batch) == 2000:
+                model.objects.bulk_update(batch, [key])
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, [key])
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin (UPPER({column}::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_individualvoteaggregate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='player',
+            name='name_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Normalized name, for matching and indexed search', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='playeranswer',
+            name='text_answer_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Normalized start of text_answer, for indexed search', max_length=100),
+        ),
+        migrations.RunPython(fill_search_keys, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
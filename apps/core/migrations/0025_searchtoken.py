@@ -0,0 +1,49 @@
+# Generated manually for word-start admin search
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_search_tokens(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    SearchToken = apps.get_model('core', 'SearchToken')
+    for model_name, key in (('Player', 'name_key'), ('PlayerAnswer', 'text_answer_key')):
+        model = apps.get_model('core', model_name)
+        content_type, _ = ContentType.objects.get_or_create(app_label='core', model=model_name.lower())
+        batch = []
+        for pk, value in model.objects.exclude(**{key: ''}).order_by('pk').values_list('pk', key).iterator(chunk_size=2000):
+            # Same words as apps.core.search.index_search_tokens
+            batch.extend(
+                SearchToken(content_type=content_type, object_id=pk, field=key, token=token)
+                for token in set(value.split())
+            )
+            if len(batch) >= 2000:
+                SearchToken.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            SearchToken.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('core', '0024_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('field', models.CharField(help_text='Search key the word comes from', max_length=50)),
+                ('token', models.CharField(max_length=100)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['content_type', 'field', 'token'], name='core_search_token_idx')],
+            },
+        ),
+        migrations.RunPython(fill_search_tokens, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,10 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
+from django.contrib.contenttypes.models import ContentType
+
+from .search import index_search_tokens, normalize_text
 
 # Team Configuration Model for Admin Management
 class TeamConfiguration(models.Model):
@@ -38,6 +43,34 @@ class TeamConfiguration(models.Model):
             # Fallback to original choices
             team_choices = dict(Player.TEAM_CHOICES)
             return team_choices.get(team_code, team_code)
+    
+    @classmethod
+    def name_subquery(cls, team_field='team'):
+        """Active team name for the team code in `team_field` of the outer query (None if not configured)"""
+        return models.Subquery(
+            cls.objects.filter(team_code=models.OuterRef(team_field), is_active=True).values('team_name')[:1]
+        )
+
+
+class SearchToken(models.Model):
+    """
+    One word of a row's normalized search key (see SEARCH_KEYS), so admin
+    search can find the start of any word with an index lookup
+    """
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveBigIntegerField()
+    content_object = GenericForeignKey('content_type', 'object_id')
+    field = models.CharField(max_length=50, help_text="Search key the word comes from")
+    token = models.CharField(max_length=100)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['content_type', 'field', 'token'], name='core_search_token_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.field}: {self.token}"
+
 
 # Simple name selection model for Onam celebration
 class Player(models.Model):
@@ -53,6 +86,8 @@ class Player(models.Model):
     ]
     
     name = models.CharField(max_length=100)  # Allow manual name entry
+    name_key = models.CharField(max_length=100, blank=True, db_index=True, editable=False,
+                                help_text="Normalized name, for matching and indexed search")
     team = models.CharField(max_length=20, choices=TEAM_CHOICES, default='unassigned')
     is_active = models.BooleanField(default=True)
     is_online = models.BooleanField(default=False)  # Track online status
@@ -62,6 +97,13 @@ class Player(models.Model):
     last_activity = models.DateTimeField(auto_now=True)
     has_completed_hunt = models.BooleanField(default=False)
     session_key = models.CharField(max_length=50, blank=True, null=True)  # Store session
+    search_tokens = GenericRelation(SearchToken)
+    
+    # Fields the admin dashboard statistics are computed from
+    DASHBOARD_FIELDS = {'team', 'is_active', 'is_online'}
+    
+    # Searched by word through these normalized columns where there are no trigram indexes
+    SEARCH_KEYS = {'name': 'name_key'}
     
     class Meta:
         ordering = ['-score', '-last_activity']
@@ -90,10 +132,28 @@ class Player(models.Model):
         """Get list of online teammates"""
         return self.teammates.filter(is_online=True)
     
+    def save(self, *args, **kwargs):
+        name_key = normalize_text(self.name, self._meta.get_field('name_key').max_length)
+        reindex = (self._state.adding or name_key != self.name_key) and (
+            kwargs.get('update_fields') is None or 'name' in kwargs['update_fields']
+        )
+        self.name_key = name_key
+        if kwargs.get('update_fields') is not None and 'name' in kwargs['update_fields']:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'name_key'}
+        super().save(*args, **kwargs)
+        if reindex:
+            index_search_tokens([self], 'name_key')
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or self.DASHBOARD_FIELDS.intersection(update_fields):
+            from .dashboard import invalidate_dashboard_stats
+            invalidate_dashboard_stats()
+    
     def mark_online(self):
         """Mark player as online"""
+        was_online = self.is_online
         self.is_online = True
-        self.save(update_fields=['is_online', 'last_activity'])
+        # Only a presence flip needs to touch is_online (and the dashboard stats)
+        self.save(update_fields=['last_activity'] if was_online else ['is_online', 'last_activity'])
     
     def mark_offline(self):
         """Mark player as offline"""
@@ -137,6 +197,14 @@ class TreasureHuntQuestion(models.Model):
     option_d = models.CharField(max_length=200, blank=True)
     correct_answer = models.CharField(max_length=200, blank=True)
     
+    # Automatic grading for text, multiple choice and image_text questions
+    auto_grade = models.BooleanField(default=True,
+                                     help_text="Automatically approve answers that match the correct answer")
+    accepted_answers = models.TextField(blank=True,
+                                        help_text="Other accepted answers or spellings, one per line")
+    match_threshold = models.FloatField(default=0.85,
+                                        help_text="Similarity (0-1) needed to auto-approve a text answer")
+    
     class Meta:
         ordering = ['order']
     
@@ -146,10 +214,30 @@ class TreasureHuntQuestion(models.Model):
 
 class PlayerAnswer(models.Model):
     """Player answers to treasure hunt questions"""
+    GRADING_STATUSES = [
+        ('pending', 'Pending Review'),
+        ('auto_approved', 'Auto-approved'),
+        ('auto_rejected', 'Auto-rejected'),
+        ('reviewed', 'Reviewed by Admin'),
+    ]
+    
+    BACKUP_STATUSES = [
+        ('not_required', 'Not Required'),
+        ('pending', 'Pending'),
+        ('uploading', 'Uploading'),
+        ('done', 'Backed Up'),
+        ('failed', 'Failed'),
+    ]
+    
     player = models.ForeignKey(Player, on_delete=models.CASCADE)
     question = models.ForeignKey(TreasureHuntQuestion, on_delete=models.CASCADE)
     text_answer = models.TextField(blank=True)
+    text_answer_key = models.CharField(max_length=100, blank=True, db_index=True, editable=False,
+                                       help_text="Normalized start of text_answer, for indexed search")
+    search_tokens = GenericRelation(SearchToken)
     photo_answer = models.ImageField(upload_to='treasure_hunt_photos/', blank=True)
+    photo_sha256 = models.CharField(max_length=64, blank=True, db_index=True,
+                                    help_text="Content hash of photo_answer (photos are stored by hash)")
     
     # Google Photos integration fields
     google_photos_media_id = models.CharField(max_length=200, blank=True, null=True,
@@ -158,30 +246,97 @@ class PlayerAnswer(models.Model):
                                       help_text="Direct Google Photos URL")
     google_photos_product_url = models.URLField(blank=True, null=True,
                                               help_text="Google Photos product page URL")
+    google_photos_status = models.CharField(max_length=20, choices=BACKUP_STATUSES, default='not_required',
+                                            db_index=True, help_text="Google Photos backup queue status")
+    google_photos_attempts = models.PositiveSmallIntegerField(default=0)
+    google_photos_next_attempt_at = models.DateTimeField(null=True, blank=True)
+    google_photos_error = models.TextField(blank=True, help_text="Last Google Photos backup error")
+    
+    # Downscaled copies of photo_answer, built in the background after upload
+    photo_renditions = models.JSONField(default=dict, blank=True,
+                                        help_text="Rendition name -> stored file, width and height")
+    photo_width = models.PositiveIntegerField(null=True, blank=True)
+    photo_height = models.PositiveIntegerField(null=True, blank=True)
     
     submitted_at = models.DateTimeField(auto_now_add=True)
     is_correct = models.BooleanField(default=False)
     points_awarded = models.PositiveIntegerField(default=0)
+    grading_status = models.CharField(max_length=20, choices=GRADING_STATUSES, default='pending', db_index=True)
+    grading_confidence = models.FloatField(null=True, blank=True,
+                                           help_text="Auto-grading match confidence (0-1)")
     
     class Meta:
         unique_together = ['player', 'question']
+        indexes = [
+            # Keyset pagination of the admin review queue
+            models.Index(fields=['grading_status', 'submitted_at', 'id'], name='core_answer_review_queue_idx'),
+        ]
     
     def __str__(self):
         return f"{self.player.name} - Q{self.question.order}"
     
+    SEARCH_KEYS = {'text_answer': 'text_answer_key'}
+    
+    def save(self, *args, **kwargs):
+        text_answer_key = normalize_text(self.text_answer, self._meta.get_field('text_answer_key').max_length)
+        reindex = (self._state.adding or text_answer_key != self.text_answer_key) and (
+            kwargs.get('update_fields') is None or 'text_answer' in kwargs['update_fields']
+        )
+        self.text_answer_key = text_answer_key
+        if kwargs.get('update_fields') is not None and 'text_answer' in kwargs['update_fields']:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'text_answer_key'}
+        super().save(*args, **kwargs)
+        if reindex:
+            index_search_tokens([self], 'text_answer_key')
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'grading_status' in update_fields:
+            from .dashboard import invalidate_dashboard_stats
+            invalidate_dashboard_stats()
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        from .dashboard import invalidate_dashboard_stats
+        invalidate_dashboard_stats()
+        return result
+    
     @property
     def has_google_photos_backup(self):
         """Check if this answer has been backed up to Google Photos"""
         return bool(self.google_photos_media_id)
     
+    def get_photo_rendition(self, width, height):
+        """Get the smallest rendition that fills a width x height box (or the largest one)"""
+        renditions = sorted(
+            (self.photo_renditions or {}).values(),
+            key=lambda rendition: rendition['width'] * rendition['height']
+        )
+        for rendition in renditions:
+            if rendition['width'] >= width or rendition['height'] >= height:
+                return rendition
+        return renditions[-1] if renditions else None
+    
     def get_display_photo_url(self, width=800, height=600):
         """Get the best available photo URL for display"""
         if self.google_photos_url:
             # Return Google Photos URL with size parameters for better mobile performance
             return f"{self.google_photos_url}=w{width}-h{height}"
+        rendition = self.get_photo_rendition(width, height)
+        if rendition:
+            from django.core.files.storage import default_storage
+            return default_storage.url(rendition['name'])
         elif self.photo_answer:
             return self.photo_answer.url
         return None
+    
+    @property
+    def thumbnail_url(self):
+        """Small preview for lists and admin pages"""
+        return self.get_display_photo_url(320, 320)
+    
+    @property
+    def review_url(self):
+        """Photo large enough to judge an answer"""
+        return self.get_display_photo_url(1024, 1024)
 
 
 class Event(models.Model):
@@ -241,43 +396,37 @@ class Event(models.Model):
     @property
     def average_scores(self):
         """Get average scores for each team in this event (voting + admin scores)"""
-        from django.db.models import Avg
+        admin_scores = dict(EventScore.objects.filter(event=self).values_list('team', 'points'))
+        participating_teams = set(self.participating_teams)
+        aggregates = {}
+        if self.voting_enabled:
+            aggregates = {
+                aggregate.performing_team: aggregate
+                for aggregate in self.vote_aggregates.filter(performing_team__in=participating_teams, vote_count__gt=0)
+            }
+        
         scores = {}
         for team_code, team_name in Player.TEAM_CHOICES:
             if team_code == 'unassigned':
                 continue
-                
+            
             # Check if team has admin-awarded score
-            admin_score = 0
-            vote_count = 0
-            try:
-                event_score = EventScore.objects.get(event=self, team=team_code)
-                admin_score = float(event_score.points)
-            except EventScore.DoesNotExist:
-                pass
+            admin_score = float(admin_scores.get(team_code, 0))
             
-            # Calculate voting scores if voting is enabled
-            voting_score = 0
-            if self.voting_enabled and team_code in self.participating_teams:
-                votes = EventVote.objects.filter(event=self, performing_team=team_code)
-                if votes.exists():
-                    avg_coordination = votes.aggregate(Avg('coordination_score'))['coordination_score__avg'] or 0
-                    avg_selection = votes.aggregate(Avg('selection_score'))['selection_score__avg'] or 0
-                    avg_overall = votes.aggregate(Avg('overall_score'))['overall_score__avg'] or 0
-                    avg_enjoyment = votes.aggregate(Avg('enjoyment_score'))['enjoyment_score__avg'] or 0
-                    
-                    voting_score = (avg_coordination + avg_selection + avg_overall + avg_enjoyment) / 4
-                    vote_count = votes.count()
+            # Voting averages come from the running aggregate - no per-vote queries
+            aggregate = aggregates.get(team_code)
+            voting_score = aggregate.voting_score if aggregate else 0
+            vote_count = aggregate.vote_count if aggregate else 0
             
             # Use admin score if available, otherwise use voting score
             final_score = admin_score if admin_score > 0 else voting_score
             
-            if final_score > 0 or team_code in self.participating_teams:
+            if final_score > 0 or team_code in participating_teams:
                 scores[team_code] = {
-                    'coordination': 0,
-                    'selection': 0,
-                    'overall': 0,
-                    'enjoyment': 0,
+                    'coordination': round(aggregate.average('coordination_score'), 2) if aggregate else 0,
+                    'selection': round(aggregate.average('selection_score'), 2) if aggregate else 0,
+                    'overall': round(aggregate.average('overall_score'), 2) if aggregate else 0,
+                    'enjoyment': round(aggregate.average('enjoyment_score'), 2) if aggregate else 0,
                     'total': round(final_score, 2),
                     'vote_count': vote_count,
                     'admin_score': admin_score,
@@ -405,6 +554,32 @@ class IndividualEventVote(models.Model):
             if any(score < 1 or score > 10 for score in score_fields if score is not None):
                 raise ValidationError("All scores must be between 1 and 10")
     
+    def save(self, *args, **kwargs):
+        """Save the vote and apply the change to the running IndividualVoteAggregate"""
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                previous = IndividualEventVote.objects.select_for_update().filter(pk=self.pk).values(
+                    'event_id', 'performing_player_id', *IndividualVoteAggregate.SCORE_TOTALS
+                ).first()
+            super().save(*args, **kwargs)
+            
+            if previous:
+                IndividualVoteAggregate.apply_vote(
+                    previous['event_id'], previous['performing_player_id'], previous, sign=-1
+                )
+            IndividualVoteAggregate.apply_vote(self.event_id, self.performing_player_id, self.scores)
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            IndividualVoteAggregate.apply_vote(self.event_id, self.performing_player_id, self.scores, sign=-1)
+        return result
+    
+    @property
+    def scores(self):
+        return {field: getattr(self, field) for field in IndividualVoteAggregate.SCORE_TOTALS}
+    
     @property
     def total_score(self):
         scores = [
@@ -421,6 +596,91 @@ class IndividualEventVote(models.Model):
         return total / 4 if total > 0 else 0
 
 
+class IndividualVoteAggregate(models.Model):
+    """Running audience vote totals per event and performing player, kept up to date by IndividualEventVote"""
+    # IndividualEventVote score field -> running total field
+    SCORE_TOTALS = {
+        'skill_score': 'skill_total',
+        'creativity_score': 'creativity_total',
+        'presentation_score': 'presentation_total',
+        'overall_score': 'overall_total',
+    }
+    
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='individual_vote_aggregates')
+    performing_player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='vote_aggregates')
+    vote_count = models.PositiveIntegerField(default=0)
+    skill_total = models.PositiveIntegerField(default=0)
+    creativity_total = models.PositiveIntegerField(default=0)
+    presentation_total = models.PositiveIntegerField(default=0)
+    overall_total = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['event', 'performing_player']
+    
+    def __str__(self):
+        return f"{self.performing_player.name} - {self.event.name}: {self.vote_count} votes"
+    
+    @classmethod
+    def apply_vote(cls, event_id, performing_player_id, scores, sign=1):
+        """Add (sign=1) or remove (sign=-1) one vote; votes missing a score are not counted"""
+        if any(scores[field] is None for field in cls.SCORE_TOTALS):
+            return
+        aggregate, _ = cls.objects.get_or_create(event_id=event_id, performing_player_id=performing_player_id)
+        changes = {total: F(total) + sign * scores[field] for field, total in cls.SCORE_TOTALS.items()}
+        cls.objects.filter(pk=aggregate.pk).update(vote_count=F('vote_count') + sign, **changes)
+    
+    @classmethod
+    def rebuild(cls, event_ids=None):
+        """Recompute aggregates from IndividualEventVote rows (after bulk changes that skip save/delete)"""
+        from django.db.models import Count, Sum
+        
+        votes = IndividualEventVote.objects.all()
+        aggregates = cls.objects.all()
+        if event_ids is not None:
+            votes = votes.filter(event_id__in=event_ids)
+            aggregates = aggregates.filter(event_id__in=event_ids)
+        for field in cls.SCORE_TOTALS:
+            votes = votes.filter(**{f'{field}__isnull': False})
+        
+        totals = votes.values('event_id', 'performing_player_id').annotate(
+            vote_count=Count('id'),
+            **{total: Sum(field) for field, total in cls.SCORE_TOTALS.items()}
+        ).order_by()
+        with transaction.atomic():
+            aggregates.delete()
+            cls.objects.bulk_create([cls(**row) for row in totals])
+    
+    @classmethod
+    def rankings(cls, event_ids=None, top=None):
+        """
+        Per-event audience rankings in one query: each row is annotated with
+        per-criterion averages, average_score (of the four criteria) and rank
+        within its event (ties share a rank).
+        """
+        from django.db.models import ExpressionWrapper, FloatField, Window
+        from django.db.models.functions import Rank
+        
+        def average(expression):
+            return ExpressionWrapper(expression * 1.0 / F('vote_count'), output_field=FloatField())
+        
+        total = sum((F(total) for total in cls.SCORE_TOTALS.values()), start=models.Value(0))
+        rows = cls.objects.filter(vote_count__gt=0).select_related('performing_player', 'event').annotate(
+            skill_average=average(F('skill_total')),
+            creativity_average=average(F('creativity_total')),
+            presentation_average=average(F('presentation_total')),
+            overall_average=average(F('overall_total')),
+            average_score=average(total / 4.0),
+        ).annotate(
+            rank=Window(Rank(), partition_by=F('event_id'), order_by=F('average_score').desc()),
+        )
+        if event_ids is not None:
+            rows = rows.filter(event_id__in=event_ids)
+        if top:
+            rows = rows.filter(rank__lte=top)
+        return rows.order_by('event_id', 'rank', 'performing_player__name')
+
+
 class EventVote(models.Model):
     """Votes from teams for other teams' performances"""
     event = models.ForeignKey(Event, on_delete=models.CASCADE)
@@ -455,6 +715,30 @@ class EventVote(models.Model):
         if self.voting_team == self.performing_team:
             raise ValidationError("Teams cannot vote for themselves")
     
+    def save(self, *args, **kwargs):
+        """Save the vote and apply the change to the running VoteAggregate"""
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                previous = EventVote.objects.select_for_update().filter(pk=self.pk).values(
+                    'event_id', 'performing_team', *VoteAggregate.SCORE_TOTALS
+                ).first()
+            super().save(*args, **kwargs)
+            
+            if previous:
+                VoteAggregate.apply_vote(previous['event_id'], previous['performing_team'], previous, sign=-1)
+            VoteAggregate.apply_vote(self.event_id, self.performing_team, self.scores)
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            VoteAggregate.apply_vote(self.event_id, self.performing_team, self.scores, sign=-1)
+        return result
+    
+    @property
+    def scores(self):
+        return {field: getattr(self, field) for field in VoteAggregate.SCORE_TOTALS}
+    
     @property
     def total_score(self):
         return self.coordination_score + self.selection_score + self.overall_score + self.enjoyment_score
@@ -464,6 +748,72 @@ class EventVote(models.Model):
         return self.total_score / 4
 
 
+class VoteAggregate(models.Model):
+    """Running vote totals per event and performing team, kept up to date by EventVote.save/delete"""
+    # EventVote score field -> running total field
+    SCORE_TOTALS = {
+        'coordination_score': 'coordination_total',
+        'selection_score': 'selection_total',
+        'overall_score': 'overall_total',
+        'enjoyment_score': 'enjoyment_total',
+    }
+    
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='vote_aggregates')
+    performing_team = models.CharField(max_length=20, choices=Player.TEAM_CHOICES)
+    vote_count = models.PositiveIntegerField(default=0)
+    coordination_total = models.PositiveIntegerField(default=0)
+    selection_total = models.PositiveIntegerField(default=0)
+    overall_total = models.PositiveIntegerField(default=0)
+    enjoyment_total = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['event', 'performing_team']
+    
+    def __str__(self):
+        return f"{self.get_performing_team_display()} - {self.event.name}: {self.vote_count} votes"
+    
+    @classmethod
+    def apply_vote(cls, event_id, performing_team, scores, sign=1):
+        """Add (sign=1) or remove (sign=-1) one vote's scores"""
+        aggregate, _ = cls.objects.get_or_create(event_id=event_id, performing_team=performing_team)
+        changes = {
+            total: F(total) + sign * (scores[field] or 0)
+            for field, total in cls.SCORE_TOTALS.items()
+        }
+        cls.objects.filter(pk=aggregate.pk).update(vote_count=F('vote_count') + sign, **changes)
+    
+    @classmethod
+    def rebuild(cls, event_ids=None):
+        """Recompute aggregates from EventVote rows (after bulk changes that skip save/delete)"""
+        from django.db.models import Count, Sum
+        
+        votes = EventVote.objects.all()
+        aggregates = cls.objects.all()
+        if event_ids is not None:
+            votes = votes.filter(event_id__in=event_ids)
+            aggregates = aggregates.filter(event_id__in=event_ids)
+        
+        totals = votes.values('event_id', 'performing_team').annotate(
+            vote_count=Count('id'),
+            **{total: Sum(field) for field, total in cls.SCORE_TOTALS.items()}
+        ).order_by()
+        with transaction.atomic():
+            aggregates.delete()
+            cls.objects.bulk_create([cls(**row) for row in totals])
+    
+    def average(self, field):
+        """Average of one score field (e.g. 'coordination_score')"""
+        if not self.vote_count:
+            return 0
+        return getattr(self, self.SCORE_TOTALS[field]) / self.vote_count
+    
+    @property
+    def voting_score(self):
+        """Average of the four criteria averages"""
+        return sum(self.average(field) for field in self.SCORE_TOTALS) / len(self.SCORE_TOTALS)
+
+
 class EventScore(models.Model):
     """Admin-awarded scores for events"""
     event = models.ForeignKey(Event, on_delete=models.CASCADE)
@@ -481,8 +831,11 @@ class EventScore(models.Model):
         unique_together = ['event', 'team']
         ordering = ['-points', 'team']
     
-    def save(self, *args, **kwargs):
-        """Auto-calculate points if enabled and update participant scores"""
+    def save(self, *args, update_scores=True, **kwargs):
+        """
+        Auto-calculate points if enabled and update participant scores.
+        Pass update_scores=False when the caller refreshes player scores itself.
+        """
         if self.auto_calculate_points and self.points_per_participant > 0:
             participant_count = self.get_participants().count()
             self.points = self.points_per_participant * participant_count
@@ -490,7 +843,8 @@ class EventScore(models.Model):
         super().save(*args, **kwargs)
         
         # Update individual player scores for participants
-        self.update_participant_scores()
+        if update_scores:
+            self.update_participant_scores()
     
     def update_participant_scores(self):
         """Update individual scores for players who participated in this team event"""
@@ -638,6 +992,9 @@ class SimpleEventScore(models.Model):
     
     def get_team_display(self):
         """Get team display name"""
+        if hasattr(self, 'team_name'):
+            # Annotated by the queryset (TeamConfiguration.name_subquery)
+            return self.team_name or dict(Player.TEAM_CHOICES).get(self.team, self.team)
         try:
             return TeamConfiguration.get_team_name(self.team)
         except:
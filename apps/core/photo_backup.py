@@ -0,0 +1,278 @@
+"""
+Google Photos backup queue for photo answers.
+
+Photo submissions only mark the answer as pending backup; a background
+worker uploads it. Status lives on PlayerAnswer (google_photos_status),
+so the queue survives restarts. Failed uploads are retried with
+exponential backoff, and a per-process semaphore limits how many
+uploads run at once.
+
+With GOOGLE_PHOTOS_BATCH_WINDOW set, submissions arriving within the
+window are flushed together so their media items are created with a
+single batchCreate call per 50 photos.
+"""
+
+import logging
+import random
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# How long a worker may hold an answer in 'uploading' before it is retried
+UPLOAD_LEASE = timedelta(minutes=10)
+
+BATCH_FLUSH_CACHE_KEY = 'google_photos_batch_flush'
+
+_upload_slots = None
+_upload_slots_lock = threading.Lock()
+
+
+def get_upload_slots():
+    """Semaphore limiting concurrent Google Photos uploads in this process"""
+    global _upload_slots
+    if _upload_slots is None:
+        with _upload_slots_lock:
+            if _upload_slots is None:
+                _upload_slots = threading.BoundedSemaphore(
+                    getattr(settings, 'GOOGLE_PHOTOS_BACKUP_CONCURRENCY', 2)
+                )
+    return _upload_slots
+
+
+def is_backup_enabled():
+    return getattr(settings, 'GOOGLE_PHOTOS_ENABLED', False)
+
+
+def get_batch_window():
+    """Seconds to collect submissions before flushing a batch (0 disables batching)"""
+    return getattr(settings, 'GOOGLE_PHOTOS_BATCH_WINDOW', 5)
+
+
+def get_batch_size():
+    from .google_photos_render import MAX_BATCH_CREATE
+    return min(getattr(settings, 'GOOGLE_PHOTOS_BATCH_SIZE', MAX_BATCH_CREATE), MAX_BATCH_CREATE)
+
+
+def get_retry_delay(attempts):
+    """Exponential backoff with jitter, in seconds"""
+    base = getattr(settings, 'GOOGLE_PHOTOS_BACKUP_RETRY_BASE', 30)
+    cap = getattr(settings, 'GOOGLE_PHOTOS_BACKUP_RETRY_MAX', 3600)
+    delay = min(base * (2 ** max(attempts - 1, 0)), cap)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def due_backups():
+    """Answers whose backup should be attempted now"""
+    from .models import PlayerAnswer
+
+    now = timezone.now()
+    return PlayerAnswer.objects.filter(
+        Q(google_photos_status='pending', google_photos_next_attempt_at__lte=now) |
+        Q(google_photos_status='pending', google_photos_next_attempt_at__isnull=True) |
+        Q(google_photos_status='uploading', google_photos_next_attempt_at__lte=now)
+    ).exclude(photo_answer='')
+
+
+def queue_backup(answer):
+    """Mark an answer for Google Photos backup and hand it to a worker"""
+    from .background import dispatch
+    from .models import PlayerAnswer
+    from .tasks import backup_answer_photo
+
+    # Any previous backup belongs to the photo this one replaces
+    enabled = is_backup_enabled() and bool(answer.photo_answer)
+    answer.google_photos_status = 'pending' if enabled else 'not_required'
+    answer.google_photos_attempts = 0
+    answer.google_photos_next_attempt_at = timezone.now() if enabled else None
+    answer.google_photos_error = ''
+    answer.google_photos_media_id = None
+    answer.google_photos_url = None
+    answer.google_photos_product_url = None
+    PlayerAnswer.objects.filter(pk=answer.pk).update(
+        google_photos_status=answer.google_photos_status,
+        google_photos_attempts=0,
+        google_photos_next_attempt_at=answer.google_photos_next_attempt_at,
+        google_photos_error='',
+        google_photos_media_id=None,
+        google_photos_url=None,
+        google_photos_product_url=None,
+    )
+    if not enabled:
+        return False
+    
+    if get_batch_window():
+        schedule_batch_flush()
+    else:
+        dispatch(backup_answer_photo, answer.pk)
+    return True
+
+
+def schedule_batch_flush(delay=None):
+    """Flush the backup queue after the batch window, once per window"""
+    from .background import run_task_later
+    from .tasks import process_photo_backups
+
+    delay = get_batch_window() if delay is None else delay
+    if cache.add(BATCH_FLUSH_CACHE_KEY, True, timeout=max(int(delay), 1)):
+        transaction.on_commit(lambda: run_task_later(process_photo_backups, delay))
+
+
+def claim_backup(answer_id):
+    """Atomically move an answer to 'uploading' so only one worker handles it"""
+    from .models import PlayerAnswer
+
+    now = timezone.now()
+    return bool(due_backups().filter(pk=answer_id).update(
+        google_photos_status='uploading',
+        google_photos_attempts=F('google_photos_attempts') + 1,
+        google_photos_next_attempt_at=now + UPLOAD_LEASE,
+    ))
+
+
+def record_backup_success(answer_id, photo_info):
+    from .models import PlayerAnswer
+
+    PlayerAnswer.objects.filter(pk=answer_id).update(
+        google_photos_status='done',
+        google_photos_media_id=photo_info.get('media_item_id'),
+        google_photos_url=photo_info.get('base_url'),
+        google_photos_product_url=photo_info.get('product_url'),
+        google_photos_next_attempt_at=None,
+        google_photos_error='',
+    )
+
+
+def record_backup_failure(answer_id, error):
+    """Schedule a retry, or give up after GOOGLE_PHOTOS_BACKUP_MAX_ATTEMPTS"""
+    from .models import PlayerAnswer
+
+    attempts = PlayerAnswer.objects.filter(pk=answer_id).values_list(
+        'google_photos_attempts', flat=True
+    ).first() or 0
+    max_attempts = getattr(settings, 'GOOGLE_PHOTOS_BACKUP_MAX_ATTEMPTS', 6)
+
+    if attempts >= max_attempts:
+        PlayerAnswer.objects.filter(pk=answer_id).update(
+            google_photos_status='failed',
+            google_photos_next_attempt_at=None,
+            google_photos_error=str(error)[:1000],
+        )
+        logger.error(f"Giving up Google Photos backup for answer {answer_id} after {attempts} attempts: {error}")
+        return None
+
+    delay = get_retry_delay(attempts)
+    PlayerAnswer.objects.filter(pk=answer_id).update(
+        google_photos_status='pending',
+        google_photos_next_attempt_at=timezone.now() + timedelta(seconds=delay),
+        google_photos_error=str(error)[:1000],
+    )
+    logger.warning(f"Google Photos backup for answer {answer_id} failed (attempt {attempts}), retrying in {delay:.0f}s: {error}")
+    return delay
+
+
+def backup_answer(answer_id):
+    """
+    Upload one answer's photo to Google Photos.
+    Returns the retry delay in seconds if the upload should be retried.
+    """
+    return backup_answers([answer_id]).get(answer_id)
+
+
+def upload_answer_photo(answer, throttle=None):
+    """Upload one answer's photo bytes and return the upload token"""
+    from .google_photos_render import google_photos_service
+
+    if throttle is not None:
+        throttle.acquire()
+    with answer.photo_answer.open('rb') as photo_file:
+        return google_photos_service.upload_media(photo_file)
+
+
+def backup_answers(answer_ids, pool=None, throttle=None):
+    """
+    Upload a batch of answers' photos, then create all their media items
+    together. Returns {answer_id: retry delay} for uploads to be retried.
+
+    Uploads run on `pool` when given (otherwise one at a time, limited by
+    the per-process upload slots); `throttle` is an optional TokenBucket.
+    """
+    from .google_photos_render import google_photos_service
+    from .models import PlayerAnswer
+
+    claimed = [answer_id for answer_id in answer_ids if claim_backup(answer_id)]
+    if not claimed:
+        return {}
+
+    retries = {}
+    if not google_photos_service.is_configured():
+        for answer_id in claimed:
+            retries[answer_id] = record_backup_failure(answer_id, 'Google Photos upload unavailable')
+        return {answer_id: delay for answer_id, delay in retries.items() if delay}
+
+    def upload(answer):
+        try:
+            if pool is not None:
+                return answer, upload_answer_photo(answer, throttle), None
+            with get_upload_slots():
+                return answer, upload_answer_photo(answer, throttle), None
+        except Exception as e:
+            return answer, None, e
+
+    answers = PlayerAnswer.objects.select_related('player', 'question').in_bulk(claimed)
+    outcomes = pool.map(upload, answers.values()) if pool is not None else map(upload, answers.values())
+
+    # Database writes stay on this thread
+    uploaded = {}
+    for answer, upload_token, error in outcomes:
+        if error is not None:
+            retries[answer.pk] = record_backup_failure(answer.pk, error)
+        else:
+            uploaded[upload_token] = answer
+
+    if uploaded:
+        try:
+            results = google_photos_service.create_media_items([
+                {
+                    'upload_token': upload_token,
+                    'description': f"Treasure Hunt Question {answer.question.order}",
+                    'player_name': answer.player.name,
+                    'question_order': answer.question.order,
+                }
+                for upload_token, answer in uploaded.items()
+            ])
+        except Exception as e:
+            logger.error(f"Google Photos batchCreate failed for {len(uploaded)} photos: {e}")
+            results = {}
+
+        for upload_token, answer in uploaded.items():
+            photo_info = results.get(upload_token)
+            if photo_info:
+                record_backup_success(answer.pk, photo_info)
+            else:
+                retries[answer.pk] = record_backup_failure(answer.pk, 'Failed to create media item')
+
+        logger.info(f"Backed up {len(results)} of {len(claimed)} photos to Google Photos")
+
+    return {answer_id: delay for answer_id, delay in retries.items() if delay}
+
+
+def process_due_backups(limit=100):
+    """Queue workers for every backup that is due, in batches (used by the periodic sweep)"""
+    from .background import run_task
+    from .tasks import backup_answer_photos
+
+    if not is_backup_enabled():
+        return 0
+
+    answer_ids = list(due_backups().order_by('google_photos_next_attempt_at', 'pk').values_list('pk', flat=True)[:limit])
+    batch_size = get_batch_size()
+    for start in range(0, len(answer_ids), batch_size):
+        run_task(backup_answer_photos, answer_ids[start:start + batch_size])
+    return len(answer_ids)
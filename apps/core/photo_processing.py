@@ -0,0 +1,129 @@
+"""
+Photo answer processing.
+
+Phone photos are often 5-12 MB. After upload a background task builds
+downscaled renditions (thumbnail, review, full) with Pillow, strips EXIF
+metadata and records the original dimensions, so pages never have to
+serve the original file.
+"""
+
+import logging
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+# Rendition name -> bounding box (width, height), smallest first
+DEFAULT_RENDITION_SIZES = {
+    'thumbnail': (320, 320),
+    'review': (1024, 1024),
+    'full': (2048, 2048),
+}
+
+RENDITIONS_DIR = 'treasure_hunt_photos/renditions'
+
+
+def get_rendition_sizes():
+    """Rendition sizes, overridable with the PHOTO_RENDITION_SIZES setting"""
+    return getattr(settings, 'PHOTO_RENDITION_SIZES', DEFAULT_RENDITION_SIZES)
+
+
+def get_output_format():
+    """Prefer WebP, falling back to JPEG if Pillow was built without WebP"""
+    from PIL import features
+    if features.check('webp'):
+        return 'WEBP', 'webp', {'quality': 80, 'method': 4}
+    return 'JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}
+
+
+def rendition_name(photo_name, rendition, extension):
+    """Storage name for a rendition of a photo"""
+    stem = os.path.splitext(os.path.basename(photo_name))[0]
+    return f"{RENDITIONS_DIR}/{stem}_{rendition}.{extension}"
+
+
+def build_renditions(photo_file):
+    """
+    Build renditions for an image file.
+    Returns ((width, height), {rendition: (bytes, width, height)}).
+    """
+    from PIL import Image, ImageOps
+
+    image_format, _, save_options = get_output_format()
+
+    with Image.open(photo_file) as original:
+        # Apply the EXIF orientation before the metadata is dropped
+        image = ImageOps.exif_transpose(original)
+        original_size = image.size
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB')
+        if image_format == 'JPEG' and image.mode == 'RGBA':
+            image = image.convert('RGB')
+
+        renditions = {}
+        for rendition, size in sorted(get_rendition_sizes().items(), key=lambda item: item[1]):
+            resized = image.copy()
+            resized.thumbnail(size, Image.LANCZOS)
+            buffer = BytesIO()
+            # No exif= argument, so no metadata is written to the rendition
+            resized.save(buffer, image_format, **save_options)
+            renditions[rendition] = (buffer.getvalue(), resized.width, resized.height)
+
+    return original_size, renditions
+
+
+def process_answer_photo(answer):
+    """Generate and store renditions for a PlayerAnswer photo"""
+    from .models import PlayerAnswer
+
+    if not answer.photo_answer:
+        return False
+
+    # Photos are stored by content hash, so identical photos can share renditions
+    existing = PlayerAnswer.objects.filter(
+        photo_answer=answer.photo_answer.name
+    ).exclude(pk=answer.pk).exclude(photo_renditions={}).values(
+        'photo_renditions', 'photo_width', 'photo_height'
+    ).first()
+    if existing and all(default_storage.exists(r['name']) for r in existing['photo_renditions'].values()):
+        return bool(PlayerAnswer.objects.filter(
+            pk=answer.pk, photo_answer=answer.photo_answer.name
+        ).update(**existing))
+
+    _, extension, _ = get_output_format()
+
+    try:
+        with answer.photo_answer.open('rb') as photo_file:
+            (width, height), renditions = build_renditions(photo_file)
+    except Exception as e:
+        logger.error(f"Could not process photo for answer {answer.pk}: {e}")
+        return False
+
+    stored = {}
+    for rendition, (content, rendition_width, rendition_height) in renditions.items():
+        name = rendition_name(answer.photo_answer.name, rendition, extension)
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        name = default_storage.save(name, ContentFile(content))
+        stored[rendition] = {
+            'name': name,
+            'width': rendition_width,
+            'height': rendition_height,
+            'size': len(content),
+        }
+
+    # Only update if the photo was not replaced while we were working
+    updated = PlayerAnswer.objects.filter(
+        pk=answer.pk, photo_answer=answer.photo_answer.name
+    ).update(photo_renditions=stored, photo_width=width, photo_height=height)
+
+    if updated:
+        answer.photo_renditions = stored
+        answer.photo_width = width
+        answer.photo_height = height
+        logger.info(f"Created {len(stored)} photo renditions for answer {answer.pk}")
+    return bool(updated)
@@ -0,0 +1,285 @@
+"""
+Bulk import of Chodya Onam questions.
+
+Questions come from a CSV, JSON or YAML file (YAML needs PyYAML), with an
+optional zip of images referenced by file name in an `image` column. The
+whole file is validated before anything is written; images are then stored
+content-addressed in parallel and the questions are inserted with one
+bulk_create in a single transaction.
+
+Rows whose order already exists are skipped (or updated with
+existing='update'), so importing the same file twice is harmless.
+"""
+
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import posixpath
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Max
+
+from .uploads import PHOTO_EXTENSIONS, content_addressed_name, get_max_photo_bytes
+
+logger = logging.getLogger(__name__)
+
+QUESTION_IMAGE_DIR = 'question_images'
+
+# Columns that can be imported, with how to read them
+TEXT_FIELDS = ('question_text', 'question_type', 'option_a', 'option_b', 'option_c', 'option_d',
+               'correct_answer', 'accepted_answers')
+BOOLEAN_FIELDS = ('is_active', 'auto_grade')
+TRUE_VALUES = ('1', 'true', 'yes', 'y', 'on')
+FALSE_VALUES = ('0', 'false', 'no', 'n', 'off')
+
+
+class QuestionImportError(Exception):
+    """The import file (or its images) failed validation; `errors` lists every problem"""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__('; '.join(self.errors))
+
+
+def parse_questions(content, filename):
+    """Rows (dicts) from the bytes of a .csv, .json, .yaml or .yml file"""
+    extension = os.path.splitext(filename or '')[1].lower()
+    try:
+        text = content.decode('utf-8-sig') if isinstance(content, bytes) else content
+    except UnicodeDecodeError:
+        raise QuestionImportError(['The file is not UTF-8 encoded'])
+
+    if extension == '.csv':
+        reader = csv.DictReader(io.StringIO(text))
+        return [{key.strip(): value for key, value in row.items() if key} for row in reader]
+
+    if extension == '.json':
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            raise QuestionImportError([f'Invalid JSON: {e}'])
+    elif extension in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError:
+            raise QuestionImportError(['YAML import needs PyYAML (pip install pyyaml); use CSV or JSON instead'])
+        try:
+            data = yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise QuestionImportError([f'Invalid YAML: {e}'])
+    else:
+        raise QuestionImportError([f'Unsupported file type "{extension}", use .csv, .json or .yaml'])
+
+    if isinstance(data, dict):
+        data = data.get('questions')
+    if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+        raise QuestionImportError(['Expected a list of questions (or {"questions": [...]})'])
+    return data
+
+
+def read_images(images_zip):
+    """{file name: bytes} for the images in a zip (a path or file object)"""
+    max_bytes = get_max_photo_bytes()
+    images, errors = {}, []
+    try:
+        with zipfile.ZipFile(images_zip) as archive:
+            for info in archive.infolist():
+                name = posixpath.basename(info.filename)
+                if info.is_dir() or not name or name.startswith('.'):
+                    continue
+                if os.path.splitext(name)[1].lower() not in PHOTO_EXTENSIONS:
+                    continue
+                # Checked before reading, so a zip bomb is never inflated
+                if info.file_size > max_bytes:
+                    errors.append(f'Image {name} is larger than {max_bytes // (1024 * 1024)} MB')
+                    continue
+                images[name] = archive.read(info)
+    except zipfile.BadZipFile:
+        raise QuestionImportError(['The images file is not a valid zip'])
+    if errors:
+        raise QuestionImportError(errors)
+    return images
+
+
+def _clean_row(row, number, images, errors):
+    """Model field values for one row, recording problems in `errors`"""
+    from .models import TreasureHuntQuestion
+
+    def error(message):
+        errors.append(f'Row {number}: {message}')
+
+    values = {}
+    for field in TEXT_FIELDS:
+        value = row.get(field)
+        if value is not None:
+            values[field] = str(value).strip()
+
+    if not values.get('question_text'):
+        error('question_text is required')
+    question_types = dict(TreasureHuntQuestion.QUESTION_TYPES)
+    if values.get('question_type') not in question_types:
+        error(f"question_type must be one of {', '.join(question_types)}")
+    elif values['question_type'] == 'multiple_choice':
+        if not values.get('option_a') or not values.get('option_b'):
+            error('multiple choice questions need at least option_a and option_b')
+        if not values.get('correct_answer'):
+            error('multiple choice questions need a correct_answer')
+
+    for field, minimum in (('points', 1), ('order', 1)):
+        value = row.get(field)
+        if value in (None, ''):
+            continue
+        try:
+            values[field] = int(value)
+        except (TypeError, ValueError):
+            error(f'{field} must be a whole number')
+            continue
+        if values[field] < minimum:
+            error(f'{field} must be at least {minimum}')
+
+    if row.get('match_threshold') not in (None, ''):
+        try:
+            values['match_threshold'] = float(row['match_threshold'])
+            if not 0 <= values['match_threshold'] <= 1:
+                raise ValueError
+        except (TypeError, ValueError):
+            error('match_threshold must be a number between 0 and 1')
+
+    for field in BOOLEAN_FIELDS:
+        value = row.get(field)
+        if isinstance(value, bool):
+            values[field] = value
+            continue
+        value = str(value if value is not None else '').strip().lower()
+        if not value:
+            continue
+        if value in TRUE_VALUES:
+            values[field] = True
+        elif value in FALSE_VALUES:
+            values[field] = False
+        else:
+            error(f'{field} must be true or false')
+
+    image = str(row.get('image') or '').strip()
+    if image:
+        image = posixpath.basename(image)
+        if image not in images:
+            error(f'image {image} is not in the images zip')
+        values['image'] = image
+    return values
+
+
+def validate_questions(rows, images=None):
+    """
+    Check every row and return cleaned field values with an order assigned
+    to each; raise QuestionImportError listing every problem.
+    Rows without an order are numbered after the highest existing order.
+    """
+    from .models import TreasureHuntQuestion
+
+    images = images or {}
+    errors = []
+    if not rows:
+        raise QuestionImportError(['The file has no questions'])
+
+    cleaned = [_clean_row(row, number, images, errors) for number, row in enumerate(rows, start=1)]
+
+    seen = {}
+    for number, values in enumerate(cleaned, start=1):
+        order = values.get('order')
+        if order is None:
+            continue
+        if order in seen:
+            errors.append(f'Row {number}: order {order} is also used by row {seen[order]}')
+        seen[order] = number
+    if errors:
+        raise QuestionImportError(errors)
+
+    next_order = max(
+        TreasureHuntQuestion.objects.aggregate(highest=Max('order'))['highest'] or 0,
+        max(seen, default=0),
+    ) + 1
+    for values in cleaned:
+        if values.get('order') is None:
+            values['order'] = next_order
+            next_order += 1
+    return cleaned
+
+
+def store_images(images, names):
+    """Store the named images content-addressed, in parallel; {file name: storage name}"""
+    def store(name):
+        content = images[name]
+        stored_name = content_addressed_name(hashlib.sha256(content).hexdigest(), name, QUESTION_IMAGE_DIR)
+        if not default_storage.exists(stored_name):
+            stored_name = default_storage.save(stored_name, ContentFile(content))
+        return name, stored_name
+
+    names = sorted(set(names))
+    if not names:
+        return {}
+    workers = max(1, min(getattr(settings, 'QUESTION_IMPORT_IMAGE_WORKERS', 4), len(names)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='question-images') as pool:
+        return dict(pool.map(store, names))
+
+
+def import_questions(rows, images=None, existing='skip'):
+    """
+    Validate and import question rows. `images` maps file names to bytes
+    (see read_images). Questions whose order already exists are skipped,
+    or updated when existing='update'.
+    Returns {'created': n, 'updated': n, 'skipped': n, 'images': n}.
+    """
+    from .models import TreasureHuntQuestion
+
+    cleaned = validate_questions(rows, images)
+    current = {}
+    for question in TreasureHuntQuestion.objects.filter(order__in=[values['order'] for values in cleaned]).order_by('-pk'):
+        current[question.order] = question  # The oldest question wins if an order is used twice
+    if existing != 'update':
+        skipped = [values for values in cleaned if values['order'] in current]
+        cleaned = [values for values in cleaned if values['order'] not in current]
+    else:
+        skipped = []
+
+    # Images are content-addressed, so one left behind by a failed insert is simply reused next time
+    stored = store_images(images or {}, [values['image'] for values in cleaned if values.get('image')])
+
+    new_questions, changed_questions, changed_fields = [], [], set()
+    for values in cleaned:
+        image = values.pop('image', None)
+        if image:
+            values['question_image'] = stored[image]
+        question = current.get(values['order'])
+        if question is None:
+            new_questions.append(TreasureHuntQuestion(**values))
+            continue
+        for field, value in values.items():
+            setattr(question, field, value)
+        changed_fields.update(values)
+        changed_questions.append(question)
+
+    with transaction.atomic():
+        TreasureHuntQuestion.objects.bulk_create(new_questions)
+        changed_fields.discard('order')
+        if changed_questions and changed_fields:
+            TreasureHuntQuestion.objects.bulk_update(changed_questions, sorted(changed_fields))
+
+    logger.info(
+        f"Imported questions: {len(new_questions)} created, {len(changed_questions)} updated, "
+        f"{len(skipped)} skipped, {len(stored)} images"
+    )
+    return {
+        'created': len(new_questions),
+        'updated': len(changed_questions),
+        'skipped': len(skipped),
+        'images': len(stored),
+    }
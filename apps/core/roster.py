@@ -0,0 +1,235 @@
+"""
+Roster import and balanced team assignment.
+
+A roster is a CSV of guest names with an optional team column (a team code
+or team name). Names are matched case- and whitespace-insensitively, both
+within the file and against existing players, so importing the same list
+twice creates nobody new. New players are inserted with one bulk_create.
+
+Balanced assignment spreads players over the active teams so headcounts
+stay level (and, optionally, so do the teams' current score totals), and
+writes every assignment with one bulk_update.
+"""
+
+import csv
+import heapq
+import io
+import logging
+
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from .search import index_search_tokens, normalize_text
+
+logger = logging.getLogger(__name__)
+
+MIN_NAME_LENGTH = 2  # Same minimum as self-registration in SelectPlayerView
+
+
+class RosterImportError(Exception):
+    """The roster failed validation; `errors` lists every problem"""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__('; '.join(self.errors))
+
+
+def normalize_name(name):
+    """Key two spellings of the same guest's name share (Player.name_key): case and spacing ignored"""
+    from .models import Player
+
+    return normalize_text(name, Player._meta.get_field('name_key').max_length)
+
+
+def get_active_teams():
+    """{team code: team name} of the teams players can be assigned to"""
+    from .models import Player, TeamConfiguration
+
+    teams = dict(
+        TeamConfiguration.objects.filter(is_active=True).exclude(team_code='unassigned')
+        .values_list('team_code', 'team_name')
+    )
+    if not teams:
+        # Team configuration not set up yet: fall back to the built-in teams
+        teams = {code: name for code, name in Player.TEAM_CHOICES if code != 'unassigned'}
+    return teams
+
+
+def parse_roster(content):
+    """
+    Rows of {'name': ..., 'team': ...} from the bytes of a CSV file. A header
+    row with a `name` column is used when present; otherwise the first column
+    is the name and the second (optional) the team.
+    """
+    try:
+        text = content.decode('utf-8-sig') if isinstance(content, bytes) else content
+    except UnicodeDecodeError:
+        raise RosterImportError(['The file is not UTF-8 encoded'])
+
+    rows = [row for row in csv.reader(io.StringIO(text)) if any(cell.strip() for cell in row)]
+    if not rows:
+        raise RosterImportError(['The file has no names'])
+
+    header = [cell.strip().lower() for cell in rows[0]]
+    if 'name' in header:
+        name_column = header.index('name')
+        team_column = header.index('team') if 'team' in header else None
+        rows = rows[1:]
+    else:
+        name_column, team_column = 0, 1
+    return [
+        {
+            'name': row[name_column] if name_column < len(row) else '',
+            'team': row[team_column] if team_column is not None and team_column < len(row) else '',
+        }
+        for row in rows
+    ]
+
+
+def validate_roster(rows):
+    """
+    Check every row and return [(name, normalized name, team code or None)],
+    one per distinct guest; raise RosterImportError listing every problem.
+    """
+    from .models import Player
+
+    teams = get_active_teams()
+    team_lookup = {code.casefold(): code for code in teams}
+    team_lookup.update({name.casefold(): code for code, name in teams.items()})
+    max_length = Player._meta.get_field('name').max_length
+
+    errors, cleaned, seen = [], [], {}
+    for number, row in enumerate(rows, start=1):
+        name = ' '.join(str(row.get('name') or '').split())
+        team = str(row.get('team') or '').strip()
+        if len(name) < MIN_NAME_LENGTH:
+            errors.append(f'Row {number}: name must be at least {MIN_NAME_LENGTH} characters long')
+            continue
+        if len(name) > max_length:
+            errors.append(f'Row {number}: name must be at most {max_length} characters long')
+            continue
+        team_code = None
+        if team:
+            team_code = team_lookup.get(team.casefold())
+            if team_code is None:
+                errors.append(f'Row {number}: unknown team "{team}"')
+                continue
+
+        key = normalize_name(name)
+        if key in seen:
+            first_number, first_team = seen[key]
+            if team_code and first_team and team_code != first_team:
+                errors.append(f'Row {number}: {name} is also on row {first_number} with a different team')
+            continue
+        seen[key] = (number, team_code)
+        cleaned.append((name, key, team_code))
+
+    if errors:
+        raise RosterImportError(errors)
+    return cleaned
+
+
+def import_roster(rows, existing='skip'):
+    """
+    Validate and import roster rows. Guests matching an existing player by
+    normalized name are skipped, or with existing='update' reactivated and
+    moved to the team given in the file.
+    Returns {'created': n, 'updated': n, 'skipped': n}.
+    """
+    from .dashboard import invalidate_dashboard_stats
+    from .models import Player
+
+    cleaned = validate_roster(rows)
+    current = {}
+    existing_players = Player.objects.filter(name_key__in=[key for _, key, _ in cleaned])
+    for player in existing_players.order_by('-pk').only('pk', 'name_key', 'team', 'is_active'):
+        current[player.name_key] = player  # The oldest player wins if a name is used twice
+
+    new_players, changed_players, skipped = [], [], 0
+    for name, key, team_code in cleaned:
+        player = current.get(key)
+        if player is None:
+            new_players.append(Player(name=name, name_key=key, team=team_code or 'unassigned', is_active=True))
+            continue
+        if existing != 'update' or (player.is_active and team_code in (None, player.team)):
+            skipped += 1
+            continue
+        player.is_active = True
+        if team_code:
+            player.team = team_code
+        changed_players.append(player)
+
+    with transaction.atomic():
+        Player.objects.bulk_create(new_players)
+        index_search_tokens(new_players, 'name_key')
+        if changed_players:
+            Player.objects.bulk_update(changed_players, ['team', 'is_active'])
+    if new_players or changed_players:
+        invalidate_dashboard_stats()
+
+    logger.info(f"Imported roster: {len(new_players)} created, {len(changed_players)} updated, {skipped} skipped")
+    return {'created': len(new_players), 'updated': len(changed_players), 'skipped': skipped}
+
+
+def balance_teams(players, team_counts, team_scores=None):
+    """
+    Pick a team for each player: every player joins the team with the fewest
+    members so far, ties going to the lowest score total when `team_scores`
+    is given. Players are placed highest score first in that case, so strong
+    players end up spread across the teams.
+    Returns {player: team code}.
+    """
+    if not team_counts:
+        return {}
+    by_score = team_scores is not None
+    team_scores = team_scores or {}
+    heap = [(count, team_scores.get(code, 0) if by_score else 0, code) for code, count in team_counts.items()]
+    heapq.heapify(heap)
+    if by_score:
+        players = sorted(players, key=lambda player: (-player.score, player.pk))
+
+    assignments = {}
+    for player in players:
+        count, score, code = heapq.heappop(heap)
+        assignments[player] = code
+        heapq.heappush(heap, (count + 1, score + (player.score if by_score else 0), code))
+    return assignments
+
+
+def assign_balanced_teams(players=None, by_score=False):
+    """
+    Spread players (default: every active unassigned player) across the
+    active teams, balancing against the players already on them, and save
+    the assignments with one bulk_update.
+    Returns {team code: players added}.
+    """
+    from .dashboard import invalidate_dashboard_stats
+    from .models import Player
+
+    teams = get_active_teams()
+    if players is None:
+        players = Player.objects.filter(is_active=True, team='unassigned')
+    players = list(players.only('pk', 'name', 'team', 'score').order_by('pk'))
+    if not players or not teams:
+        return {}
+
+    # Headcounts (and score totals) of the players staying where they are
+    staying = Player.objects.filter(is_active=True, team__in=teams).exclude(pk__in=[player.pk for player in players])
+    totals = {
+        row['team']: row
+        for row in staying.order_by().values('team').annotate(members=Count('pk'), score_total=Sum('score'))
+    }
+    team_counts = {code: totals.get(code, {}).get('members', 0) for code in teams}
+    team_scores = {code: totals.get(code, {}).get('score_total') or 0 for code in teams} if by_score else None
+
+    assignments = balance_teams(players, team_counts, team_scores)
+    for player, code in assignments.items():
+        player.team = code
+    Player.objects.bulk_update(players, ['team'], batch_size=500)
+    invalidate_dashboard_stats()
+
+    added = {code: 0 for code in teams}
+    for code in assignments.values():
+        added[code] += 1
+    logger.info(f"Balanced team assignment of {len(players)} players: {added}")
+    return added
@@ -0,0 +1,272 @@
+"""
+Batch score entry for team events.
+
+The score grid submits points (and optionally the participating players)
+for every event × team cell at once. The whole grid is validated before
+anything is written; changed scores are upserted with one bulk_create,
+participations with one more, and the affected players' totals are then
+recomputed together instead of once per saved score.
+"""
+
+import logging
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+logger = logging.getLogger(__name__)
+
+# EventScore.points is a DecimalField(max_digits=5, decimal_places=2)
+MAX_POINTS = Decimal('999.99')
+
+
+def _clean_points(value, label, errors):
+    """Points as a Decimal, None for a blank cell, recording an error if invalid"""
+    value = str(value if value is not None else '').strip()
+    if not value:
+        return None
+    try:
+        points = Decimal(value).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        errors.append(f'{label}: points must be a number')
+        return None
+    if not 0 <= points <= MAX_POINTS:
+        errors.append(f'{label}: points must be between 0 and {MAX_POINTS}')
+        return None
+    return points
+
+
+def validate_score_grid(cells):
+    """
+    Check every cell of a score grid and return the cleaned cells, or raise
+    ValidationError listing every problem.
+
+    Each cell is a dict with `event` (id), `team` (code), `points`, optional
+    `notes` and optional `players` (ids; None leaves participants as they are).
+    Cells with blank points and no participant list are dropped.
+    """
+    from .models import Event, Player
+
+    team_names = {code: name for code, name in Player.TEAM_CHOICES if code != 'unassigned'}
+    event_ids = set()
+    for cell in cells:
+        try:
+            event_ids.add(int(cell.get('event')))
+        except (TypeError, ValueError):
+            pass
+    events = Event.objects.in_bulk(event_ids)
+
+    player_ids = set()
+    for cell in cells:
+        for player_id in cell.get('players') or ():
+            try:
+                player_ids.add(int(player_id))
+            except (TypeError, ValueError):
+                pass
+    players = Player.objects.filter(is_active=True).in_bulk(player_ids)
+
+    errors, cleaned, seen = [], [], set()
+    for cell in cells:
+        try:
+            event = events.get(int(cell.get('event')))
+        except (TypeError, ValueError):
+            event = None
+        team = cell.get('team')
+        if event is None:
+            errors.append(f"Event {cell.get('event')}: does not exist")
+            continue
+        if team not in team_names:
+            errors.append(f'{event.name}: unknown team {team}')
+            continue
+        label = f'{event.name} / {team_names[team]}'
+        if (event.pk, team) in seen:
+            errors.append(f'{label}: entered more than once')
+            continue
+        seen.add((event.pk, team))
+
+        points = _clean_points(cell.get('points'), label, errors)
+        selected = None
+        if cell.get('players') is not None:
+            selected = set()
+            for player_id in cell['players']:
+                try:
+                    player = players.get(int(player_id))
+                except (TypeError, ValueError):
+                    player = None
+                if player is None:
+                    errors.append(f'{label}: player {player_id} does not exist or is inactive')
+                elif player.team != team:
+                    errors.append(f'{label}: {player.name} is not in {team_names[team]}')
+                else:
+                    selected.add(player.pk)
+
+        if points is None and selected is None:
+            continue
+        cleaned.append({
+            'event': event,
+            'team': team,
+            'points': points,
+            'notes': str(cell.get('notes') or '').strip(),
+            'players': selected,
+        })
+
+    if errors:
+        raise ValidationError(errors)
+    return cleaned
+
+
+def refresh_player_scores(player_ids):
+    """
+    Recompute the total score of the given players: correct treasure hunt
+    answers, individual event points and their share of each team event
+    score they took part in (the same sum EventScore.update_single_player_score
+    makes), in a fixed number of queries.
+    """
+    from .models import EventScore, IndividualEventScore, Player, PlayerAnswer, TeamEventParticipation
+
+    player_ids = set(player_ids)
+    if not player_ids:
+        return 0
+
+    treasure = dict(
+        PlayerAnswer.objects.filter(player_id__in=player_ids, is_correct=True)
+        .order_by().values('player').annotate(total=Sum('points_awarded')).values_list('player', 'total')
+    )
+    individual = dict(
+        IndividualEventScore.objects.filter(player_id__in=player_ids)
+        .order_by().values('player').annotate(total=Sum('points')).values_list('player', 'total')
+    )
+
+    # A team event is shared between everyone who took part in it
+    scores = EventScore.objects.filter(
+        participations__player_id__in=player_ids, participations__participated=True
+    ).annotate(
+        participant_total=Count('participations', filter=Q(participations__participated=True), distinct=True)
+    )
+    shares = {score.pk: (score.team, float(score.points) / score.participant_total) for score in scores}
+    team_events = defaultdict(float)
+    for event_score_id, player_id in TeamEventParticipation.objects.filter(
+        event_score_id__in=shares, player_id__in=player_ids, participated=True
+    ).values_list('event_score_id', 'player_id'):
+        team_events[player_id, shares[event_score_id][0]] += shares[event_score_id][1]
+
+    players = list(Player.objects.filter(pk__in=player_ids).only('pk', 'team', 'score'))
+    for player in players:
+        total = (treasure.get(player.pk) or 0) + float(individual.get(player.pk) or 0)
+        total += team_events.get((player.pk, player.team), 0)
+        player.score = int(total)
+    Player.objects.bulk_update(players, ['score'])
+    return len(players)
+
+
+def submit_score_grid(cells, awarded_by):
+    """
+    Validate and save a whole score grid in one transaction, then refresh the
+    totals of every player whose team event shares may have changed.
+    Returns {'scores': n, 'participants': n, 'players': n}.
+    """
+    from .models import EventScore, TeamEventParticipation
+
+    cleaned = validate_score_grid(cells)
+    if not cleaned:
+        return {'scores': 0, 'participants': 0, 'players': 0}
+
+    event_ids = {cell['event'].pk for cell in cleaned}
+    teams = {cell['team'] for cell in cleaned}
+
+    with transaction.atomic():
+        current = {
+            (score.event_id, score.team): score
+            for score in EventScore.objects.select_for_update().filter(event_id__in=event_ids, team__in=teams)
+        }
+        participants = defaultdict(set)
+        for event_score_id, player_id in TeamEventParticipation.objects.filter(
+            event_score__in=current.values(), participated=True
+        ).values_list('event_score_id', 'player_id'):
+            participants[event_score_id].add(player_id)
+
+        # Only cells that change something are written
+        changed = []
+        for cell in cleaned:
+            score = current.get((cell['event'].pk, cell['team']))
+            if score is None:
+                if cell['points'] is not None or cell['players']:
+                    changed.append(cell)
+                continue
+            if cell['points'] is not None and (cell['points'] != score.points or cell['notes'] != score.notes):
+                changed.append(cell)
+            elif cell['players'] is not None and cell['players'] != participants[score.pk]:
+                changed.append(cell)
+        if not changed:
+            return {'scores': 0, 'participants': 0, 'players': 0}
+
+        rows = []
+        for cell in changed:
+            score = current.get((cell['event'].pk, cell['team']))
+            rows.append(EventScore(
+                event=cell['event'],
+                team=cell['team'],
+                points=cell['points'] if cell['points'] is not None else (score.points if score else 0),
+                notes=cell['notes'] if cell['points'] is not None else (score.notes if score else ''),
+                awarded_by=awarded_by,
+            ))
+        EventScore.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['event', 'team'],
+            update_fields=['points', 'notes', 'awarded_by'],
+        )
+        saved = {
+            (score.event_id, score.team): score
+            for score in EventScore.objects.filter(event_id__in=event_ids, team__in=teams)
+        }
+
+        affected = set()
+        picked, dropped_ids = [], []
+        for cell in changed:
+            score = saved[cell['event'].pk, cell['team']]
+            affected.update(participants[score.pk])
+            if cell['players'] is None:
+                continue
+            affected.update(cell['players'])
+            picked.extend(
+                TeamEventParticipation(event_score=score, player_id=player_id, participated=True)
+                for player_id in sorted(cell['players'])
+            )
+            dropped_ids.append((score.pk, participants[score.pk] - cell['players']))
+        TeamEventParticipation.objects.bulk_create(
+            picked,
+            update_conflicts=True,
+            unique_fields=['event_score', 'player'],
+            update_fields=['participated', 'updated_at'],
+        )
+        dropped = Q(pk__in=[])
+        for event_score_id, player_ids in dropped_ids:
+            if player_ids:
+                dropped |= Q(event_score_id=event_score_id, player_id__in=player_ids)
+        TeamEventParticipation.objects.filter(dropped).update(participated=False)
+
+        # Scores set to follow their participant count are recalculated once participants are in
+        auto = [
+            score for score in EventScore.objects.filter(
+                pk__in=[saved[cell['event'].pk, cell['team']].pk for cell in changed],
+                auto_calculate_points=True,
+                points_per_participant__gt=0,
+            ).annotate(
+                participant_total=Count('participations', filter=Q(participations__participated=True))
+            )
+        ]
+        for score in auto:
+            score.points = score.points_per_participant * score.participant_total
+        if auto:
+            EventScore.objects.bulk_update(auto, ['points'])
+
+        refreshed = refresh_player_scores(affected)
+
+    logger.info(
+        f"Score grid by {awarded_by}: {len(changed)} scores, {len(picked)} participants, "
+        f"{refreshed} player totals refreshed"
+    )
+    return {'scores': len(changed), 'participants': len(picked), 'players': refreshed}
@@ -0,0 +1,109 @@
+"""
+Indexed admin search.
+
+On PostgreSQL the admin's icontains lookups, UPPER(column::text) LIKE
+UPPER('%term%'), are served by pg_trgm GIN indexes on the same expression
+(migration 0024). Other databases have no trigram indexes, so
+IndexedSearchMixin searches them differently:
+
+- Columns listed in a model's SEARCH_KEYS have each word of a normalized
+  copy of their text stored as a SearchToken. A search term matches rows
+  with a word starting with it, found by a range lookup on the token
+  index; a quoted phrase is looked up by its first word, then checked
+  against the normalized text of just those rows.
+- Related lookups become `fk IN (subquery)`, so each search term stays an
+  index lookup on the searched table instead of a scan over a join.
+
+Matching is by word start, so this is narrower than icontains: "krish"
+finds "Anu Krishnan" but not "Gopikrishnan". Only a search that finds
+nothing by word start is run again as the admin's usual icontains search.
+"""
+
+from django.db import connections
+from django.db.models import Q
+from django.utils.text import smart_split, unescape_string_literal
+
+# Sorts after every character, so [prefix, prefix + PREFIX_END) holds exactly the strings starting with prefix
+PREFIX_END = '\U0010ffff'
+
+
+def normalize_text(value, max_length=None):
+    """Text as searched and de-duplicated: spacing collapsed and case folded"""
+    text = ' '.join(str(value or '').split()).casefold()
+    return text[:max_length] if max_length else text
+
+
+def index_search_tokens(instances, key):
+    """Replace the SearchTokens of `instances` for search key `key` with the words of its current value"""
+    from django.contrib.contenttypes.models import ContentType
+    from .models import SearchToken
+
+    instances = [instance for instance in instances if instance.pk]
+    if not instances:
+        return
+    content_type = ContentType.objects.get_for_model(instances[0])
+    SearchToken.objects.filter(
+        content_type=content_type, field=key, object_id__in=[instance.pk for instance in instances]
+    ).delete()
+    SearchToken.objects.bulk_create([
+        SearchToken(content_type=content_type, object_id=instance.pk, field=key, token=token)
+        for instance in instances
+        for token in set(getattr(instance, key).split())
+    ])
+
+
+def prefix_q(field, prefix):
+    """Filter for values of `field` starting with `prefix`, usable by a B-tree index"""
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': prefix + PREFIX_END})
+
+
+def term_q(model, lookup, term):
+    """Filter matching one search term in one search field of `model` without trigram indexes"""
+    name, _, rest = lookup.partition('__')
+    field = model._meta.get_field(name)
+    if rest and field.many_to_one:
+        related = field.related_model
+        return Q(**{f'{name}__in': related._default_manager.filter(term_q(related, rest, term)).values('pk')})
+    key = getattr(model, 'SEARCH_KEYS', {}).get(lookup)
+    words = normalize_text(term, model._meta.get_field(key).max_length).split() if key else []
+    if not words:
+        return Q(**{f'{lookup}__icontains': term})
+
+    from django.contrib.contenttypes.models import ContentType
+    from .models import SearchToken
+
+    tokens = SearchToken.objects.filter(
+        prefix_q('token', words[0]), content_type=ContentType.objects.get_for_model(model), field=key
+    )
+    match = Q(pk__in=tokens.values('object_id'))
+    if len(words) > 1:
+        match &= Q(**{f'{key}__contains': ' '.join(words)})
+    return match
+
+
+class IndexedSearchMixin:
+    """
+    ModelAdmin mixin for search_fields given as plain field paths (no ^, =
+    or @ prefixes). Changelist search and autocomplete both go through it.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        from django.contrib.admin.utils import lookup_spawns_duplicates
+
+        search_fields = self.get_search_fields(request)
+        if not search_term or not search_fields or connections[queryset.db].vendor == 'postgresql':
+            return super().get_search_results(request, queryset, search_term)
+
+        results = queryset
+        for bit in smart_split(search_term):
+            if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+                bit = unescape_string_literal(bit)
+            matches = Q()
+            for lookup in search_fields:
+                matches |= term_q(queryset.model, lookup, bit)
+            results = results.filter(matches)
+        if not results.exists():
+            # No word starts with the search terms: look inside words instead
+            return super().get_search_results(request, queryset, search_term)
+        may_have_duplicates = any(lookup_spawns_duplicates(self.opts, lookup) for lookup in search_fields)
+        return results, may_have_duplicates
@@ -0,0 +1,57 @@
+"""
+Celery tasks for the core app.
+Use apps.core.background.dispatch() to queue them; it falls back to a
+thread pool when no broker is available.
+"""
+
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def process_answer_photo(answer_id):
+    """Build downscaled renditions for a photo answer"""
+    from .models import PlayerAnswer
+    from .photo_processing import process_answer_photo as build
+
+    try:
+        answer = PlayerAnswer.objects.get(pk=answer_id)
+    except PlayerAnswer.DoesNotExist:
+        logger.warning(f"Photo answer {answer_id} no longer exists")
+        return False
+    return build(answer)
+
+
+@shared_task
+def backup_answer_photo(answer_id):
+    """Back up a photo answer to Google Photos, rescheduling itself on failure"""
+    from .background import run_task_later
+    from .photo_backup import backup_answer
+
+    retry_delay = backup_answer(answer_id)
+    if retry_delay:
+        run_task_later(backup_answer_photo, retry_delay, answer_id)
+    return retry_delay is None
+
+
+@shared_task
+def backup_answer_photos(answer_ids):
+    """Back up a batch of photo answers, creating their media items together"""
+    from .background import run_task_later
+    from .photo_backup import backup_answers
+
+    retries = backup_answers(answer_ids)
+    if retries:
+        # Retries go back through the queue so they are batched again
+        run_task_later(process_photo_backups, min(retries.values()))
+    return len(answer_ids) - len(retries)
+
+
+@shared_task
+def process_photo_backups(limit=100):
+    """Periodic sweep for due and retried Google Photos backups"""
+    from .photo_backup import process_due_backups
+    return process_due_backups(limit)
@@ -0,0 +1,230 @@
+"""
+Rate limiting helpers.
+
+TokenBucket limits work inside one process (uploads, backfills).
+rate_limit() guards views with token buckets kept in the cache, so every
+worker shares them; when the cache cannot be used (dummy or database
+cache) the buckets are kept in process instead. Rejected requests get a 429 from RateLimitMiddleware,
+before the view or the player tracking middleware queries the database.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import Counter, OrderedDict
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.dummy import DummyCache
+from django.http import HttpResponse, JsonResponse
+
+logger = logging.getLogger(__name__)
+
+RATE_PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+BUCKET_CACHE_PREFIX = 'ratelimit:bucket'
+REJECTIONS_CACHE_PREFIX = 'ratelimit:rejections'
+MAX_LOCAL_BUCKETS = 10000
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: refills at `rate` tokens per second and
+    holds at most `capacity` tokens (defaults to one second's worth).
+    """
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self, tokens=1):
+        """Take tokens if available, without waiting"""
+        with self._lock:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1):
+        """Take tokens, sleeping until enough have accumulated"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def parse_rate(rate):
+    """'30/m' -> (capacity, tokens per second)"""
+    try:
+        count, period = rate.split('/')
+        count = int(count)
+        seconds = RATE_PERIODS[period.strip().lower()[:1]]
+    except (AttributeError, ValueError, KeyError):
+        raise ValueError(f'Invalid rate {rate!r}, expected "<requests>/<s|m|h|d>"')
+    if count <= 0:
+        raise ValueError(f'Invalid rate {rate!r}, the request count must be positive')
+    return count, count / seconds
+
+
+_local_buckets = OrderedDict()
+_local_lock = threading.Lock()
+
+# Rejections seen by this process, by (endpoint, scope)
+rejections = Counter()
+
+
+def _take_local(key, capacity, rate):
+    """Take a token from an in-process bucket (least recently used ones are dropped)"""
+    with _local_lock:
+        bucket = _local_buckets.pop(key, None)
+        if bucket is None or bucket.capacity != capacity or bucket.rate != rate:
+            bucket = TokenBucket(rate, capacity)
+        _local_buckets[key] = bucket
+        if len(_local_buckets) > MAX_LOCAL_BUCKETS:
+            _local_buckets.popitem(last=False)
+    return bucket.try_acquire()
+
+
+def _take_cached(cache, key, capacity, rate):
+    """
+    Take a token from a bucket stored in the cache as (tokens, timestamp).
+    The read and write are not atomic, so concurrent hits may let a request
+    or two through over the limit; that is fine for shedding load.
+    """
+    now = time.time()
+    tokens, updated_at = cache.get(key) or (capacity, now)
+    tokens = min(capacity, tokens + max(now - updated_at, 0) * rate)
+    if tokens < 1:
+        return False
+    # Keep the bucket only as long as it takes to refill completely
+    cache.set(key, (tokens - 1, now), timeout=math.ceil(capacity / rate) + 1)
+    return True
+
+
+def _get_cache():
+    """
+    The cache shared buckets live in, or None to keep them in process: a
+    dummy cache stores nothing, and a database cache would put ORM queries
+    in front of every rejection
+    """
+    cache = caches[getattr(settings, 'RATELIMIT_CACHE', 'default')]
+    return None if isinstance(cache, (DummyCache, DatabaseCache)) else cache
+
+
+def take_token(key, rate):
+    """Take one token from the bucket `key` limited to `rate`; False if it is empty"""
+    capacity, per_second = parse_rate(rate)
+    cache = _get_cache()
+    if cache is not None:
+        try:
+            return _take_cached(cache, f'{BUCKET_CACHE_PREFIX}:{key}', capacity, per_second)
+        except Exception as e:
+            logger.warning(f"Rate limit cache unavailable, using in-process buckets: {e}")
+    return _take_local(key, capacity, per_second)
+
+
+def record_rejection(endpoint, scope):
+    rejections[(endpoint, scope)] += 1
+    cache = _get_cache()
+    if cache is None:
+        return
+    key = f'{REJECTIONS_CACHE_PREFIX}:{endpoint}:{scope}'
+    try:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+    except Exception:
+        pass
+
+
+def get_rejection_counts():
+    """Rejected requests per (endpoint, scope), across workers when the cache is shared"""
+    counts = Counter(rejections)
+    cache = _get_cache()
+    if cache is None:
+        return counts
+    keys = {
+        f'{REJECTIONS_CACHE_PREFIX}:{endpoint}:{scope}': (endpoint, scope)
+        for endpoint, scopes in getattr(settings, 'RATELIMITS', {}).items()
+        for scope in scopes
+    }
+    try:
+        for key, value in cache.get_many(list(keys)).items():
+            counts[keys[key]] = value
+    except Exception:
+        pass
+    return counts
+
+
+def get_scope_key(request, scope):
+    """Bucket identity for a request, or None if the scope does not apply to it"""
+    if scope == 'session':
+        # A first request has no session yet. Guests share the venue's NAT address, so
+        # keying on REMOTE_ADDR would put everyone checking in into one bucket
+        return request.session.session_key
+    if scope == 'team':
+        team = request.session.get('player_team_code')
+        return team if team and team != 'unassigned' else None
+    raise ValueError(f'Unknown rate limit scope {scope!r}')
+
+
+def too_many_requests(request, retry_after):
+    message = 'Too many requests, please wait a moment and try again.'
+    wants_json = 'application/json' in request.headers.get('Accept', '') or '/api/' in request.path
+    if wants_json:
+        response = JsonResponse({'status': 'error', 'message': message}, status=429)
+    else:
+        response = HttpResponse(message, status=429, content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def check_rate_limit(request, endpoint):
+    """Take a token from each of the endpoint's buckets; a 429 response if one is empty"""
+    request._rate_limit_checked = True
+    for scope, rate in getattr(settings, 'RATELIMITS', {}).get(endpoint, {}).items():
+        key = get_scope_key(request, scope)
+        if key is None or take_token(f'{endpoint}:{scope}:{key}', rate):
+            continue
+        record_rejection(endpoint, scope)
+        logger.info(f"Rate limited {endpoint} ({scope} {key})")
+        capacity, per_second = parse_rate(rate)
+        return too_many_requests(request, math.ceil(1 / per_second))
+    return None
+
+
+def rate_limit(endpoint, methods=('POST',)):
+    """
+    Limit a view with the token buckets configured in RATELIMITS[endpoint].
+    Only requests using one of `methods` are counted. RateLimitMiddleware
+    applies the limit before other middleware touches the database; without
+    it the check happens here.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped(request, *args, **kwargs):
+            if (getattr(settings, 'RATELIMIT_ENABLE', True) and request.method in methods
+                    and not getattr(request, '_rate_limit_checked', False)):
+                rejected = check_rate_limit(request, endpoint)
+                if rejected is not None:
+                    return rejected
+            return view_func(request, *args, **kwargs)
+        wrapped.rate_limit = (endpoint, methods)
+        return wrapped
+    return decorator
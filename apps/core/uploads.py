@@ -0,0 +1,107 @@
+"""
+Streaming upload handling for photo answers.
+
+HashingPhotoUploadHandler streams photo answers straight to a temporary
+file on disk, enforcing PHOTO_UPLOAD_MAX_BYTES and computing a SHA-256
+of the content as it arrives. Photos are then stored content-addressed,
+so a retried upload of the same photo is only stored once.
+"""
+
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile, StopFutureHandlers
+
+PHOTO_UPLOAD_DIR = 'treasure_hunt_photos'
+PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.heif')
+
+
+def get_max_photo_bytes():
+    """Largest photo answer we accept"""
+    return getattr(settings, 'PHOTO_UPLOAD_MAX_BYTES', 15 * 1024 * 1024)
+
+
+class HashingPhotoUploadHandler(FileUploadHandler):
+    """
+    Stream photo answer uploads to disk while hashing them.
+    Files for other form fields are passed on to the next handler.
+    """
+    field_names = ('photo_answer',)
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.active = field_name in self.field_names
+        if not self.active:
+            return
+
+        self.max_bytes = get_max_photo_bytes()
+        if self.content_length and self.content_length > self.max_bytes:
+            self._reject()
+
+        self.hasher = hashlib.sha256()
+        self.file = TemporaryUploadedFile(
+            self.file_name, self.content_type, 0, self.charset, self.content_type_extra
+        )
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.active:
+            return raw_data
+
+        if start + len(raw_data) > self.max_bytes:
+            self.file.close()
+            self._reject()
+
+        self.hasher.update(raw_data)
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if not self.active:
+            return None
+
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.content_hash = self.hasher.hexdigest()
+        return self.file
+
+    def _reject(self):
+        """Skip the rest of an oversized photo and tell the view why"""
+        limit_mb = self.max_bytes // (1024 * 1024)
+        if self.request is not None:
+            self.request.photo_upload_error = f'Photo is too large. Please upload a photo under {limit_mb} MB.'
+        raise SkipFile()
+
+
+def get_content_hash(uploaded_file):
+    """SHA-256 of an uploaded file (computed while streaming when possible)"""
+    content_hash = getattr(uploaded_file, 'content_hash', None)
+    if content_hash:
+        return content_hash
+
+    hasher = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        hasher.update(chunk)
+    uploaded_file.seek(0)
+    uploaded_file.content_hash = hasher.hexdigest()
+    return uploaded_file.content_hash
+
+
+def content_addressed_name(content_hash, original_name, directory=PHOTO_UPLOAD_DIR):
+    """Storage name for a photo, derived from its content hash"""
+    extension = os.path.splitext(original_name or '')[1].lower()
+    if extension not in PHOTO_EXTENSIONS:
+        extension = '.jpg'
+    return f"{directory}/{content_hash[:2]}/{content_hash}{extension}"
+
+
+def store_photo(uploaded_file, content_hash=None):
+    """Store a photo under its content hash, reusing an identical stored copy"""
+    content_hash = content_hash or get_content_hash(uploaded_file)
+    name = content_addressed_name(content_hash, uploaded_file.name)
+    if default_storage.exists(name):
+        return name
+    return default_storage.save(name, uploaded_file)
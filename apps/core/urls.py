@@ -21,6 +21,8 @@ urlpatterns = [
     path('api/traditions/', views.traditions_api, name='traditions_api'),
     path('api/team-status/', views.team_status_api, name='team_status_api'),
     path('api/events/<int:event_id>/voting/', views.EventVotingAPI.as_view(), name='event_voting_api'),
+    path('api/events/<int:event_id>/ballot/', views.BallotAPI.as_view(), name='ballot_api'),
+    path('api/events/<int:event_id>/individual-rankings/', views.IndividualRankingsAPI.as_view(), name='individual_rankings_api'),
     
     # Team Management (works without static files)
     path('team-management/', views.team_management, name='team_management'),
@@ -8,20 +8,21 @@ from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django.core.files.storage import default_storage
 from django.utils import timezone
 from django.conf import settings
+from django.db import transaction
 from datetime import timedelta
 import logging
 from .models import Player, GameSession, TreasureHuntQuestion, PlayerAnswer, SimpleEventScore
+from .grading import apply_grade
+from .background import dispatch
+from .tasks import process_answer_photo
+from .uploads import get_content_hash, store_photo
+from .photo_backup import queue_backup
+from .throttling import rate_limit
+from .dashboard import invalidate_dashboard_stats
+from .search import normalize_text
 from django.contrib.admin.views.decorators import staff_member_required
 from django.views.decorators.http import require_POST
 
-# Import Google Photos service (handle import gracefully)
-try:
-    from .google_photos import google_photos_service
-    GOOGLE_PHOTOS_AVAILABLE = True
-except ImportError:
-    GOOGLE_PHOTOS_AVAILABLE = False
-    google_photos_service = None
-
 logger = logging.getLogger(__name__)
 
 
@@ -77,6 +78,7 @@ class SelectPlayerView(TemplateView):
         })
         return context
     
+    @method_decorator(rate_limit('select_player'))
     def post(self, request, *args, **kwargs):
         player_name = request.POST.get('player_name', '').strip()
         
@@ -89,7 +91,9 @@ class SelectPlayerView(TemplateView):
             return self.get(request, *args, **kwargs)
         
         # Check if player with this name already exists and is active
-        existing_player = Player.objects.filter(name__iexact=player_name).first()
+        existing_player = Player.objects.filter(
+            name_key=normalize_text(player_name, Player._meta.get_field('name_key').max_length)
+        ).order_by('pk').first()
         
         if existing_player:
             # Reactivate existing player
@@ -110,9 +114,11 @@ class SelectPlayerView(TemplateView):
         request.session['player_id'] = player.id
         request.session['player_name'] = player.name
         request.session['player_team'] = player.get_team_display()
+        request.session['player_team_code'] = player.team
         
         # Mark any previous players with this session as offline
-        Player.objects.filter(session_key=request.session.session_key).exclude(id=player.id).update(is_online=False)
+        if Player.objects.filter(session_key=request.session.session_key, is_online=True).exclude(id=player.id).update(is_online=False):
+            invalidate_dashboard_stats()
         
         if player.team == 'unassigned':
             messages.info(request, f'Welcome {player.name}! You will be assigned to a team by the admin. Ready for Onam celebration?')
@@ -138,6 +144,7 @@ class GameDashboardView(TemplateView):
             player = Player.objects.get(id=request.session['player_id'])
             player.mark_online()
             request.session['player_team'] = player.get_team_display()
+            request.session['player_team_code'] = player.team
         except Player.DoesNotExist:
             messages.error(request, 'Player not found. Please enter your name again.')
             return redirect('core:select_player')
@@ -181,6 +188,7 @@ class GameDashboardView(TemplateView):
         return context
 
 
+@rate_limit('team_status', methods=('GET',))
 def team_status_api(request):
     """
     API endpoint to get real-time team status
@@ -196,7 +204,8 @@ def team_status_api(request):
     
     # Mark offline players who haven't been active for more than 5 minutes
     offline_threshold = timezone.now() - timedelta(minutes=5)
-    Player.objects.filter(last_activity__lt=offline_threshold, is_online=True).update(is_online=False)
+    if Player.objects.filter(last_activity__lt=offline_threshold, is_online=True).update(is_online=False):
+        invalidate_dashboard_stats()
     
     if player.team != 'unassigned':
         teammates = player.teammates.values('id', 'name', 'is_online', 'score', 'last_activity')
@@ -328,6 +337,13 @@ class LeaderboardView(TemplateView):
         # Sort teams by total score
         sorted_teams = sorted(team_data.items(), key=lambda x: x[1]['total_score'], reverse=True)
         
+        # Audience vote rankings for every individual event, in one query
+        from .models import IndividualVoteAggregate
+        audience_rankings = {}
+        individual_event_ids = [event.id for event in active_events if event.allows_individual_participation]
+        for row in IndividualVoteAggregate.rankings(individual_event_ids, top=5):
+            audience_rankings.setdefault(row.event_id, []).append(row)
+        
         # Get detailed event information for display with winners
         event_details = []
         for event in active_events:
@@ -353,6 +369,7 @@ class LeaderboardView(TemplateView):
                 'scores': event_scores,
                 'total_votes': EventVote.objects.filter(event=event).count(),
                 'individual_scores': individual_scores,
+                'audience_rankings': audience_rankings.get(event.id, []),
                 'winner_team': winner_team,
                 'winner_score': winner_score,
                 'winner_name': team_configs.get(winner_team, 'No Winner') if winner_team else 'No Winner'
@@ -594,6 +611,7 @@ class TreasureHuntView(TemplateView):
         })
         return context
     
+    @method_decorator(rate_limit('treasure_hunt'))
     def post(self, request, *args, **kwargs):
         player_id = request.session.get('player_id')
         player = get_object_or_404(Player, id=player_id)
@@ -616,67 +634,47 @@ class TreasureHuntView(TemplateView):
         if question.question_type == 'text' or question.question_type == 'multiple_choice' or question.question_type == 'image_text':
             text_answer = request.POST.get('text_answer', '').strip()
             if text_answer:
-                answer.text_answer = text_answer
-                answer.save()
-                messages.success(request, f'Answer submitted for question {question.order}!')
+                with transaction.atomic():
+                    # Locked so parallel submissions cannot each try a different option
+                    answer = PlayerAnswer.objects.select_for_update().select_related('question').get(pk=answer.pk)
+                    if answer.text_answer:
+                        # Answers are final: a resubmission would override grading and probe for the right option
+                        messages.warning(request, f'You have already answered question {question.order}.')
+                    else:
+                        answer.text_answer = text_answer
+                        answer.save()
+                        
+                        # Auto-grade so only ambiguous answers wait for admin approval
+                        apply_grade(answer)
+                        # The same message whatever the verdict, so players cannot tell which answer scored
+                        messages.success(request, f'Answer submitted for question {question.order}!')
             else:
                 messages.error(request, 'Please provide an answer.')
         
         elif question.question_type == 'photo':
             photo = request.FILES.get('photo_answer')
-            if photo:
-                # Save the photo locally first
-                answer.photo_answer = photo
+            upload_error = getattr(request, 'photo_upload_error', None)
+            if upload_error:
+                messages.error(request, upload_error)
+            elif photo:
+                content_hash = get_content_hash(photo)
+                if answer.photo_answer and answer.photo_sha256 == content_hash:
+                    # A retry of a photo we already have - nothing to do
+                    messages.success(request, f'✅ Photo uploaded for question {question.order}!')
+                    return self.get(request, *args, **kwargs)
+                
+                # Save the photo locally first (stored once per unique photo)
+                answer.photo_answer.name = store_photo(photo, content_hash)
+                answer.photo_sha256 = content_hash
+                answer.photo_renditions = {}
                 answer.save()
                 
-                # Try to upload to Google Photos if enabled
-                google_photos_success = False
-                google_photos_error = None
+                # Build small renditions in the background instead of serving the original
+                dispatch(process_answer_photo, answer.pk)
                 
-                if (GOOGLE_PHOTOS_AVAILABLE and 
-                    google_photos_service and 
-                    getattr(settings, 'GOOGLE_PHOTOS_ENABLED', False)):
-                    
-                    try:
-                        # Upload to Google Photos
-                        photo_info = google_photos_service.upload_photo(
-                            photo_file=photo,
-                            description=f"Treasure Hunt Question {question.order}",
-                            player_name=player.name,
-                            question_order=question.order
-                        )
-                        
-                        if photo_info:
-                            # Update answer with Google Photos info
-                            answer.google_photos_media_id = photo_info.get('media_item_id')
-                            answer.google_photos_url = photo_info.get('base_url')
-                            answer.google_photos_product_url = photo_info.get('product_url')
-                            answer.save()
-                            
-                            # Check if this was a real upload or simulated
-                            if photo_info.get('simulated'):
-                                google_photos_success = 'simulated'
-                                logger.info(f"Simulated Google Photos upload for player {player.name}, question {question.order}")
-                            else:
-                                google_photos_success = True
-                                logger.info(f"Successfully uploaded photo to Google Photos for player {player.name}, question {question.order}")
-                        else:
-                            google_photos_error = "Upload failed - no response from Google Photos"
-                    
-                    except Exception as e:
-                        google_photos_error = str(e)
-                        logger.warning(f"Google Photos upload failed for player {player.name}, question {question.order}: {e}")
-                
-                # Show appropriate success message based on upload status
-                if google_photos_success is True:
-                    messages.success(request, f'✅ Photo uploaded for question {question.order} and successfully backed up to Google Photos!')
-                elif google_photos_success == 'simulated':
-                    messages.success(request, f'✅ Photo uploaded for question {question.order}! (Google Photos simulation mode - real upload will work when credentials are configured)')
-                elif google_photos_error:
-                    messages.success(request, f'✅ Photo uploaded for question {question.order}!')
-                    messages.warning(request, f'⚠️ Google Photos backup failed: {google_photos_error}')
-                elif getattr(settings, 'GOOGLE_PHOTOS_ENABLED', False):
-                    messages.success(request, f'✅ Photo uploaded for question {question.order}! (Google Photos backup will be set up later)')
+                # Back up to Google Photos from a worker so the upload never waits on Google
+                if queue_backup(answer):
+                    messages.success(request, f'✅ Photo uploaded for question {question.order}! It will be backed up to Google Photos shortly.')
                 else:
                     messages.success(request, f'✅ Photo uploaded for question {question.order}!')
             else:
@@ -879,6 +877,7 @@ class EventDetailView(View):
         
         return render(request, 'core/event_detail.html', context)
     
+    @method_decorator(rate_limit('event_vote'))
     def post(self, request, event_id):
         from .models import Event, EventVote
         
@@ -979,6 +978,82 @@ class EventVotingAPI(View):
             }, status=500)
 
 
+class BallotAPI(View):
+    """
+    API endpoint taking all of a player's votes for an event in one request:
+    {"team_votes": [{"performing_team": ..., "coordination_score": ...}, ...],
+     "individual_votes": [{"performing_player": id, "skill_score": ...}, ...]}
+    """
+    
+    @method_decorator(rate_limit('event_vote'))
+    def post(self, request, event_id):
+        import json
+        from django.core.exceptions import ValidationError
+        from .ballots import submit_ballot
+        from .models import Event
+        
+        player_id = request.session.get('player_id')
+        if not player_id:
+            return JsonResponse({'status': 'error', 'message': 'Please select a player first.'}, status=403)
+        player = Player.objects.filter(id=player_id).first()
+        if player is None:
+            return JsonResponse({'status': 'error', 'message': 'Player not found.'}, status=403)
+        
+        event = get_object_or_404(Event, id=event_id, is_active=True)
+        try:
+            ballot = json.loads(request.body or b'{}')
+            team_votes = ballot.get('team_votes') or []
+            individual_votes = ballot.get('individual_votes') or []
+            if not isinstance(team_votes, list) or not isinstance(individual_votes, list):
+                raise ValueError
+            if not all(isinstance(vote, dict) for vote in team_votes + individual_votes):
+                raise ValueError
+        except (ValueError, AttributeError):
+            return JsonResponse({'status': 'error', 'message': 'Invalid ballot.'}, status=400)
+        
+        try:
+            saved = submit_ballot(event, player, team_votes, individual_votes)
+        except ValidationError as e:
+            return JsonResponse({'status': 'error', 'errors': e.messages}, status=400)
+        
+        return JsonResponse({'status': 'success', 'saved': saved})
+
+
+class IndividualRankingsAPI(View):
+    """API endpoint for audience vote rankings of an individual event"""
+    
+    def get(self, request, event_id):
+        from .models import Event, IndividualVoteAggregate
+        
+        event = get_object_or_404(Event, id=event_id, is_active=True)
+        try:
+            top = int(request.GET.get('top', 10))
+        except ValueError:
+            top = 10
+        
+        rankings = [
+            {
+                'rank': row.rank,
+                'player_id': row.performing_player_id,
+                'name': row.performing_player.name,
+                'team': row.performing_player.team,
+                'votes': row.vote_count,
+                'skill': round(row.skill_average, 2),
+                'creativity': round(row.creativity_average, 2),
+                'presentation': round(row.presentation_average, 2),
+                'overall': round(row.overall_average, 2),
+                'average': round(row.average_score, 2),
+            }
+            for row in IndividualVoteAggregate.rankings([event.id], top=max(top, 1))
+        ]
+        return JsonResponse({
+            'status': 'success',
+            'event': event.name,
+            'rankings': rankings,
+            'voting_enabled': event.voting_enabled
+        })
+
+
 # Team Management View - Works without static files
 from django.contrib.admin.views.decorators import staff_member_required
 from .models import TeamConfiguration
@@ -1189,22 +1264,6 @@ def get_team_players(request):
 # Custom media serving for production
 @staff_member_required
 def serve_media(request, path):
-    """Custom media file serving for production"""
-    try:
-        from django.http import FileResponse
-        from django.conf import settings
-        import os
-        
-        # Build the full file path
-        file_path = os.path.join(settings.MEDIA_ROOT, path)
-        
-        # Check if file exists
-        if not os.path.exists(file_path):
-            from django.http import Http404
-            raise Http404("Media file not found")
-        
-        # Serve the file
-        return FileResponse(open(file_path, 'rb'))
-    except Exception as e:
-        from django.http import HttpResponse
-        return HttpResponse(f"Error serving media file: {e}", status=500)
+    """Custom media file serving for production (conditional, range and sendfile aware)"""
+    from .media import serve
+    return serve(request, path)
@@ -26,6 +26,10 @@ app.conf.beat_schedule = {
         'task': 'apps.games.tasks.send_game_reminders',
         'schedule': 3600.0,  # Run every hour
     },
+    'process-google-photos-backups': {
+        'task': 'apps.core.tasks.process_photo_backups',
+        'schedule': 60.0,  # Run every minute
+    },
 }
 
 app.conf.timezone = 'Europe/Stockholm'
@@ -65,6 +65,7 @@ MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'apps.core.middleware.RateLimitMiddleware',  # Reject over-limit submissions early
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -135,6 +136,25 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Media serving: 'nginx' (X-Accel-Redirect) or 'xsendfile' hands transfers to the front server
+MEDIA_SENDFILE_BACKEND = env('MEDIA_SENDFILE_BACKEND', default=None)
+MEDIA_SENDFILE_URL_PREFIX = env('MEDIA_SENDFILE_URL_PREFIX', default='/protected-media/')
+MEDIA_CACHE_MAX_AGE = env.int('MEDIA_CACHE_MAX_AGE', default=3600)  # seconds, for files not named by content hash
+
+# Photo answers are streamed to disk and hashed while uploading
+FILE_UPLOAD_HANDLERS = [
+    'apps.core.uploads.HashingPhotoUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+PHOTO_UPLOAD_MAX_BYTES = env.int('PHOTO_UPLOAD_MAX_BYTES', default=15 * 1024 * 1024)
+
+# Question imports store their images with this many threads
+QUESTION_IMPORT_IMAGE_WORKERS = env.int('QUESTION_IMPORT_IMAGE_WORKERS', default=4)
+
+# Result exports read this many rows from the database at a time
+EXPORT_CHUNK_SIZE = env.int('EXPORT_CHUNK_SIZE', default=2000)
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -188,6 +208,11 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Background tasks (photo processing etc.): 'thread' runs them in an in-process
+# pool, 'celery' queues them on the broker (falling back to the pool if it is down)
+BACKGROUND_TASK_BACKEND = env('BACKGROUND_TASK_BACKEND', default='thread')
+BACKGROUND_TASK_THREADS = env.int('BACKGROUND_TASK_THREADS', default=4)
+
 # CORS Settings
 CORS_ALLOWED_ORIGINS = env.list('CORS_ALLOWED_ORIGINS', default=[
     'http://localhost:3000',
@@ -248,9 +273,45 @@ LOGGING = {
 GOOGLE_PHOTOS_ENABLED = env.bool('GOOGLE_PHOTOS_ENABLED', default=False)
 GOOGLE_PHOTOS_ALBUM_ID = env('GOOGLE_PHOTOS_ALBUM_ID', default=None)
 GOOGLE_PHOTOS_ALBUM_NAME = env('GOOGLE_PHOTOS_ALBUM_NAME', default='Onam Celebration - Treasure Hunt Photos')
+GOOGLE_PHOTOS_API_URL = env('GOOGLE_PHOTOS_API_URL', default='https://photoslibrary.googleapis.com')
+
+# Google Photos backup queue
+GOOGLE_PHOTOS_BACKUP_CONCURRENCY = env.int('GOOGLE_PHOTOS_BACKUP_CONCURRENCY', default=2)
+GOOGLE_PHOTOS_BACKUP_MAX_ATTEMPTS = env.int('GOOGLE_PHOTOS_BACKUP_MAX_ATTEMPTS', default=6)
+GOOGLE_PHOTOS_BACKUP_RETRY_BASE = env.int('GOOGLE_PHOTOS_BACKUP_RETRY_BASE', default=30)  # seconds
+GOOGLE_PHOTOS_BACKUP_RETRY_MAX = env.int('GOOGLE_PHOTOS_BACKUP_RETRY_MAX', default=3600)  # seconds
+GOOGLE_PHOTOS_BATCH_WINDOW = env.int('GOOGLE_PHOTOS_BATCH_WINDOW', default=5)  # seconds, 0 uploads each photo on its own
+GOOGLE_PHOTOS_BATCH_SIZE = env.int('GOOGLE_PHOTOS_BATCH_SIZE', default=50)
+GOOGLE_PHOTOS_HTTP_POOL_SIZE = env.int('GOOGLE_PHOTOS_HTTP_POOL_SIZE', default=10)
+GOOGLE_PHOTOS_HTTP_RETRIES = env.int('GOOGLE_PHOTOS_HTTP_RETRIES', default=3)
+GOOGLE_PHOTOS_UPLOAD_TIMEOUT = env.int('GOOGLE_PHOTOS_UPLOAD_TIMEOUT', default=60)  # seconds
 
 # Google Photos API Credentials
 GOOGLE_PHOTOS_CREDENTIALS_FILE = env('GOOGLE_PHOTOS_CREDENTIALS_FILE', 
                                    default=str(BASE_DIR / 'google_photos_credentials.json'))
 GOOGLE_PHOTOS_TOKEN_FILE = env('GOOGLE_PHOTOS_TOKEN_FILE', 
                              default=str(BASE_DIR / 'google_photos_token.json'))
+
+# Admin dashboard statistics are cached this long (0 disables), and dropped on presence and answer writes
+DASHBOARD_STATS_CACHE_SECONDS = env.int('DASHBOARD_STATS_CACHE_SECONDS', default=5)
+
+# Rate limiting of player submissions: per endpoint, "<requests>/<s|m|h|d>" for each scope.
+# 'session' buckets are per browser session, 'team' buckets are shared by a team.
+RATELIMIT_ENABLE = env.bool('RATELIMIT_ENABLE', default=True)
+# Use a memory or Redis cache: with a dummy or database cache the buckets are kept per process instead
+RATELIMIT_CACHE = env('RATELIMIT_CACHE', default='default')
+RATELIMITS = {
+    'select_player': {'session': env('RATELIMIT_SELECT_PLAYER', default='10/m')},
+    'treasure_hunt': {
+        'session': env('RATELIMIT_TREASURE_HUNT', default='20/m'),
+        'team': env('RATELIMIT_TREASURE_HUNT_TEAM', default='120/m'),
+    },
+    'event_vote': {
+        'session': env('RATELIMIT_EVENT_VOTE', default='30/m'),
+        'team': env('RATELIMIT_EVENT_VOTE_TEAM', default='120/m'),
+    },
+    'team_status': {
+        'session': env('RATELIMIT_TEAM_STATUS', default='30/m'),
+        'team': env('RATELIMIT_TEAM_STATUS_TEAM', default='300/m'),
+    },
+}
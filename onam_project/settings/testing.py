@@ -25,6 +25,7 @@ EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
 # Celery - use memory for testing
 CELERY_TASK_ALWAYS_EAGER = True
 CELERY_TASK_EAGER_PROPAGATES = True
+BACKGROUND_TASK_BACKEND = 'sync'
 
 # SMS Testing - Use console backend
 SMS_BACKEND = 'console'
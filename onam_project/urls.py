@@ -29,8 +29,9 @@ urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 if settings.DEBUG:
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
 else:
-    # In production, ensure media files are served
-    from django.views.static import serve
+    # In production, ensure media files are served (304/range aware, or offloaded
+    # to the front server with MEDIA_SENDFILE_BACKEND)
+    from apps.core.media import serve
     from django.urls import re_path
     urlpatterns += [
         re_path(r'^media/(?P<path>.*)$', serve, {'document_root': settings.MEDIA_ROOT}),
@@ -0,0 +1,91 @@
+"""Ballot submission and the running vote aggregates (apps/core/ballots.py)"""
+
+import threading
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from apps.core.ballots import submit_ballot
+from apps.core.models import (Event, EventParticipation, IndividualParticipation, IndividualVoteAggregate,
+                              Player, VoteAggregate)
+
+
+def team_vote(team, score):
+    return {'performing_team': team, **{field: score for field in VoteAggregate.SCORE_TOTALS}}
+
+
+def individual_vote(player, score):
+    return {'performing_player': player.pk, **{field: score for field in IndividualVoteAggregate.SCORE_TOTALS}}
+
+
+class SubmitBallotTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.event = Event.objects.create(name='Thiruvathira', event_type='group_dance',
+                                         participation_type='both', voting_enabled=True)
+        EventParticipation.objects.create(event=cls.event, team='team_2')
+        EventParticipation.objects.create(event=cls.event, team='team_3')
+        cls.first = Player.objects.create(name='Anu', team='team_1')
+        cls.second = Player.objects.create(name='Meera', team='team_1')
+        cls.performer = Player.objects.create(name='Gopi', team='team_2')
+        IndividualParticipation.objects.create(event=cls.event, player=cls.performer)
+
+    def aggregates(self):
+        return (
+            sorted(VoteAggregate.objects.values_list('performing_team', 'vote_count', *VoteAggregate.SCORE_TOTALS.values())),
+            sorted(IndividualVoteAggregate.objects.values_list(
+                'performing_player_id', 'vote_count', *IndividualVoteAggregate.SCORE_TOTALS.values())),
+        )
+
+    def assertMatchesRebuild(self):
+        running = self.aggregates()
+        VoteAggregate.rebuild()
+        IndividualVoteAggregate.rebuild()
+        self.assertEqual(running, self.aggregates())
+
+    def test_same_team_ballots_without_a_prior_vote_count_once(self):
+        submit_ballot(self.event, self.first, team_votes=[team_vote('team_2', 4), team_vote('team_3', 6)])
+        submit_ballot(self.event, self.second, team_votes=[team_vote('team_2', 8)])
+
+        aggregate = VoteAggregate.objects.get(event=self.event, performing_team='team_2')
+        self.assertEqual(aggregate.vote_count, 1)
+        self.assertEqual(aggregate.overall_total, 8)
+        self.assertMatchesRebuild()
+
+    def test_resubmitted_individual_votes_replace_the_earlier_ones(self):
+        submit_ballot(self.event, self.first, individual_votes=[individual_vote(self.performer, 3)])
+        submit_ballot(self.event, self.second, individual_votes=[individual_vote(self.performer, 7)])
+        submit_ballot(self.event, self.first, individual_votes=[individual_vote(self.performer, 9)])
+
+        aggregate = IndividualVoteAggregate.objects.get(event=self.event, performing_player=self.performer)
+        self.assertEqual(aggregate.vote_count, 2)
+        self.assertEqual(aggregate.skill_total, 16)
+        self.assertMatchesRebuild()
+
+
+@skipUnless(connection.features.has_select_for_update, 'needs row locks to run ballots concurrently')
+class ConcurrentBallotTests(TransactionTestCase):
+
+    def test_concurrent_same_team_ballots_count_once(self):
+        event = Event.objects.create(name='Pookalam', event_type='group_dance', voting_enabled=True)
+        EventParticipation.objects.create(event=event, team='team_2')
+        voters = [Player.objects.create(name=f'Voter {index}', team='team_1') for index in range(4)]
+        start = threading.Barrier(len(voters))
+
+        def vote(voter):
+            try:
+                start.wait()
+                submit_ballot(event, voter, team_votes=[team_vote('team_2', 5)])
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=vote, args=(voter,)) for voter in voters]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        aggregate = VoteAggregate.objects.get(event=event, performing_team='team_2')
+        self.assertEqual((aggregate.vote_count, aggregate.overall_total), (1, 5))
@@ -0,0 +1,39 @@
+"""Organiser exports (apps/core/exports.py) and formula-like guest text"""
+
+import csv
+import io
+from unittest import skipUnless
+
+from django.test import TestCase
+
+from apps.core.exports import export_response
+from apps.core.models import Player
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+NAMES = ['=1+1', '-Anu', '@home', 'Meera']
+
+
+class ExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in NAMES:
+            Player.objects.create(name=name)
+
+    def test_csv_prefixes_formula_like_text(self):
+        response = export_response('players', 'csv')
+        content = b''.join(response.streaming_content).decode()
+        names = [row['name'] for row in csv.DictReader(io.StringIO(content))]
+        self.assertEqual(names, ["'=1+1", "'-Anu", "'@home", 'Meera'])
+
+    @skipUnless(openpyxl, 'XLSX export needs openpyxl')
+    def test_xlsx_stores_text_as_plain_strings(self):
+        response = export_response('players', 'xlsx')
+        workbook = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+        cells = [row[1] for row in workbook.active.iter_rows(min_row=2)]
+        self.assertEqual([cell.value for cell in cells], NAMES)
+        self.assertEqual({cell.data_type for cell in cells}, {'s'})
@@ -0,0 +1,55 @@
+"""Answer submission and automatic grading on the Chodya Onam questions page"""
+
+from django.contrib.messages import get_messages
+from django.test import TestCase
+from django.urls import reverse
+
+from apps.core.grading import apply_grade
+from apps.core.models import Player, PlayerAnswer, TreasureHuntQuestion
+
+
+class AnswerSubmissionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.player = Player.objects.create(name='Anu', team='team_1')
+        cls.question = TreasureHuntQuestion.objects.create(
+            question_text='Which flower is used most in a pookalam?', question_type='multiple_choice', order=1,
+            points=10, option_a='Thumba', option_b='Rose', option_c='Lotus', option_d='Lily', correct_answer='a',
+        )
+
+    def setUp(self):
+        session = self.client.session
+        session['player_id'] = self.player.pk
+        session.save()
+
+    def submit(self, text_answer):
+        response = self.client.post(reverse('core:treasure_hunt'), {
+            'question_id': self.question.pk, 'text_answer': text_answer,
+        })
+        return [str(message) for message in get_messages(response.wsgi_request)]
+
+    def test_submission_does_not_reveal_whether_the_answer_scored(self):
+        wrong = self.submit('Rose')
+        PlayerAnswer.objects.all().delete()
+        right = self.submit('Thumba')
+        self.assertEqual(PlayerAnswer.objects.get(player=self.player).grading_status, 'auto_approved')
+        self.assertEqual(wrong, right)
+        self.assertNotIn('Correct', ' '.join(right))
+
+    def test_answers_cannot_be_resubmitted(self):
+        self.submit('Rose')
+        self.submit('Thumba')
+        answer = PlayerAnswer.objects.get(player=self.player, question=self.question)
+        self.assertEqual((answer.text_answer, answer.is_correct, answer.points_awarded), ('Rose', False, 0))
+        self.player.refresh_from_db()
+        self.assertEqual(self.player.score, 0)
+
+    def test_grading_keeps_an_admin_review(self):
+        answer = PlayerAnswer.objects.create(
+            player=self.player, question=self.question, text_answer='Thumba flower',
+            grading_status='reviewed', is_correct=False, points_awarded=0,
+        )
+        self.assertIsNone(apply_grade(answer))
+        answer.refresh_from_db()
+        self.assertEqual((answer.grading_status, answer.is_correct, answer.points_awarded), ('reviewed', False, 0))
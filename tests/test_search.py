@@ -0,0 +1,52 @@
+"""Indexed admin search (apps/core/search.py) on databases without trigram indexes"""
+
+from django.contrib.admin.sites import AdminSite
+from django.db import connection
+from django.test import RequestFactory, TestCase
+
+from apps.core.admin import PlayerAdmin
+from apps.core.models import Player, SearchToken
+
+
+class IndexedSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in ['Anu Krishnan', 'Krishna', 'Gopikrishnan', 'Meera Nair']:
+            Player.objects.create(name=name)
+
+    def search(self, term):
+        admin = PlayerAdmin(Player, AdminSite())
+        results, _ = admin.get_search_results(RequestFactory().get('/'), Player.objects.all(), term)
+        return sorted(results.values_list('name', flat=True))
+
+    def test_matches_the_start_of_any_word(self):
+        self.assertEqual(self.search('krish'), ['Anu Krishnan', 'Krishna'])
+        self.assertEqual(self.search('NAIR'), ['Meera Nair'])
+
+    def test_mid_word_matches_only_when_no_word_starts_with_the_term(self):
+        # Narrower than icontains: "Gopikrishnan" is left out while other players match by word start
+        self.assertNotIn('Gopikrishnan', self.search('krish'))
+        self.assertEqual(self.search('rishna'), ['Anu Krishnan', 'Gopikrishnan', 'Krishna'])
+
+    def test_every_term_must_match(self):
+        self.assertEqual(self.search('anu krish'), ['Anu Krishnan'])
+        self.assertEqual(self.search('"anu krishnan"'), ['Anu Krishnan'])
+
+    def test_renaming_replaces_the_search_words(self):
+        player = Player.objects.get(name='Meera Nair')
+        player.name = 'Meera Menon'
+        player.save(update_fields=['name'])
+        self.assertEqual(self.search('menon'), ['Meera Menon'])
+        self.assertEqual(self.search('nair'), [])
+        player.delete()
+        self.assertFalse(SearchToken.objects.filter(object_id=player.pk, token='menon').exists())
+
+    def test_word_search_is_an_index_lookup(self):
+        admin = PlayerAdmin(Player, AdminSite())
+        results, _ = admin.get_search_results(RequestFactory().get('/'), Player.objects.all(), 'krish')
+        sql, params = results.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        self.assertNotIn('SCAN core_player', plan)